@@ -0,0 +1,266 @@
+'''
+Timing for operations on large meshes, which are too slow to
+include in the regular test suite.
+
+Run from this directory with:
+    python benchmark.py
+'''
+import trimesh
+import logging
+import time
+import numpy as np
+
+log = logging.getLogger('trimesh')
+log.addHandler(logging.NullHandler())
+
+# the default number of faces for the synthetic benchmark meshes
+FACE_COUNT = int(1e7)
+
+def grid_mesh(face_count=FACE_COUNT):
+    '''
+    Create a (not watertight) height field mesh with roughly face_count
+    triangles, as a quick way of getting a large mesh with real topology.
+    '''
+    side     = int(np.ceil((face_count / 2.0) ** .5)) + 1
+    x, y     = np.meshgrid(np.arange(side), np.arange(side))
+    z        = np.sin(x * .1) * np.cos(y * .1)
+    vertices = np.column_stack((x.reshape(-1),
+                                y.reshape(-1),
+                                z.reshape(-1))).astype(np.float64)
+    # the index of the lower left corner of every grid square
+    corner = (np.arange(side - 1).reshape((-1,1)) * side +
+              np.arange(side - 1)).reshape(-1)
+    quads  = np.column_stack((corner,
+                              corner + 1,
+                              corner + side + 1,
+                              corner + side))
+    faces  = trimesh.geometry.triangulate_quads(quads)
+    return trimesh.Trimesh(vertices = vertices,
+                           faces    = faces)
+
+def timed(function, *args, **kwargs):
+    '''
+    Run a function and return the result and seconds elapsed.
+    '''
+    tic    = time.time()
+    result = function(*args, **kwargs)
+    return result, time.time() - tic
+
+def timed_peak(function, *args, **kwargs):
+    '''
+    Run a function and return the result, seconds elapsed and peak MB 
+    allocated, which is NaN on python 2 as tracemalloc doesn't exist.
+    '''
+    try:
+        import tracemalloc
+    except ImportError:
+        result, elapsed = timed(function, *args, **kwargs)
+        return result, elapsed, np.nan
+    tracemalloc.start()
+    try:
+        result, elapsed = timed(function, *args, **kwargs)
+        size = tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, size
+
+def benchmark_topology(mesh):
+    def build():
+        topology = mesh.topology
+        topology.edges_unique
+        topology.face_adjacency
+        topology.vertex_faces
+        topology.vertex_neighbors
+        topology.face_neighbors
+
+    edges, elapsed = timed(trimesh.graph.face_adjacency, mesh.faces.view(np.ndarray))
+    log.info('graph.face_adjacency on %i faces: %.3f seconds',
+             len(mesh.faces), elapsed)
+
+    mesh.topology._cache.clear()
+    result, elapsed = timed(build)
+    log.info('Built topology for %i faces in %.3f seconds',
+             len(mesh.faces), elapsed)
+
+    result, elapsed = timed(build)
+    log.info('Cached topology query took %.6f seconds', elapsed)
+
+def benchmark_split(body_count=10000):
+    '''
+    Time splitting a mesh made up of many disjoint tetrahedrons.
+    '''
+    vertices = np.array([[0,0,0],[1,0,0],[0,1,0],[0,0,1]], dtype=np.float64)
+    faces    = np.array([[0,2,1],[0,1,3],[0,3,2],[1,2,3]])
+    offset   = np.arange(body_count).reshape((-1,1,1))
+    mesh     = trimesh.Trimesh(vertices = (vertices + offset * 2.0).reshape((-1,3)),
+                               faces    = (faces    + offset * 4).reshape((-1,3)))
+    mesh.topology.face_components
+
+    meshes, elapsed = timed(mesh.split)
+    log.info('Split %i bodies in %.3f seconds', len(meshes), elapsed)
+
+def slot_vertex_normals(count, faces, face_normals):
+    '''
+    The previous implementation of geometry.mean_vertex_normals, where
+    writes collide so only one face per corner slot contributes.
+    '''
+    vertex_normals = np.zeros((count, 3, 3))
+    vertex_normals[faces[:,0],0] = face_normals
+    vertex_normals[faces[:,1],1] = face_normals
+    vertex_normals[faces[:,2],2] = face_normals
+    return trimesh.unitize(vertex_normals.mean(axis=1))
+
+def benchmark_vertex_normals(mesh):
+    faces        = mesh.faces.view(np.ndarray)
+    face_normals = mesh.face_normals
+    result, elapsed = timed(slot_vertex_normals, 
+                            len(mesh.vertices), 
+                            faces, 
+                            face_normals)
+    log.info('Slot vertex normals on %i faces: %.3f seconds',
+             len(faces), elapsed)
+
+    for weighting in ['mean', 'area', 'angle']:
+        result, elapsed = timed(mesh.vertex_normals_weighted, weighting)
+        log.info('Accumulated %s weighted vertex normals: %.3f seconds',
+                 weighting, elapsed)
+
+def benchmark_mass(mesh):
+    '''
+    Time and peak memory of integrating every triangle at once 
+    against streaming over chunks of faces.
+    '''
+    vertices = mesh.vertices.view(np.ndarray)
+    faces    = mesh.faces.view(np.ndarray)
+    result, elapsed, size = timed_peak(lambda: trimesh.triangles.mass_integrals(vertices[faces]).sum(axis=1))
+    log.info('Unchunked mass integrals on %i faces: %.3f seconds, %.1f MB peak',
+             len(faces), elapsed, size)
+    result, elapsed, size = timed_peak(trimesh.triangles.integrate_mass, vertices, faces)
+    log.info('Chunked mass integrals on %i faces: %.3f seconds, %.1f MB peak',
+             len(faces), elapsed, size)
+
+def loop_export_stl(mesh, file_obj):
+    '''
+    The previous implementation of io.export.export_stl, which 
+    packs every face separately. 
+    '''
+    import struct
+    file_obj.write(struct.pack('<80x'))
+    file_obj.write(struct.pack('@i', len(mesh.faces)))
+    for index in range(len(mesh.faces)):
+        file_obj.write(struct.pack('<3f', *mesh.face_normals[index]))
+        for vertex in mesh.vertices[[mesh.faces[index]]]:
+            file_obj.write(struct.pack('<3f', *vertex))
+        file_obj.write(struct.pack('<h', 0))
+
+def benchmark_export_stl(mesh, loop_count=int(1e5)):
+    '''
+    Time exporting a binary STL, where the per- face loop is only run on 
+    loop_count faces as it is far too slow to run on the full mesh.
+    '''
+    import tempfile
+    mesh.face_normals
+    with tempfile.TemporaryFile() as file_obj:
+        result, elapsed = timed(trimesh.io.export.export_stl, mesh, file_obj)
+    log.info('Exported %i faces as binary STL in %.3f seconds',
+             len(mesh.faces), elapsed)
+
+    subset = trimesh.Trimesh(vertices     = mesh.vertices,
+                             faces        = mesh.faces[:loop_count],
+                             face_normals = mesh.face_normals[:loop_count])
+    with tempfile.TemporaryFile() as file_obj:
+        result, elapsed = timed(loop_export_stl, subset, file_obj)
+    log.info('Per- face loop exported %i faces in %.3f seconds, ~%.1f seconds for %i',
+             loop_count, elapsed, elapsed * len(mesh.faces) / loop_count, len(mesh.faces))
+
+def benchmark_export_glb(mesh):
+    '''
+    Time exporting a GLB against converting the same arrays to JSON
+    with tolist, which is how the three.js export works.
+    '''
+    import json
+    mesh.vertex_normals
+    result, elapsed = timed(trimesh.io.gltf.export_glb, mesh)
+    log.info('Exported %i faces as GLB (%.1f MB) in %.3f seconds',
+             len(mesh.faces), len(result) / 1e6, elapsed)
+    result, elapsed = timed(lambda: json.dumps({'faces'    : mesh.faces.tolist(),
+                                                'vertices' : mesh.vertices.tolist(),
+                                                'normals'  : mesh.vertex_normals.tolist()}))
+    log.info('JSON with tolist took %.3f seconds (%.1f MB)',
+             elapsed, len(result) / 1e6)
+
+def benchmark_native(mesh):
+    '''
+    Time loading a processed mesh from the native format against 
+    loading and processing it from a binary STL.
+    '''
+    import tempfile, os
+    mesh.process()
+    names = []
+    for file_type in ['stl', 'tmesh']:
+        with tempfile.NamedTemporaryFile(suffix='.' + file_type, delete=False) as file_obj:
+            trimesh.io.export.export_mesh(mesh, file_obj.name)
+        result, elapsed = timed(trimesh.load_mesh, file_obj.name)
+        log.info('Loaded %i faces from %s in %.4f seconds',
+                 len(result.faces), file_type.upper(), elapsed)
+        names.append(file_obj.name)
+    del result
+    for name in names:
+        os.remove(name)
+
+def benchmark_stl_merge(mesh):
+    '''
+    Time and peak memory of merging vertices while loading a binary STL
+    against loading every corner and merging them afterwards.
+    '''
+    import tempfile, os
+    with tempfile.NamedTemporaryFile(suffix='.stl', delete=False) as file_obj:
+        trimesh.io.export.export_mesh(mesh, file_obj.name)
+
+    def load(merge_vertices):
+        loaded = trimesh.load_mesh(file_obj.name, 
+                                   process        = False, 
+                                   merge_vertices = merge_vertices)
+        if not merge_vertices:
+            loaded.merge_vertices()
+        return loaded
+
+    for merge_vertices in [False, True]:
+        result, elapsed, size = timed_peak(load, merge_vertices)
+        log.info('Loaded %i faces with merge_vertices=%s in %.3f seconds, %.1f MB peak',
+                 len(result.faces), merge_vertices, elapsed, size)
+        del result
+    os.remove(file_obj.name)
+
+def benchmark_load_many(file_count=16, face_count=int(2e5), workers=[1,2,4]):
+    '''
+    Time loading and processing many binary STL files with load_many, 
+    for different numbers of worker processes.
+    '''
+    import tempfile, shutil, os
+    directory = tempfile.mkdtemp()
+    mesh  = grid_mesh(face_count)
+    paths = [os.path.join(directory, str(i) + '.stl') for i in range(file_count)]
+    for path in paths:
+        trimesh.io.export.export_mesh(mesh, path)
+    for count in workers:
+        result, elapsed = timed(lambda: list(trimesh.io.load.load_many(paths, workers=count)))
+        log.info('Loaded %i files of %i faces with %i workers in %.3f seconds',
+                 file_count, face_count, count, elapsed)
+    shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    trimesh.util.attach_to_log(logging.INFO)
+    mesh = grid_mesh()
+    log.info('Benchmark mesh has %i faces', len(mesh.faces))
+    benchmark_topology(mesh)
+    benchmark_vertex_normals(mesh)
+    benchmark_export_stl(mesh)
+    benchmark_export_glb(mesh)
+    benchmark_native(mesh)
+    benchmark_stl_merge(mesh)
+    benchmark_load_many()
+    benchmark_split()
+    # integrating every triangle at once runs out of memory on
+    # the full size mesh, so compare on a smaller one
+    benchmark_mass(grid_mesh(FACE_COUNT // 5))
@@ -6,6 +6,7 @@ from collections import deque
 import os
 import numpy as np
 import json
+import io
 
 TEST_DIR  = '../models'
 TEST_DIM = (100,3)
@@ -83,12 +84,6 @@ class MeshTests(unittest.TestCase):
 
     def test_meshes(self):
 
-        has_gt = trimesh.graph._has_gt
-        trimesh.graph._has_gt = False
-
-        if not has_gt:
-            log.warning('No graph-tool to test!')
-
         log.info('Running tests on %d meshes', len(self.meshes))
         for mesh in self.meshes:
             log.info('Testing %s', mesh.metadata['filename'])
@@ -97,25 +92,8 @@ class MeshTests(unittest.TestCase):
             
             mesh.process()
 
-            tic = [time.time()]
-
-            if has_gt:
-                trimesh.graph._has_gt = True 
-                split     = trimesh.graph.split(mesh)
-                tic.append(time.time())
-                facets    = trimesh.graph.facets(mesh)
-                tic.append(time.time())
-                trimesh.graph._has_gt = False
-
             split     = trimesh.graph.split(mesh) 
-            tic.append(time.time())
             facets    = trimesh.graph.facets(mesh)
-            tic.append(time.time())
-
-            if has_gt:
-                times = np.diff(tic)
-                log.info('Graph-tool sped up split by %f and facets by %f', 
-                         (times[2] / times[0]), (times[3] / times[1]))
 
             section   = mesh.section(plane_normal=[0,0,1], plane_origin=mesh.centroid)
             hull      = mesh.convex_hull()
@@ -151,10 +129,693 @@ class MeshTests(unittest.TestCase):
             self.assertFalse(mesh.is_watertight)
             mesh.fill_holes()
             self.assertTrue(mesh.is_watertight)
+
+    def test_fill_large_holes(self):
+        mesh   = trimesh.load_mesh(location('unit_sphere.STL'))
+        volume = mesh.mass_properties()['volume']
+        mesh.visual.face_colors = [255,0,0]
+        # cut a few multi- face holes out of the sphere
+        for vertex in mesh.vertices[:4]:
+            center = mesh.triangles.mean(axis=1)
+            mesh.update_faces(((center - vertex)**2).sum(axis=1) > .05)
+        self.assertFalse(mesh.is_watertight)
+        mesh.fill_holes()
+        self.assertTrue(mesh.is_watertight)
+        self.assertTrue(mesh.visual.face_colors.shape == mesh.faces.shape)
+        self.assertTrue(abs(mesh.mass_properties()['volume'] - volume) < .1)
             
+    def test_fill_concave_colors(self):
+        # a grid with an L shaped hole, which is filled by ear clipping
+        x, y     = np.meshgrid(np.arange(5), np.arange(5))
+        vertices = np.column_stack((x.reshape(-1), y.reshape(-1), np.zeros(25)))
+        faces    = []
+        for i in range(4):
+            for j in range(4):
+                if (i, j) in [(1,1), (1,2), (2,1)]: continue
+                v = i * 5 + j
+                faces.extend([[v, v+1, v+6], [v, v+6, v+5]])
+        mesh = trimesh.Trimesh(vertices=vertices, faces=faces)
+        # every existing face has a distinct color
+        colors = np.zeros((len(faces), 3), dtype=np.uint8)
+        colors[:,0] = np.arange(len(faces))
+        mesh.visual.face_colors = colors
+        mesh.fill_holes(raise_watertight=False)
+        self.assertTrue(len(mesh.faces) > len(faces))
+
+        # every new face has the color of an existing face it shares an edge with
+        owner = dict((tuple(edge), i // 3) for i, edge in enumerate(
+            trimesh.geometry.faces_to_edges(np.array(faces), sort=False)))
+        for face, color in zip(mesh.faces[len(faces):], mesh.visual.face_colors[len(faces):]):
+            adjacent = [owner[(b, a)] for a, b in zip(face, np.roll(face, -1)) 
+                        if (b, a) in owner]
+            if len(adjacent) == 0: continue
+            self.assertTrue(color[0] in adjacent)
+
     def test_fix_normals(self):
         for mesh in self.meshes[5:]:
             mesh.fix_normals()
+        for mesh in self.meshes[:5]:
+            if not mesh.is_watertight: continue
+            # turn the mesh inside out, which fix_normals should undo
+            mesh.faces = np.fliplr(mesh.faces)
+            self.assertTrue(mesh.mass_properties()['volume'] < 0)
+            mesh.fix_normals()
+            self.assertTrue(mesh.mass_properties()['volume'] > 0)
+
+    def test_fix_winding(self):
+        for mesh in self.meshes:
+            if not mesh.is_watertight: continue
+            flip = np.random.random(len(mesh.faces)) > .5
+            mesh.faces[flip] = mesh.faces[flip][:,::-1]
+            trimesh.repair.fix_face_winding(mesh)
+            # with coherent winding, every directed edge occurs exactly once
+            edges = trimesh.geometry.faces_to_edges(mesh.faces.view(np.ndarray),
+                                                    sort=False)
+            unique = trimesh.grouping.unique_rows(edges)[0]
+            self.assertTrue(len(unique) == len(edges))
+
+    def test_split(self):
+        sphere = trimesh.load_mesh(location('unit_sphere.STL'))
+        # three disjoint copies of the sphere, the last one with a hole
+        meshes = [trimesh.Trimesh(vertices = sphere.vertices + i * 5.0,
+                                  faces    = sphere.faces) for i in range(3)]
+        meshes[-1].update_faces(np.arange(len(sphere.faces)) != 0)
+        combined = np.sum(meshes)
+        self.assertTrue(trimesh.graph.split(combined, only_count=True) == 3)
+        split = combined.split(check_watertight=True)
+        # the hole is filled so the last body is still returned
+        self.assertTrue(len(split) == 3)
+        for body in split:
+            self.assertTrue(body.is_watertight)
+            self.assertTrue(len(body.vertices) == len(sphere.vertices))
+        self.assertTrue(len(combined.split(check_watertight=False)) == 3)
+        # normals generated during the split remove the degenerate face
+        split = degenerate_tetrahedron().split(check_watertight=False)
+        self.assertTrue(len(split) == 1 and len(split[0].faces) == 4)
+
+    def test_facets(self):
+        cube       = trimesh.load_mesh(location('unit_cube.STL'))
+        properties = cube.facets_properties()
+        facets, area = cube.facets(return_area=True)
+        self.assertTrue(cube.facets_properties() is properties)
+        self.assertTrue(len(facets) == 6)
+        self.assertTrue(np.allclose(area, cube.area() / 6.0))
+        # every face of a cube is part of a facet
+        self.assertTrue((properties['labels'] >= 0).all())
+        self.assertTrue(np.allclose(np.abs(properties['normal']).sum(axis=1), 1.0))
+        # the outline of every facet is a square
+        self.assertTrue((np.bincount(properties['boundary_facet']) == 4).all())
+        # origins are the center of each side of the cube
+        center = cube.bounds.mean(axis=0)
+        offset = properties['origin'] - center
+        self.assertTrue(np.allclose(np.abs(offset).max(axis=1), cube.scale / 2.0))
+
+        # a square with a collinear face, removed when normals are generated
+        vertices = [[0,0,0], [1,0,0], [1,1,0], [0,1,0], [.5,.5,0], [.5,0,0]]
+        faces    = [[0,5,4], [5,1,4], [1,2,4], [2,3,4], [0,5,1]]
+        for group_normals in [False, True]:
+            plane  = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+            facets = plane.facets(group_normals=group_normals)
+            self.assertTrue(len(plane.faces) == 4)
+            self.assertTrue(len(facets) == 1 and len(facets[0]) == 4)
+
+    def test_vertex_normals(self):
+        sphere = trimesh.load_mesh(location('unit_sphere.STL'))
+        sphere.vertices -= sphere.centroid
+        radial = trimesh.unitize(sphere.vertices)
+        for weighting in ['area', 'angle', 'mean']:
+            normals = sphere.vertex_normals_weighted(weighting)
+            self.assertTrue((trimesh.util.diagonal_dot(normals, radial) > .99).all())
+            self.assertTrue(sphere.vertex_normals_weighted(weighting) is normals)
+
+        # compare against accumulating every corner directly
+        faces   = sphere.faces.view(np.ndarray)
+        weights = trimesh.triangles.angles(sphere.triangles)
+        summed  = np.zeros(sphere.vertices.shape)
+        np.add.at(summed, 
+                  faces.reshape(-1), 
+                  (sphere.face_normals.repeat(3, axis=0) * 
+                   weights.reshape((-1,1))))
+        self.assertTrue(np.allclose(trimesh.unitize(summed),
+                                    sphere.vertex_normals_weighted('angle')))
+
+    def test_stl_colors(self):
+        cube = trimesh.load_mesh(location('unit_cube.STL'))
+        data = np.zeros(len(cube.faces), dtype=trimesh.io.stl._stl_dtype)
+        data['vertices'] = cube.triangles
+        data['normals']  = cube.face_normals
+        # pure red in the VisCAM convention, except the first face
+        data['attributes']    = 0x8000 | (31 << 10)
+        data['attributes'][0] = 0
+        header = np.zeros(1, dtype=trimesh.io.stl._stl_dtype_header)
+        header['face_count'] = len(data)
+        file_obj = io.BytesIO(header.tostring() + data.tostring())
+
+        loaded = trimesh.load_mesh(file_obj, 
+                                   file_type   = 'stl', 
+                                   process     = False, 
+                                   face_colors = True)
+        self.assertTrue(np.allclose(loaded.vertices, cube.triangles.reshape((-1,3))))
+        colors = loaded.visual.face_colors
+        self.assertTrue((colors[1:] == [255,0,0]).all())
+        self.assertTrue((colors[0] == trimesh.color.DEFAULT_COLOR).all())
+
+    def test_stl_export(self):
+        for mesh in self.meshes:
+            exported = mesh.export(file_type='stl')
+            self.assertTrue(len(exported) == 84 + 50 * len(mesh.faces))
+            loaded = trimesh.load_mesh(io.BytesIO(exported), 
+                                       file_type = 'stl',
+                                       process   = False)
+            self.assertTrue(np.allclose(loaded.vertices, 
+                                        mesh.triangles.reshape((-1,3)),
+                                        atol = 1e-3))
+
+    def test_stl_export_degenerate(self):
+        # a tetrahedron and a face with collinear vertices, which is
+        # removed when face normals are generated during export
+        mesh = degenerate_tetrahedron()
+        exported = mesh.export(file_type='stl')
+        loaded   = trimesh.load_mesh(io.BytesIO(exported), file_type='stl')
+        self.assertTrue(len(loaded.faces) == 4)
+        self.assertTrue(len(exported) == 84 + 50 * 4)
+
+    def test_stl_ascii(self):
+        names = ['ADIS16480.STL', '1002_tray_bottom.STL']
+        truth = [trimesh.load_mesh(location(name), process=False) for name in names]
+        # a single file with every solid one after another
+        text  = b'\n'.join(open(location(name), 'rb').read() for name in names)
+        # use a small chunk so solids and lines span several chunks
+        loaded = trimesh.io.stl.load_stl_ascii(io.BytesIO(text), chunk_size=1000)
+        self.assertTrue(len(loaded) == len(names))
+        for mesh, kwargs in zip(truth, loaded):
+            self.assertTrue(np.allclose(mesh.vertices, kwargs['vertices']))
+            self.assertTrue(np.allclose(mesh.face_normals, kwargs['face_normals']))
+            self.assertTrue(kwargs['metadata']['name'] == mesh.metadata['name'])
+        self.assertTrue(loaded[0]['metadata']['name'] == 'ci - ADIS16480-1')
+
+    def test_assimp_scene(self):
+        class Raw(object):
+            # stand in for pyassimp structures
+            def __init__(self, **kwargs):
+                self.__dict__.update(kwargs)
+        cube    = trimesh.load_mesh(location('unit_cube.STL'))
+        sphere  = trimesh.load_mesh(location('unit_sphere.STL'))
+        raw     = [Raw(vertices = i.vertices.astype(np.float32),
+                       faces    = i.faces.astype(np.int32),
+                       normals  = i.vertex_normals,
+                       colors   = np.ones((1, len(i.vertices), 4)),
+                       name     = 'part') for i in [cube, sphere]]
+        offset  = np.eye(4)
+        offset[:3,3] = [10,0,0]
+        nodes   = [Raw(name='part', transformation=np.eye(4), meshes=raw, children=[]),
+                   # a node named like the first suffix tried for a repeated name
+                   Raw(name='part_4', transformation=np.eye(4), meshes=[], children=[]),
+                   Raw(name='part', transformation=offset, meshes=raw, children=[]),
+                   Raw(name='cube', transformation=offset, meshes=raw[:1], children=[])]
+        # a root node with the same name as the base frame
+        root    = Raw(name='world', transformation=np.eye(4), meshes=[], children=nodes)
+        scene   = trimesh.io.assimp._assimp_scene(Raw(meshes=raw, rootnode=root))
+
+        self.assertTrue(len(scene.meshes) == 3)
+        # the repeated node name is made unique
+        renamed = [i for i in scene.meshes.keys() if i.startswith('part_')][0]
+        self.assertTrue(renamed != 'part_4')
+        # instances of the same meshes share one Trimesh
+        first, second = scene.meshes['part'], scene.meshes[renamed]
+        self.assertTrue(first is second)
+        # the meshes of a node are concatenated
+        self.assertTrue(len(first.faces) == len(cube.faces) + len(sphere.faces))
+        self.assertTrue(np.allclose(first.vertices[len(cube.vertices):], sphere.vertices))
+        self.assertTrue((first.visual.vertex_colors == 255).all())
+        self.assertTrue(np.allclose(scene.transforms.get(renamed), offset))
+        self.assertTrue(np.allclose(scene.transforms.get('cube'), offset))
+        self.assertTrue(len(scene.meshes['cube'].faces) == len(cube.faces))
+        self.assertFalse(scene.transforms._transforms.has_edge('world', 'world'))
+
+        # a single mesh without a transform is loaded as before
+        single = trimesh.io.assimp._assimp_scene(Raw(meshes=raw[:1], rootnode=nodes[-1]))
+        self.assertTrue(isinstance(single, trimesh.scene.Scene))
+        nodes[-1].transformation = np.eye(4)
+        single = trimesh.io.assimp._assimp_scene(Raw(meshes=raw[:1], rootnode=nodes[-1]))
+        self.assertTrue(np.allclose(single['vertices'], cube.vertices))
+
+    def test_step_xml(self):
+        # faceter output with two instances of a tetrahedron
+        xml = b"""<?xml version="1.0"?>
+<step-assembly root="p1">
+<product id="p1" name="assembly" shape="s1"/>
+<product id="p2" name="part" shape="s2"/>
+<shape id="s1" unit="length 0.0254">
+<child ref="s2" xform="1 0 0 0 0 1 0 0 0 0 1 0 0 0 0 1"/>
+<child ref="s2" xform="1 0 0 0 0 1 0 0 0 0 1 0 5 0 0 1"/>
+</shape>
+<shape id="s2" unit="length 0.0254" shell="sh1"/>
+<shell id="sh1"><verts>
+<v p="0 0 0"/><v p="1 0 0"/><v p="0 1 0"/><v p="0 0 1"/>
+</verts><facets>
+<f v="0 2 1"/><f v="0 1 3"/><f v="0 3 2"/><f v="1 2 3"/>
+</facets></shell>
+</step-assembly>
+"""
+        # blocks smaller than the shell are converted separately
+        meshes = trimesh.io.step._step_parse(io.BytesIO(xml), block_size=3)[0]
+        self.assertTrue(np.allclose(meshes['sh1']['vertices'], 
+                                    np.vstack(([0,0,0], np.eye(3)))))
+        self.assertTrue((meshes['sh1']['faces'][-1] == [1,2,3]).all())
+        for workers in [1, 2]:
+            loaded = trimesh.io.step._step_meshes(io.BytesIO(xml), workers=workers)
+            self.assertTrue(len(loaded) == 1)
+            mesh = trimesh.Trimesh(**loaded[0])
+            self.assertTrue(mesh.is_watertight)
+            self.assertTrue(np.isclose(mesh.scale, 1.0))
+            self.assertTrue(mesh.metadata['quantity'] == 2)
+            self.assertTrue(mesh.metadata['units'] == 'inches')
+
+    def test_step_pool(self):
+        from multiprocessing import Pool
+        # two shells, so metadata would be assembled in a pool
+        xml = b"""<?xml version="1.0"?>
+<step-assembly root="p1">
+<product id="p1" name="assembly" shape="s1"/>
+<product id="p2" name="a" shape="s2"/>
+<product id="p3" name="b" shape="s3"/>
+<shape id="s1" unit="length 0.0254">
+<child ref="s2" xform="1 0 0 0 0 1 0 0 0 0 1 0 0 0 0 1"/>
+<child ref="s3" xform="1 0 0 0 0 1 0 0 0 0 1 0 5 0 0 1"/>
+</shape>
+<shape id="s2" unit="length 0.0254" shell="sh1"/>
+<shape id="s3" unit="length 0.0254" shell="sh2"/>
+<shell id="sh1"><verts><v p="0 0 0"/><v p="1 0 0"/><v p="0 1 0"/></verts>
+<facets><f v="0 1 2"/></facets></shell>
+<shell id="sh2"><verts><v p="0 0 0"/><v p="2 0 0"/><v p="0 2 0"/></verts>
+<facets><f v="0 1 2"/></facets></shell>
+</step-assembly>
+"""
+        direct = step_metadata(xml)
+        self.assertTrue(direct == [(1, 'inches'), (1, 'inches')])
+        # daemonic workers, IE in load_many, can't start their own pool
+        pool = Pool(1)
+        try:     nested = pool.apply(step_metadata, (xml,))
+        finally: pool.terminate()
+        self.assertTrue(nested == direct)
+
+    def test_stl_merge(self):
+        for name in ['unit_sphere.STL', 'ADIS16480.STL']:
+            truth = trimesh.load_mesh(location(name), process=False)
+            truth.merge_vertices()
+            merged = trimesh.io.stl.load_stl(open(location(name), 'rb'), 
+                                             merge_vertices = True)
+            # the same vertices in the same order as merging after loading
+            self.assertTrue(np.array_equal(merged['vertices'], truth.vertices))
+            self.assertTrue(np.array_equal(merged['faces'],    truth.faces))
+        # merged across chunks of a few faces
+        triangles = truth.triangles
+        vertices, faces = trimesh.io.stl.merge_triangles(triangles[i:i+7] 
+                                                         for i in range(0, len(triangles), 7))
+        self.assertTrue(np.array_equal(vertices, truth.vertices))
+        self.assertTrue(np.array_equal(faces,    truth.faces))
+
+    def test_stl_chunks(self):
+        # a binary and an ASCII STL
+        for name in ['unit_sphere.STL', 'ADIS16480.STL']:
+            mesh   = trimesh.load_mesh(location(name), process=False)
+            chunks = list(trimesh.io.stl.stl_chunks(open(location(name), 'rb'), chunk_size=100))
+            self.assertTrue(max(len(i[0]) for i in chunks) == 100)
+            self.assertTrue(np.allclose(np.vstack([i[0] for i in chunks]), mesh.triangles))
+            self.assertTrue(np.allclose(np.vstack([i[1] for i in chunks]), mesh.face_normals))
+
+            bins   = np.linspace(0, mesh.area(sum=False).max(), 10)
+            stream = trimesh.triangles.stream_properties(chunks, bins=bins)
+            truth  = mesh.mass_properties()
+            scale  = np.abs(truth['inertia']).max()
+            self.assertTrue(stream['face_count'] == len(mesh.faces))
+            self.assertTrue(np.allclose(stream['bounds'], mesh.bounds))
+            self.assertTrue(np.allclose(stream['volume'], truth['volume']))
+            self.assertTrue(np.allclose(stream['surface_area'], truth['surface_area']))
+            self.assertTrue(np.allclose(stream['center_mass'], truth['center_mass']))
+            self.assertTrue(np.allclose(stream['inertia'], truth['inertia'], atol=scale*1e-9))
+            self.assertTrue(stream['histogram'].sum() == len(mesh.faces))
+
+    def test_lazy_process(self):
+        name  = location('featuretype.STL')
+        truth = trimesh.load_mesh(name)
+        mesh  = trimesh.load_mesh(name, process='lazy')
+        raw   = len(mesh._faces)
+        # triangle soup properties don't process the mesh
+        self.assertTrue(np.allclose(mesh.bounds, truth.bounds))
+        self.assertTrue(np.isclose(mesh.area(), truth.area()))
+        self.assertTrue(mesh.sample(10).shape == (10,3))
+        self.assertTrue(mesh.triangles.shape == (raw,3,3))
+        self.assertTrue(mesh._process_pending)
+        self.assertTrue(len(mesh._vertices) == raw * 3)
+        # anything using the indexed faces and vertices processes it first
+        self.assertTrue(mesh.is_watertight)
+        self.assertFalse(mesh._process_pending)
+        self.assertTrue(mesh.vertices.shape == truth.vertices.shape)
+        self.assertTrue(mesh.faces.shape    == truth.faces.shape)
+        self.assertTrue(np.isclose(mesh.area(), truth.area()))
+
+    def test_load_many(self):
+        names = ['unit_cube.STL', 'tube.obj', 'nonexistent.STL']
+        truth = dict((location(i), trimesh.load_mesh(location(i))) for i in names[:2])
+        for workers in [1, 2]:
+            loaded = list(trimesh.io.load.load_many([location(i) for i in names],
+                                                    workers = workers))
+            self.assertTrue(len(loaded) == len(names))
+            for path, mesh, error in loaded:
+                if path in truth:
+                    self.assertTrue(error is None)
+                    self.assertTrue(np.allclose(mesh.vertices, truth[path].vertices))
+                else:
+                    # errors are reported without stopping the other files
+                    self.assertTrue(mesh is None and len(error) > 0)
+
+    def test_load_many_scene(self):
+        import tempfile, shutil
+        # a loader returning a scene, IE assimp with a node hierarchy
+        trimesh.io.load._mesh_loaders['scenetest'] = scene_loader
+        directory = tempfile.mkdtemp()
+        try:
+            name = os.path.join(directory, 'assembly.scenetest')
+            with open(name, 'wb') as file_obj:
+                file_obj.write(open(location('unit_cube.STL'), 'rb').read())
+            truth = trimesh.load_mesh(name)
+            for workers in [1, 2]:
+                path, scene, error = list(trimesh.io.load.load_many([name], 
+                                                                    workers=workers))[0]
+                self.assertTrue(error is None)
+                self.assertTrue(sorted(scene.meshes.keys()) == ['a', 'b'])
+                # the nodes still share one mesh
+                self.assertTrue(scene.meshes['a'] is scene.meshes['b'])
+                self.assertTrue(np.allclose(scene.meshes['a'].vertices, 
+                                            truth.meshes['a'].vertices))
+                for node in ['a', 'b']:
+                    self.assertTrue(np.allclose(scene.transforms.get(node),
+                                                truth.transforms.get(node)))
+        finally:
+            trimesh.io.load._mesh_loaders.pop('scenetest')
+            shutil.rmtree(directory)
+
+    def test_sniff(self):
+        import gzip, bz2, zipfile, tempfile
+        names = ['unit_cube.STL', 'ADIS16480.STL', 'tube.obj', 'ballA.off']
+        data  = dict((i, open(location(i), 'rb').read()) for i in names)
+        truth = dict((i, trimesh.load_mesh(location(i))) for i in names)
+        ply   = trimesh.io.ply.export_ply(truth['tube.obj'])
+        detected = [['stl', data['unit_cube.STL']],
+                    ['stl', data['ADIS16480.STL']],
+                    ['obj', data['tube.obj']],
+                    ['off', data['ballA.off']],
+                    ['ply', ply]]
+        for file_type, blob in detected:
+            sniffed = trimesh.io.load.sniff_file_type(io.BytesIO(blob))
+            self.assertTrue(sniffed == file_type)
+            # file objects and buffers load without a file type
+            for source in [io.BytesIO(blob), bytearray(blob), np.frombuffer(blob, dtype=np.uint8)]:
+                mesh = trimesh.load_mesh(source)
+                self.assertTrue(len(mesh.faces) > 0)
+
+        text   = bytearray(b'ab\ncd')
+        buffer = trimesh.io.load.BufferFile(text)
+        self.assertTrue(np.shares_memory(np.frombuffer(buffer.buffer(1, 2), dtype=np.uint8),
+                                         np.frombuffer(text, dtype=np.uint8)))
+        self.assertTrue(buffer.buffer(1, 2).tobytes() == b'b\n')
+        self.assertTrue(buffer.readline() == b'ab\n')
+        self.assertTrue(buffer.read() == b'cd')
+        buffer.seek(-3, 2)
+        self.assertTrue(buffer.tell() == 2 and buffer.read(1) == b'\n')
+
+        gzipped = io.BytesIO()
+        with gzip.GzipFile(fileobj=gzipped, mode='wb') as f:
+            f.write(data['unit_cube.STL'])
+        compressed = [gzipped.getvalue(), bz2.compress(data['unit_cube.STL'])]
+        for blob in compressed:
+            mesh = trimesh.load_mesh(io.BytesIO(blob))
+            self.assertTrue(np.allclose(mesh.vertices, truth['unit_cube.STL'].vertices))
+        with tempfile.NamedTemporaryFile(suffix='.stl.gz') as f:
+            f.write(compressed[0])
+            f.flush()
+            mesh = trimesh.load_mesh(f.name)
+            self.assertTrue(np.allclose(mesh.vertices, truth['unit_cube.STL'].vertices))
+
+        # every mesh in a zip bundle is loaded, using the member names
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            for name in names:
+                z.writestr('parts/' + name, data[name])
+            z.writestr('README.txt', 'not a mesh')
+        loaded = trimesh.load_mesh(io.BytesIO(archive.getvalue()))
+        self.assertTrue(len(loaded) == len(names))
+        for mesh, name in zip(loaded, names):
+            self.assertTrue(np.allclose(mesh.vertices, truth[name].vertices))
+
+        with self.assertRaises(ValueError):
+            trimesh.load_mesh(io.BytesIO(b'not a mesh'))
+
+        # a passed file type isn't applied to members of an archive
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('README.txt', 'not a mesh')
+            z.writestr('part.obj', data['tube.obj'])
+        loaded = trimesh.load_mesh(io.BytesIO(archive.getvalue()), file_type='obj')
+        self.assertTrue(np.allclose(loaded.vertices, truth['tube.obj'].vertices))
+
+        class Stream(io.BytesIO):
+            # a stream which can only be read in order, IE a pipe
+            def seekable(self):         return False
+            def seek(self, *args):      raise IOError('not seekable')
+            def tell(self):             raise IOError('not seekable')
+        # streams with a passed file type aren't sniffed
+        mesh = trimesh.load_mesh(Stream(data['tube.obj']), file_type='obj')
+        self.assertTrue(np.allclose(mesh.vertices, truth['tube.obj'].vertices))
+        # and streams without one are read into memory to be sniffed
+        mesh = trimesh.load_mesh(Stream(data['unit_cube.STL']))
+        self.assertTrue(np.allclose(mesh.vertices, truth['unit_cube.STL'].vertices))
+
+    def test_obj(self):
+        text = b"""# a quad and a triangle in two groups
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+vn 0 0 1
+o square
+f 1//1 2//1 3//1 4//1
+g triangle
+v 0 0 1
+f -4//-1 -3//-1 -1//-1
+"""
+        loaded = trimesh.io.misc.load_wavefront(io.BytesIO(text), chunk_size=20)
+        self.assertTrue(len(loaded) == 2)
+        square, triangle = loaded
+        self.assertTrue(square['metadata']['name'] == 'square')
+        self.assertTrue(triangle['metadata']['name'] == 'triangle')
+        self.assertTrue(square['faces'].shape == (2,3))
+        self.assertTrue(len(square['vertices']) == 4)
+        self.assertTrue(np.allclose(square['vertex_normals'], [0,0,1]))
+        self.assertTrue(np.allclose(triangle['vertices'][triangle['faces'][0]],
+                                    [[1,0,0],[1,1,0],[0,0,1]]))
+
+        tube = trimesh.load_mesh(location('tube.obj'))
+        self.assertTrue(tube.is_watertight)
+
+    def test_off(self):
+        text = b"""COFF
+# a quad and two triangles with colors, and a blank line
+5 3 0
+0 0 0 255 0 0
+1 0 0 255 0 0
+
+1 1 0 0 255 0
+0 1 0 0 0 255
+0 0 1 0 0 255
+4 0 1 2 3 0.5 0.5 0.5 1.0
+3 0 1 4 1 0 0 1
+3 1 2 4 0 0 1 1
+"""
+        loaded = trimesh.io.misc.load_off(io.BytesIO(text))
+        self.assertTrue(loaded['faces'].shape == (4,3))
+        self.assertTrue((loaded['faces'][:2] == [[0,1,2],[0,2,3]]).all())
+        # the colors of the quad are repeated for both of its triangles
+        self.assertTrue((loaded['face_colors'] == [[128,128,128],
+                                                   [128,128,128],
+                                                   [255,0,0],
+                                                   [0,0,255]]).all())
+        self.assertTrue((loaded['vertex_colors'][2] == [0,255,0]).all())
+
+        ball = trimesh.load_mesh(location('ballA.off'))
+        self.assertTrue(len(ball.faces) == 3796)
+
+    def test_ply(self):
+        sphere = trimesh.load_mesh(location('unit_sphere.STL'))
+        sphere.visual.face_colors = np.random.randint(0, 255, sphere.faces.shape).astype(np.uint8)
+        sphere.vertex_normals     = sphere.vertex_normals_weighted()
+        for encoding in ['binary', 'ascii']:
+            export = trimesh.io.ply.export_ply(sphere, encoding=encoding)
+            loaded = trimesh.load_mesh(io.BytesIO(export), file_type='ply')
+            self.assertTrue(np.allclose(loaded.vertices, sphere.vertices))
+            self.assertTrue((loaded.faces == sphere.faces).all())
+            self.assertTrue((loaded.visual.face_colors == sphere.visual.face_colors).all())
+            self.assertTrue(np.allclose(loaded.vertex_normals, sphere.vertex_normals))
+
+        # big endian with a quad and a triangle, which are read row by row
+        header = b"""ply
+format binary_big_endian 1.0
+element vertex 5
+property float x
+property float y
+property float z
+element face 2
+property list uchar int vertex_indices
+end_header
+"""
+        vertices = np.array([[0,0,0],[1,0,0],[1,1,0],[0,1,0],[0,0,1]], dtype='>f4')
+        faces    = np.array([4,0,1,2,3,3,0,1,4], dtype='>i4')
+        data     = (vertices.tostring() +
+                    b''.join(np.array(i, dtype='>u1').tostring() if j in [0,5] else
+                             np.array(i, dtype='>i4').tostring()
+                             for j, i in enumerate(faces)))
+        loaded = trimesh.io.ply.load_ply(io.BytesIO(header + data))
+        self.assertTrue((loaded['faces'] == [[0,1,2],[0,2,3],[0,1,4]]).all())
+        self.assertTrue(np.allclose(loaded['vertices'], vertices))
+
+    def test_glb(self):
+        sphere = trimesh.load_mesh(location('unit_sphere.STL'))
+        sphere.visual.vertex_colors = np.random.randint(0, 255, sphere.vertices.shape).astype(np.uint8)
+        loaded = trimesh.load_mesh(io.BytesIO(trimesh.io.gltf.export_glb(sphere)),
+                                   file_type='glb')
+        self.assertTrue(np.allclose(loaded.vertices, sphere.vertices, atol=1e-6))
+        self.assertTrue((loaded.faces == sphere.faces).all())
+        self.assertTrue(np.allclose(loaded.vertex_normals, sphere.vertex_normals, atol=1e-6))
+        self.assertTrue((loaded.visual.vertex_colors == sphere.visual.vertex_colors).all())
+
+        # the same mesh twice in a scene shares its buffers
+        scene  = trimesh.scene.Scene()
+        offset = trimesh.transformations.translation_matrix([1,2,3])
+        for name, matrix in [['a', np.eye(4)], ['b', offset]]:
+            scene.meshes[name] = sphere
+            scene.transforms.update(frame_to=name, matrix=matrix)
+        export = scene.export()
+        loaded = trimesh.io.gltf.load_glb(io.BytesIO(export))
+        self.assertTrue([i['metadata']['name'] for i in loaded] == ['a', 'b'])
+        self.assertTrue(np.allclose(loaded[1]['metadata']['transform'], offset))
+        self.assertTrue(len(export) < 1.5 * len(trimesh.io.gltf.export_glb(sphere)))
+
+        # empty meshes are nodes without a mesh
+        empty = trimesh.Trimesh(vertices=np.zeros((0,3)), faces=np.zeros((0,3), dtype=np.int64))
+        export = trimesh.io.gltf.export_glb(empty)
+        with self.assertRaises(ValueError):
+            trimesh.io.gltf.load_glb(io.BytesIO(export))
+        scene.meshes['c'] = empty
+        scene.transforms.update(frame_to='c', matrix=np.eye(4))
+        loaded = trimesh.io.gltf.load_glb(io.BytesIO(scene.export()))
+        self.assertTrue([i['metadata']['name'] for i in loaded] == ['a', 'b'])
+
+    def test_native(self):
+        import tempfile, os
+        cube = trimesh.load_mesh(location('unit_cube.STL'))
+        cube.metadata['transform'] = np.eye(4)
+        facets = cube.facets()
+        with tempfile.NamedTemporaryFile(suffix='.tmesh', delete=False) as file_obj:
+            trimesh.io.native.export_native(cube, file_obj, derived=True)
+        loaded = trimesh.load_mesh(file_obj.name)
+        # derived values are restored into the cache
+        self.assertTrue(loaded.topology._cache.get('face_adjacency') is not None)
+        self.assertTrue(len(loaded.facets()) == len(facets))
+        # the arrays are memory mapped rather than read
+        self.assertTrue(isinstance(loaded.vertices.base, np.memmap))
+        self.assertTrue(np.allclose(loaded.vertices, cube.vertices))
+        self.assertTrue((loaded.faces == cube.faces).all())
+        self.assertTrue(np.allclose(loaded.metadata['transform'], np.eye(4)))
+        # memory maps are copy- on- write, so the file is unchanged
+        loaded.vertices[0] += 1.0
+        self.assertTrue(np.allclose(trimesh.load_mesh(file_obj.name).vertices, cube.vertices))
+        os.remove(file_obj.name)
+
+        # writeable buffers are viewed rather than copied
+        data = bytearray(trimesh.io.native.export_native(cube))
+        loaded = trimesh.load_mesh(data, file_type='tmesh')
+        self.assertTrue(np.shares_memory(loaded.vertices, np.frombuffer(data, dtype=np.uint8)))
+        loaded = trimesh.load_mesh(bytes(data), file_type='tmesh')
+        self.assertTrue(np.allclose(loaded.vertices, cube.vertices))
+        loaded.vertices[0] += 1.0
+
+        # wrappers with the file descriptor of another file aren't mapped
+        # and without compression the gzip file is larger than its contents
+        import gzip
+        with open(location('unit_cube.STL'), 'rb') as f:
+            data = f.read()
+        truth = trimesh.io.stl.load_stl(io.BytesIO(data))
+        with tempfile.NamedTemporaryFile(suffix='.gz', delete=False) as file_obj:
+            pass
+        for compresslevel in [0, 9]:
+            with gzip.open(file_obj.name, 'wb', compresslevel=compresslevel) as f:
+                trimesh.io.native.export_native(cube, f)
+            with gzip.open(file_obj.name, 'rb') as f:
+                loaded = trimesh.load_mesh(f, file_type='tmesh')
+            self.assertTrue(np.allclose(loaded.vertices, cube.vertices))
+            with gzip.open(file_obj.name, 'wb', compresslevel=compresslevel) as f:
+                f.write(data)
+            with gzip.open(file_obj.name, 'rb') as f:
+                loaded = trimesh.io.stl.load_stl(f)
+            self.assertTrue(np.allclose(loaded['vertices'], truth['vertices']))
+        os.remove(file_obj.name)
+
+    def test_text_export(self):
+        from xml.etree import ElementTree
+        sphere  = trimesh.load_mesh(location('unit_sphere.STL'))
+        options = np.get_printoptions()
+        export  = trimesh.io.export.export_off(sphere, digits=3)
+        loaded  = trimesh.io.misc.load_off(io.BytesIO(export.encode('utf-8')))
+        self.assertTrue(np.allclose(loaded['vertices'], sphere.vertices, atol=1e-3))
+        self.assertTrue((loaded['faces'] == sphere.faces).all())
+
+        file_obj = io.BytesIO()
+        trimesh.io.export.export_collada(sphere, file_obj)
+        root = ElementTree.fromstring(file_obj.getvalue())
+        self.assertTrue(np.get_printoptions() == options)
+        faces = [i for i in root.iter() if i.tag.endswith('}p')][0]
+        faces = np.fromstring(faces.text, sep=' ', dtype=np.int64)
+        self.assertTrue((faces == sphere.faces.reshape(-1)).all())
+
+        # rows formatted in several chunks are the same as one at a time
+        chunks = trimesh.io.export._text_rows(sphere.faces, '%d %d %d\n', chunk_size=100)
+        self.assertTrue(''.join(chunks) == ''.join('%d %d %d\n' % tuple(i) for i in sphere.faces))
+
+        # text mode files are written strings, and file names are closed
+        import tempfile, os
+        text = io.StringIO()
+        trimesh.io.export.export_off(sphere, text, digits=3)
+        self.assertTrue(text.getvalue() == export)
+        with tempfile.NamedTemporaryFile(suffix='.off', delete=False) as file_obj:
+            pass
+        with open(file_obj.name, 'w') as f:
+            trimesh.io.export.export_off(sphere, f, digits=3)
+        trimesh.io.export.export_json(sphere, file_obj.name)
+        with open(file_obj.name, 'r') as f:
+            self.assertTrue(f.read() == trimesh.io.export.export_json(sphere))
+        os.remove(file_obj.name)
+
+    def test_topology(self):
+        for mesh in self.meshes:
+            topology = mesh.topology
+            # cached adjacency should match the uncached function
+            truth = trimesh.graph.face_adjacency(mesh.faces.view(np.ndarray))
+            self.assertTrue(set(map(tuple, np.sort(truth, axis=1))) ==
+                            set(map(tuple, np.sort(topology.face_adjacency, axis=1))))
+            edges = topology.edges_unique[topology.edges_unique_inverse]
+            self.assertTrue((edges == topology.edges).all())
+            # every face references three vertices
+            self.assertTrue(topology.vertex_faces.sum() == len(mesh.faces) * 3)
+
+            # moving vertices shouldn't clear the topology
+            adjacency = topology.face_adjacency
+            mesh.vertices += 1.0
+            self.assertTrue(topology.face_adjacency is adjacency)
+            # but changing faces should
+            mesh.faces = mesh.faces[1:]
+            self.assertFalse(topology.face_adjacency is adjacency)
 
 class EqualTest(unittest.TestCase):
     def setUp(self):
@@ -227,7 +888,98 @@ class MassTests(unittest.TestCase):
                 self.assertTrue(parameter_ok)
                 parameter_count += 1
             log.info('%i mass parameters confirmed for %s', parameter_count, truth['filename'])  
+
+    def test_body_properties(self):
+        meshes = list(self.meshes.values())
+        # offset the meshes so the bounds of each body are distinct
+        for i, mesh in enumerate(meshes):
+            mesh.vertices += i * 100.0
+        combined   = np.sum(meshes)
+        properties = combined.body_properties(density=2.0)
+        self.assertTrue(len(properties['volume']) == len(meshes))
+        for mesh in meshes:
+            truth = mesh.mass_properties(density=2.0)
+            index = np.abs(properties['volume'] - truth['volume']).argmin()
+            self.assertTrue(np.allclose(properties['inertia'][index], truth['inertia']))
+            self.assertTrue(np.allclose(properties['center_mass'][index], truth['center_mass']))
+            self.assertTrue(np.allclose(properties['bounds'][index], mesh.bounds))
+        # changing the result doesn't change the cached values
+        properties['volume'][:] = 0.0
+        properties['bounds'][:] = 0.0
+        properties = combined.body_properties(density=2.0)
+        self.assertTrue((properties['volume'] > 0.0).all())
+        self.assertTrue((properties['bounds'][:,1] > 0.0).any())
+
+        # two tetrahedrons touching at one vertex are separate bodies
+        # which share that vertex, so it is in the bounds of both
+        vertices = [[0,0,0], [1,0,0], [1,1,0], [1,0,1], [-1,0,0], [-1,-1,0], [-1,0,-1]]
+        faces    = [[0,2,1], [0,1,3], [0,3,2], [1,2,3], 
+                    [0,4,5], [0,6,4], [0,5,6], [4,6,5]]
+        bowtie   = trimesh.Trimesh(vertices=vertices, faces=faces)
+        bounds   = bowtie.body_properties()['bounds']
+        self.assertTrue(len(bounds) == 2)
+        # sorted by the minimum x, so the second body is first
+        bounds   = bounds[bounds[:,0,0].argsort()]
+        self.assertTrue(np.allclose(bounds[0], [[-1,-1,-1], [0,0,0]]))
+        self.assertTrue(np.allclose(bounds[1], [[0,0,0], [1,1,1]]))
    
+    def test_batch_mass(self):
+        meshes  = list(self.meshes.values())
+        faces   = np.vstack([m.faces + offset for m, offset in zip(
+            meshes, np.cumsum([0] + [len(m.vertices) for m in meshes[:-1]]))])
+        offsets = np.cumsum([0] + [len(m.faces) for m in meshes[:-1]])
+        vertices = np.vstack([m.vertices for m in meshes])
+        # use a tiny chunk so chunks span several meshes
+        integrated, area = trimesh.triangles.integrate_mass(vertices,
+                                                            faces,
+                                                            offsets    = offsets,
+                                                            chunk_size = 7)
+        batch = trimesh.triangles.batch_mass_properties(vertices, faces, offsets)
+        self.assertTrue(np.allclose(batch['volume'], integrated[0]))
+        for i, mesh in enumerate(meshes):
+            truth = mesh.mass_properties(density=3.0)
+            self.assertTrue(np.isclose(truth['mass'], truth['volume'] * 3.0))
+            self.assertTrue(np.isclose(batch['volume'][i], truth['volume']))
+            self.assertTrue(np.isclose(area[i], truth['surface_area']))
+            self.assertTrue(np.allclose(batch['inertia'][i] * 3.0, truth['inertia']))
+            # the density free integrals are only computed once
+            cached = mesh._mass_integrals()
+            mesh.mass_properties(density=5.0)
+            self.assertTrue(mesh._mass_integrals() is cached)
+
+def scene_loader(file_obj, file_type=None):
+    '''
+    Load an STL as a scene with two nodes sharing the mesh, where 
+    node 'b' is a child of node 'a'.
+    '''
+    mesh   = trimesh.Trimesh(**trimesh.io.stl.load_stl(file_obj))
+    scene  = trimesh.scene.Scene()
+    offset = np.eye(4)
+    offset[:3,3] = [0, 0, 5]
+    scene.meshes['a'] = mesh
+    scene.meshes['b'] = mesh
+    scene.transforms.update(frame_to='a', matrix=offset)
+    scene.transforms.update(frame_to='b', frame_from='a', matrix=offset.copy())
+    return scene
+
+def step_metadata(xml):
+    '''
+    The quantity and units of every shell of faceter XML, loaded with 
+    a pool of two workers.
+    '''
+    loaded = trimesh.io.step._step_meshes(io.BytesIO(xml), workers=2)
+    return sorted((i['metadata'].get('quantity'), 
+                   i['metadata'].get('units')) for i in loaded)
+
+def degenerate_tetrahedron():
+    '''
+    A tetrahedron with an extra face whose vertices are collinear, 
+    without face normals so they are generated on access.
+    '''
+    vertices = [[0,0,0], [1,0,0], [0,1,0], [0,0,1], [.5,0,0]]
+    faces    = [[0,2,1], [0,1,3], [0,3,2], [1,2,3], [0,4,1]]
+    return trimesh.Trimesh(vertices=vertices, faces=faces)
+
 def location(name):
     return os.path.abspath(os.path.join(TEST_DIR, name))
                 
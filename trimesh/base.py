@@ -21,6 +21,7 @@ from . import util
 
 from .io.export    import export_mesh
 from .ray.ray_mesh import RayMeshIntersector
+from .topology     import MeshTopology
 from .voxel        import Voxel
 from .points       import unitize, transform_points
 from .convex       import convex_hull
@@ -46,7 +47,12 @@ class Trimesh(object):
                  vertex_normals  = None,
                  metadata        = None,
                  process         = False,
+                 face_colors     = None,
+                 vertex_colors   = None,
                  **kwargs):
+
+        # if processing was deferred until the faces or vertices are accessed
+        self._process_pending = False
                  
         # cache computed values, which are cleared when
         # self._geometry_id() changes, forcing a recompute
@@ -71,8 +77,16 @@ class Trimesh(object):
         # and is cached for subsequent queries
         self.ray     = RayMeshIntersector(self)
 
+        # connectivity tables (unique edges, vertex-face incidence, etc)
+        # are computed on request and only recomputed when faces change
+        self.topology = MeshTopology(self)
+
         # hold vertex and face colors
         self.visual = color.VisualAttributes(self)
+        if face_colors is not None:
+            self.visual.face_colors = np.asanyarray(face_colors)
+        if vertex_colors is not None:
+            self.visual.vertex_colors = vertex_colors
         
         # any metadata that should be tracked per- mesh
         self.metadata = dict()
@@ -80,21 +94,33 @@ class Trimesh(object):
         if isinstance(metadata, dict):
             self.metadata.update(metadata)
             
-        # if requested do basic mesh clean-up immediately
-        if process:
+        # if requested do basic mesh clean-up immediately, or
+        # when the indexed faces or vertices are first accessed
+        if process == 'lazy':
+            self._process_pending = True
+        elif process:
             self.process()
             
     def process(self):
         '''
         Convenience function to do basic processing on a raw mesh
         '''
+        self._process_pending = False
         self.merge_vertices()
         self.remove_duplicate_faces()
         self.remove_degenerate_faces()
         return self
         
+    def _process_deferred(self):
+        '''
+        Run processing if it was deferred with process='lazy'.
+        '''
+        if self._process_pending:
+            self.process()
+
     @property
     def faces(self):
+        self._process_deferred()
         return self._faces
         
     @faces.setter
@@ -103,6 +129,7 @@ class Trimesh(object):
 
     @property
     def vertices(self):
+        self._process_deferred()
         return self._vertices
         
     @vertices.setter
@@ -115,17 +142,21 @@ class Trimesh(object):
 
         When core geometry vertices and faces. 
         '''
-        result  = self.faces.modified() 
-        result += self.vertices.modified()
+        result  = self._faces.modified() 
+        result += self._vertices.modified()
         return result
         
     @property
     def bounds(self):
         '''
         (2,3) float, bounding box of the mesh of [min, max] coordinates
+
+        Processing only removes duplicate vertices, so this doesn't 
+        run deferred processing.
         '''
-        bounds = np.vstack((np.min(self.vertices, axis=0),
-                            np.max(self.vertices, axis=0)))
+        vertices = self._vertices.view(np.ndarray)
+        bounds = np.vstack((np.min(vertices, axis=0),
+                            np.max(vertices, axis=0)))
         return bounds
 
     @property                 
@@ -158,17 +189,20 @@ class Trimesh(object):
         Return the number of groups of connected faces.
         Bodies aren't necessarily watertight.
         '''
-        return graph.split(self, only_count=True)
+        if len(self.faces) == 0: return 0
+        return self.topology.face_components.max() + 1
 
     @property
     def triangles(self):
         # use of advanced indexing on our tracked arrays will 
         # trigger a change (which nukes the cache)
-        return self.vertices.view(np.ndarray)[self.faces]
+        # the triangle soup is available without deferred processing,
+        # so it includes duplicate and degenerate faces until processed
+        return self._vertices.view(np.ndarray)[self._faces.view(np.ndarray)]
 
     @property
     def edges(self):
-        return geometry.faces_to_edges(self.faces)
+        return self.topology.edges
 
     @property
     def units(self):
@@ -198,14 +232,20 @@ class Trimesh(object):
 
     @property
     def vertex_normals(self):
-        if np.shape(self._vertex_normals) != np.shape(self.vertices):
-            self._generate_vertex_normals()
-            log.debug('Generating vertex normals')
-        return self._vertex_normals
+        '''
+        (len(vertices), 3) float, unit normal of every vertex.
+
+        If normals of the correct shape weren't set, they are generated
+        from the area weighted normals of adjacent faces.
+        '''
+        if np.shape(self._vertex_normals) == np.shape(self.vertices):
+            return self._vertex_normals
+        return self.vertex_normals_weighted(weighting='area')
 
     @vertex_normals.setter
     def vertex_normals(self, values):
-        if np.shape(values) != np.shape(self.vertices):
+        # None is passed by default and just means generate them later
+        if values is not None and np.shape(values) != np.shape(self.vertices):
             log.warning('Vertex normals are incorrect shape!')
         self._vertex_normals = np.array(values)
 
@@ -217,17 +257,45 @@ class Trimesh(object):
         self.update_faces(valid)
         self._face_normals = face_normals
 
-    def _generate_vertex_normals(self):
+    def vertex_normals_weighted(self, weighting='area'):
         '''
-        If face normals are defined, produce approximate vertex normals based on the
-        average of the adjacent faces.
+        Generate vertex normals from the normals of adjacent faces, which 
+        are cached until the mesh changes.
         
         If vertices are merged with no regard to normal angle, this is
         going to render with weird shading.
+
+        Arguments
+        ---------
+        weighting: str, how much each face contributes to a vertex normal:
+                   'area':  the area of the face
+                   'angle': the angle of the face at the vertex
+                   'mean':  every face is weighted equally
+
+        Returns
+        ---------
+        vertex_normals: (len(vertices), 3) float, unit normal of each vertex
         '''
-        self._vertex_normals = geometry.mean_vertex_normals(len(self.vertices),
-                                                            self.faces,
-                                                            self.face_normals)
+        key    = 'vertex_normals_' + weighting
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        # get face normals first, as generating them may remove faces
+        face_normals = self.face_normals
+        if weighting == 'area':
+            weights = self.area(sum=False)
+        elif weighting == 'angle':
+            weights = triangles.angles(self.triangles)
+        elif weighting == 'mean':
+            weights = None
+        else:
+            raise ValueError('Weighting must be area, angle or mean!')
+        vertex_normals = geometry.mean_vertex_normals(count        = len(self.vertices),
+                                                      faces        = self.faces,
+                                                      face_normals = face_normals,
+                                                      weights      = weights)
+        return self._cache.set(key   = key,
+                               value = vertex_normals)
                                                              
     def merge_vertices(self, angle_max=None):
         '''
@@ -319,22 +387,16 @@ class Trimesh(object):
         graph.add_edges_from(mesh.face_adjacency)
         groups = nx.connected_components(graph_connected.subgraph(interesting_faces))
         '''
-        cached = self._cache.get('face_adjacency')
-        if cached is None:
-            return self._cache.set(key   = 'face_adjacency', 
-                                   value = graph.face_adjacency(self.faces))
-        return cached
+        return self.topology.face_adjacency
 
     @property
     def is_watertight(self):
         '''
         Check if a mesh is watertight. 
-        This currently only checks to see if every face has three adjacent faces
+        This currently only checks to see if every edge is shared by exactly
+        two faces, which is cached until faces change.
         '''
-        cached = self._cache.get('is_watertight')
-        if cached is not None: return cached
-        return self._cache.set(key   = 'is_watertight', 
-                               value = graph.is_watertight(self))
+        return graph.is_watertight(self)
        
     def remove_degenerate_faces(self):
         '''
@@ -348,12 +410,36 @@ class Trimesh(object):
         '''
         Return a list of face indices for coplanar adjacent faces
         '''
-        facets = [graph.facets, graph.facets_group][group_normals](self)
+        properties = self.facets_properties(group_normals=group_normals)
+        facets     = graph.groups_to_list(properties['groups'])
         if return_area:
-            area = [triangles.area(self.vertices[self.faces[i]]) for i in facets]
-            return facets, area
+            return facets, properties['area']
         return facets
 
+    def facets_properties(self, group_normals=False):
+        '''
+        Returns the facets (groups of coplanar adjacent faces) of the 
+        current mesh and their properties, which are cached until the
+        mesh changes.
+
+        Returns dictionary with keys, where values have one row per facet: 
+            'labels'         : (len(faces)) int, facet of each face or -1
+            'groups'         : sparse boolean CSR matrix, where row i 
+                               contains the faces of facet i
+            'area'           : (n) float, area of each facet
+            'normal'         : (n,3) float, unit normal of each facet
+            'origin'         : (n,3) float, centroid of each facet
+            'boundary'       : (k,2) int, vertex indices of facet outlines
+            'boundary_facet' : (k) int, facet of each boundary edge
+        '''
+        key    = 'facets_properties_' + str(int(group_normals))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        properties = graph.facets_properties(self, group_normals=group_normals)
+        return self._cache.set(key   = key,
+                               value = properties)
+
     @_log_time    
     def fix_normals(self):
         '''
@@ -366,7 +452,7 @@ class Trimesh(object):
 
     def fill_holes(self, raise_watertight=True):
         '''
-        Fill single triangle and single quad holes in the mesh.
+        Fill holes in the mesh, by triangulating every boundary loop.
         
         Arguments
         ---------
@@ -528,17 +614,80 @@ class Trimesh(object):
                             coordinate system
             'center_mass' : Center of mass location, in global coordinate system
         '''
-        key  = 'mass_properties_' 
-        key += str(int(skip_inertia)) + '_' 
-        key += str(int(density * 1e3))
-        cached = self._cache.get(key)
-        if cached is not None: 
+        integrated, surface_area = self._mass_integrals()
+        properties = triangles.integrals_to_properties(integrated   = integrated,
+                                                       surface_area = surface_area,
+                                                       density      = density)
+        result = {'density'      : density,
+                  'surface_area' : surface_area[0],
+                  'volume'       : properties['volume'][0],
+                  'mass'         : properties['mass'][0],
+                  'center_mass'  : properties['center_mass'][0].tolist()}
+        if not skip_inertia:
+            result['inertia'] = properties['inertia'][0].tolist()
+        return result
+
+    def _mass_integrals(self):
+        '''
+        The volume integrals and surface area of the mesh, which don't
+        depend on density so they are cached once and scaled per request.
+        '''
+        cached = self._cache.get('mass_integrals')
+        if cached is not None:
             return cached
-        mass = triangles.mass_properties(triangles    = self.triangles,
-                                         density      = density,
-                                         skip_inertia = skip_inertia)
-        return self._cache.set(key   = key, 
-                               value = mass)
+        integrals = triangles.integrate_mass(vertices = self.vertices.view(np.ndarray),
+                                             faces    = self.faces.view(np.ndarray))
+        return self._cache.set(key   = 'mass_integrals',
+                               value = integrals)
+
+    def body_properties(self, density = 1.0):
+        '''
+        Returns the properties of every body (connected component) of the
+        current mesh, without splitting it into separate meshes.
+
+        Assumes uniform density, and results are probably garbage for
+        bodies which aren't watertight.
+
+        Returns dictionary with keys, where values are arrays with one
+        row per body, in the order of self.topology.face_components:
+            'surface_area' : (n) float, in global units^2
+            'volume'       : (n) float, in global units^3
+            'mass'         : (n) float, from specified density
+            'density'      : float, same as kwarg density
+            'center_mass'  : (n,3) float, center of mass location
+            'inertia'      : (n,3,3) float, taken at the center of mass
+                             and aligned with the global coordinate system
+            'bounds'       : (n,2,3) float, [min, max] box of every body
+        '''
+        cached = self._cache.get('body_properties')
+        if cached is None:
+            labels   = self.topology.face_components
+            vertices = self.vertices.view(np.ndarray)
+            faces    = self.faces.view(np.ndarray)
+            # sort faces by body so every body is a contiguous block
+            order    = labels.argsort(kind='mergesort')
+            start    = np.append(0, np.cumsum(np.bincount(labels))[:-1])
+            cached   = triangles.batch_mass_properties(vertices = vertices,
+                                                       faces    = faces[order],
+                                                       offsets  = start)
+            # bodies touching at a vertex share it, so bounds come from 
+            # the extents of every face, converted a chunk at a time
+            face_min = np.empty((len(faces), 3))
+            face_max = np.empty((len(faces), 3))
+            for i in range(0, len(faces), triangles.MASS_CHUNK):
+                chunk = vertices[faces[order[i:i + triangles.MASS_CHUNK]]]
+                face_min[i:i + len(chunk)] = chunk.min(axis=1)
+                face_max[i:i + len(chunk)] = chunk.max(axis=1)
+            cached['bounds'] = np.stack((np.minimum.reduceat(face_min, start),
+                                         np.maximum.reduceat(face_max, start)), axis=1)
+            self._cache.set(key   = 'body_properties',
+                            value = cached)
+        # copy the arrays, so changing the result doesn't change the cache
+        result = dict((key, np.array(value)) for key, value in cached.items())
+        result['density'] = density
+        result['mass']    = cached['volume'] * density
+        result['inertia'] = cached['inertia'] * density
+        return result
 
     def scene(self):
         '''
@@ -62,6 +62,36 @@ def triangulate_quads(quads):
                        quads[:,[2,3,0]]))
     return faces
 
+def triangulate_polygons(indices, counts):
+    '''
+    Triangulate many convex polygons at once, with a fan from the
+    first vertex of each polygon.
+
+    Arguments
+    ---------
+    indices: (sum(counts)) int, vertex indices of every polygon, stacked
+    counts:  (n) int, number of vertices in each polygon
+
+    Returns
+    ---------
+    faces:   (m,3) int, triangles referencing the same vertices as indices
+    polygon: (m) int, index of the polygon each triangle is from
+    '''
+    indices = np.asanyarray(indices)
+    counts  = np.asanyarray(counts, dtype=np.int64)
+    # polygons with fewer than three vertices don't produce triangles
+    tri_count = np.clip(counts - 2, 0, None)
+    start     = np.append(0, np.cumsum(counts)[:-1])
+    polygon   = np.arange(len(counts)).repeat(tri_count)
+    # the index of each triangle within its polygon
+    tri_start = np.append(0, np.cumsum(tri_count)[:-1])
+    local     = np.arange(len(polygon)) - tri_start[polygon]
+    first     = start[polygon]
+    faces = np.column_stack((indices[first],
+                             indices[first + local + 1],
+                             indices[first + local + 2]))
+    return faces, polygon
+
 def nondegenerate_faces(faces):
     '''
     Returns a 1D boolean array where non-degenerate faces are 'True'                        
@@ -70,27 +100,49 @@ def nondegenerate_faces(faces):
     nondegenerate = np.all(np.diff(np.sort(faces, axis=1), axis=1) != 0, axis=1)
     return nondegenerate
     
-def mean_vertex_normals(count, faces, face_normals):
+def mean_vertex_normals(count, faces, face_normals, weights=None):
     '''
-    roduce approximate vertex normals based on the
-    average normals of adjacent faces.
-    
+    Produce vertex normals from the (weighted) average normals
+    of the faces which include each vertex.
+
     If vertices are merged with no regard to normal angle, this is
     going to render with weird shading.
+
+    Arguments
+    ---------
+    count:        int, number of vertices
+    faces:        (n,3) int, vertex indices of faces
+    face_normals: (n,3) float, unit normal of each face
+    weights:      None, (n) float weight of each face (IE area), or
+                  (n,3) float weight of each corner of every face (IE angle).
+                  If None every face is weighted equally.
+
+    Returns
+    ---------
+    vertex_normals: (count,3) float, unit normal of each vertex
     '''
-    vertex_normals = np.zeros((count, 3,3))
-    vertex_normals[[faces[:,0],0]] = face_normals
-    vertex_normals[[faces[:,1],1]] = face_normals
-    vertex_normals[[faces[:,2],2]] = face_normals
-    mean_normals        = vertex_normals.mean(axis=1)
+    faces = np.asanyarray(faces).view(np.ndarray)
+    if weights is None:
+        weights = np.ones(faces.shape)
+    weights = np.asanyarray(weights, dtype=np.float64)
+    if weights.shape != faces.shape:
+        weights = np.tile(weights.reshape((-1,1)), (1,3))
+
+    # accumulate the weighted normal of every face corner onto its
+    # vertex, where bincount sums every corner (unlike fancy assignment)
+    flat         = faces.reshape(-1)
+    mean_normals = np.column_stack([np.bincount(flat,
+                                                weights   = (weights * normal.reshape((-1,1))).reshape(-1),
+                                                minlength = count)
+                                    for normal in np.asanyarray(face_normals).T])
     unit_normals, valid = unitize(mean_normals, check_valid=True)
 
     mean_normals[valid] = unit_normals
-    # if the mean normal is zero, it generally means: 
-    # a) the vertex is only shared by 2 faces (mesh is not watertight)
-    # b) the two faces that share the vertex have 
-    #    normals pointed exactly opposite each other. 
+    # if the mean normal is zero, it generally means:
+    # a) the vertex isn't referenced by any face
+    # b) the faces that share the vertex have normals
+    #    which cancel each other out.
     # since this means the vertex normal isn't defined, just make it anything
     mean_normals[np.logical_not(valid)] = [1,0,0]
-    
-    return mean_normals
\ No newline at end of file
+
+    return mean_normals
@@ -2,23 +2,16 @@ import networkx as nx
 import numpy as np
 
 from collections import deque
-from copy import deepcopy
 
-from .constants import log, tol
-from .grouping  import group, group_rows, replace_references
+from .constants import log, tol, MeshError
+from .grouping  import group_rows, hashable_rows
 from .geometry  import faces_to_edges
 from .points    import unitize
 from .util      import diagonal_dot, is_sequence
 
-from scipy.spatial import cKDTree as KDTree
-
-try: 
-    from graph_tool import Graph as GTGraph
-    from graph_tool.topology import label_components
-    _has_gt = True
-except: 
-    _has_gt = False
-    log.warning('No graph-tool! Some operations will be much slower!')
+from scipy.spatial        import cKDTree as KDTree
+from scipy.sparse         import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 def face_adjacency(faces):
     '''
@@ -69,12 +62,7 @@ def facets_group(mesh):
     adjacent faces, and then if they are below TOL_ZERO, adding them to a graph
     of parallel faces. This method is 'fuzzier'
     '''
-    adjacency = nx.from_edgelist(mesh.face_adjacency)
-    facets    = deque()
-    for row_group in group_rows(mesh.face_normals):
-        if len(row_group) < 2: continue
-        facets.extend([list(i) for i in nx.connected_components(adjacency.subgraph(row_group)) if len(i) > 1])
-    return np.array(facets)
+    return groups_to_list(facets_groups(facets_labels(mesh, group_normals=True)))
 
 def facets(mesh):
     '''
@@ -89,23 +77,26 @@ def facets(mesh):
     facets: list of groups of face indexes (in mesh.faces) of parallel 
             adjacent faces. 
     '''
-    def facets_nx():
-        graph_parallel = nx.from_edgelist(face_idx[parallel])
-        facets_idx     = [list(i) for i in nx.connected_components(graph_parallel)]
-        return facets_idx
-        
-    def facets_gt():
-        graph_parallel = GTGraph()
-        graph_parallel.add_edge_list(face_idx[parallel])
-        connected  = label_components(graph_parallel, directed=False)[0].a
-        facets_idx = group(connected, min_len=2)
-        return facets_idx
+    return groups_to_list(facets_groups(facets_labels(mesh)))
+
+def facets_parallel(mesh):
+    '''
+    Check which pairs of adjacent faces are parallel.
 
+    Arguments
+    ---------
+    mesh: Trimesh
+
+    Returns
+    ---------
+    parallel: (len(mesh.face_adjacency)) bool, True for pairs of faces 
+              which should be in the same facet
+    '''
     # (n,2) list of adjacent face indices
     face_idx    = mesh.face_adjacency
 
     # test adjacent faces for angle
-    normal_pairs = mesh.face_normals[[face_idx]]
+    normal_pairs = mesh.face_normals[face_idx]
     normal_dot   = (np.sum(normal_pairs[:,0,:] * normal_pairs[:,1,:], axis=1) - 1)**2
 
     # if normals are actually equal, they are parallel with a high degree of confidence
@@ -125,10 +116,156 @@ def facets(mesh):
                                axis = 1).reshape((-1,3)) ** 2, axis=1)
     radius_sq = center_sq[non_parallel] / normal_dot[non_parallel]
     parallel[non_parallel] = radius_sq > tol.facet_rsq
+    return parallel
+
+def facets_labels(mesh, group_normals=False):
+    '''
+    Label every face with the facet it is part of, using connected 
+    components of the graph of parallel adjacent faces.
+
+    Arguments
+    ---------
+    mesh:          Trimesh
+    group_normals: bool, if True adjacent faces are only parallel if their
+                   normals are identical (the criteria of facets_group)
+
+    Returns
+    ---------
+    labels: (len(mesh.faces)) int, index of the facet of every face, or -1
+            for faces that aren't part of a facet of at least two faces
+    '''
+    # generating face normals removes degenerate faces, so they are
+    # found before anything sized by the number of faces
+    face_normals = mesh.face_normals
+    face_count   = len(mesh.faces)
+    labels       = np.zeros(face_count, dtype=np.int64) - 1
+    if face_count == 0: return labels
+
+    face_idx = mesh.face_adjacency
+    if group_normals:
+        hashable = hashable_rows(face_normals)
+        parallel = hashable[face_idx[:,0]] == hashable[face_idx[:,1]]
+    else:
+        parallel = facets_parallel(mesh)
+    pairs = face_idx[parallel]
+
+    graph = coo_matrix((np.ones(len(pairs), dtype=np.bool), 
+                        (pairs[:,0], pairs[:,1])),
+                       shape = (face_count, face_count))
+    components = connected_components(graph, directed=False)[1]
+    # a component with a single face isn't a facet
+    valid = np.bincount(components)[components] > 1
+    # renumber the remaining components consecutively from zero
+    labels[valid] = np.unique(components[valid], return_inverse=True)[1]
+    return labels
+
+def facets_groups(labels):
+    '''
+    Turn facet labels into groups of faces.
+
+    Arguments
+    ---------
+    labels: (n) int, facet index of every face or -1, from facets_labels
 
-    # graph-tool is ~6x faster than networkx but is more difficult to install
-    if _has_gt: return facets_gt()
-    else:       return facets_nx()
+    Returns
+    ---------
+    groups: (labels.max()+1, n) sparse boolean CSR matrix, where row i 
+            contains the faces of facet i, which are:
+            groups.indices[groups.indptr[i]:groups.indptr[i+1]]
+    '''
+    labels = np.asanyarray(labels)
+    faces  = np.nonzero(labels >= 0)[0]
+    count  = 0
+    if len(faces) > 0:
+        count = labels.max() + 1
+    groups = coo_matrix((np.ones(len(faces), dtype=np.bool), 
+                         (labels[faces], faces)),
+                        shape = (count, len(labels))).tocsr()
+    return groups
+
+def groups_to_list(groups):
+    '''
+    Convert a sparse CSR matrix of groups into a list of arrays.
+
+    Arguments
+    ---------
+    groups: (m, n) sparse CSR matrix
+
+    Returns
+    ---------
+    groups: (m) list of int arrays, the column indices of every row
+    '''
+    if groups.shape[0] == 0: return []
+    return np.split(groups.indices, groups.indptr[1:-1])
+
+def facets_properties(mesh, group_normals=False):
+    '''
+    Find the facets of a mesh and their properties, without looping 
+    over the facets.
+
+    Arguments
+    ---------
+    mesh:          Trimesh
+    group_normals: bool, use the facets_group criteria for parallel faces
+
+    Returns
+    ---------
+    properties: dict with keys, where m is the number of facets:
+       'labels'         : (len(mesh.faces)) int, facet of each face or -1
+       'groups'         : (m, len(mesh.faces)) sparse boolean CSR matrix,
+                          where row i contains the faces of facet i
+       'area'           : (m) float, area of each facet
+       'normal'         : (m,3) float, unit normal of each facet
+       'origin'         : (m,3) float, area weighted centroid of each facet
+       'boundary'       : (k,2) int, vertex indices of the edges around
+                          facets, wound the same direction as the faces
+       'boundary_facet' : (k) int, which facet each boundary edge is from
+    '''
+    labels = facets_labels(mesh, group_normals=group_normals)
+    groups = facets_groups(labels)
+    count  = groups.shape[0]
+
+    faces  = np.nonzero(labels >= 0)[0]
+    label  = labels[faces]
+    area   = mesh.area(sum=False)[faces]
+
+    def facet_sum(values):
+        # sum rows of (len(faces), 3) values by facet
+        return np.column_stack([np.bincount(label, 
+                                            weights   = column, 
+                                            minlength = count) 
+                                for column in (values * area.reshape((-1,1))).T])
+    facet_area = np.bincount(label, 
+                             weights   = area, 
+                             minlength = count)
+    normal = unitize(facet_sum(mesh.face_normals[faces]))
+    origin = facet_sum(mesh.triangles[faces].mean(axis=1))
+    if count > 0:
+        origin /= facet_area.reshape((-1,1))
+
+    # a unique edge is inside a facet if both faces sharing it are in 
+    # the same facet, every other edge of a facet face is on the boundary
+    topology  = mesh.topology
+    pairs     = labels[topology.face_adjacency]
+    same      = np.logical_and(pairs[:,0] == pairs[:,1], pairs[:,0] >= 0)
+    inside    = np.zeros(len(topology.edges_unique), dtype=np.bool)
+    inside[topology.face_adjacency_edges[same]] = True
+    edge_label = labels[topology.edges_face]
+    boundary   = np.logical_and(edge_label >= 0, 
+                                np.logical_not(inside[topology.edges_unique_inverse]))
+    boundary   = np.nonzero(boundary)[0]
+    # sort the boundary edges so the edges of each facet are contiguous
+    boundary   = boundary[edge_label[boundary].argsort(kind='mergesort')]
+    edges      = faces_to_edges(mesh.faces.view(np.ndarray), sort=False)
+
+    result = {'labels'         : labels,
+              'groups'         : groups,
+              'area'           : facet_area,
+              'normal'         : normal,
+              'origin'         : origin,
+              'boundary'       : edges[boundary],
+              'boundary_facet' : edge_label[boundary]}
+    return result
 
 def split(mesh, check_watertight=True, only_count=False):
     '''
@@ -136,6 +273,13 @@ def split(mesh, check_watertight=True, only_count=False):
     If check_watertight is true, it will only return meshes where each face has
     exactly 3 adjacent faces.
 
+    Components where every face has 2 or 3 adjacent faces are only missing
+    a few triangles, so we try to fill their holes before discarding them.
+
+    All components are built in one pass: faces are sorted by component label
+    and every component's vertex remap comes from a single unique over
+    (label, vertex) pairs, so new meshes are slices of contiguous buffers.
+
     Arguments
     ----------
     mesh: Trimesh 
@@ -150,97 +294,90 @@ def split(mesh, check_watertight=True, only_count=False):
     else:
         meshes: list of Trimesh objects
     '''
+    # accessing face normals may generate them and remove degenerate 
+    # faces, so they are accessed before the faces are labeled
+    face_normals = mesh.face_normals.view(np.ndarray)
+    labels = mesh.topology.face_components
+    if len(labels) == 0:
+        if only_count: return 0
+        return []
+    count = labels.max() + 1
+    if only_count: return count
+
+    # how many faces are in each component
+    face_count = np.bincount(labels, minlength=count)
+    keep       = np.ones(count, dtype=np.bool)
+    fill       = np.zeros(count, dtype=np.bool)
+    if check_watertight:
+        # the number of faces adjacent to each face
+        degree   = np.bincount(mesh.topology.face_adjacency.reshape(-1),
+                               minlength = len(labels))
+        # the number of faces in each component with 3 or 2 neighbors
+        degree_3 = np.bincount(labels, 
+                               weights   = degree == 3, 
+                               minlength = count)
+        degree_2 = np.bincount(labels, 
+                               weights   = degree == 2, 
+                               minlength = count)
+        watertight = degree_3 == face_count
+        fill       = np.logical_and(np.logical_not(watertight),
+                                    (degree_3 + degree_2) == face_count)
+        keep       = np.logical_or(watertight, fill)
+
+    # sort faces so every component is contiguous
+    order = labels.argsort(kind='mergesort')
+    faces = mesh.faces.view(np.ndarray)[order]
+
+    # every (label, vertex) pair as one int64 key, whose sorted unique 
+    # values are the vertices of each component in order
+    stride = np.int64(len(mesh.vertices))
+    keys   = labels[order].astype(np.int64).repeat(3) * stride + faces.reshape(-1)
+    unique, inverse = np.unique(keys, return_inverse=True)
+
+    # contiguous buffer of the vertices of every component
+    vertices     = mesh.vertices.view(np.ndarray)[unique % stride]
+    vertex_start = np.searchsorted(unique // stride, np.arange(count + 1))
+    face_start   = np.append(0, np.cumsum(face_count))
+
+    # faces referencing each component's own vertices, from zero
+    faces = (inverse.reshape((-1,3)) - 
+             vertex_start[:-1].repeat(face_count).reshape((-1,1)))
+    face_normals = face_normals[order]
+
+    meshes = deque()
+    for i in np.nonzero(keep)[0]:
+        f_slice  = slice(face_start[i],   face_start[i+1])
+        v_slice  = slice(vertex_start[i], vertex_start[i+1])
+        new_mesh = mesh.__class__(faces        = faces[f_slice],
+                                  face_normals = face_normals[f_slice],
+                                  vertices     = vertices[v_slice])
+        new_mesh.metadata.update(mesh.metadata)
+        if 'name' in new_mesh.metadata:
+            new_mesh.metadata['name'] = new_mesh.metadata['name'] + '_' + str(i)
+        if fill[i]: 
+            try:              new_mesh.fill_holes(raise_watertight=True)
+            except MeshError: continue
+        meshes.append(new_mesh)
 
-    def split_nx():
-        def mesh_from_components(connected_faces):
-            if check_watertight:
-                subgraph   = nx.subgraph(face_adjacency, connected_faces)
-                watertight = np.equal(list(subgraph.degree().values()), 3).all()
-                if not watertight: return
-            faces  = mesh.faces[[connected_faces]]
-            unique = np.unique(faces.reshape(-1))
-            replacement = dict()
-            replacement.update(np.column_stack((unique, np.arange(len(unique)))))
-            faces = replace_references(faces, replacement).reshape((-1,3))
-            new_meshes.append(mesh.__class__(vertices     = mesh.vertices[[unique]],
-                                             faces        = faces,
-                                             face_normals = mesh.face_normals[[connected_faces]]))
-        face_adjacency = nx.from_edgelist(mesh.face_adjacency)
-        new_meshes     = deque()
-        components     = [list(i) for i in nx.connected_components(face_adjacency)]
-        if only_count: return len(components)
-
-        for component in components: mesh_from_components(component)
-        log.info('split mesh into %i components.',
-                 len(new_meshes))
-        return list(new_meshes)
-
-    def split_gt():
-        g = GTGraph()
-        g.add_edge_list(mesh.face_adjacency)    
-        component_labels = label_components(g, directed=False)[0].a
-        if check_watertight: 
-            degree = g.degree_property_map('total').a
-        meshes     = deque()
-        components = group(component_labels)
-        if only_count: return len(components)
-
-        for i, current in enumerate(components):
-            fill_holes = False
-            if check_watertight:
-                degree_3 = degree[current] == 3
-                degree_2 = degree[current] == 2
-                if not degree_3.all():
-                    if np.logical_or(degree_3, degree_2).all():
-                        fill_holes = True
-                    else: 
-                        continue
-
-            # these faces have the original vertex indices
-            faces_original = mesh.faces[current]
-            face_normals   = mesh.face_normals[current]
-            # we find the unique vertex indices, so we can reindex from zero
-            unique_vert    = np.unique(faces_original)
-            vertices       = mesh.vertices[unique_vert]
-            replacement    = np.zeros(unique_vert.max()+1, dtype=np.int)
-            replacement[unique_vert] = np.arange(len(unique_vert))
-            faces                    = replacement[faces_original]
-            new_mesh = mesh.__class__(faces        = faces, 
-                                      face_normals = face_normals, 
-                                      vertices     = vertices)
-            new_meta = deepcopy(mesh.metadata)
-            if 'name' in new_meta:
-                new_meta['name'] = new_meta['name'] + '_' + str(i)
-            new_mesh.metadata.update(new_meta)
-            if fill_holes: 
-                try:              new_mesh.fill_holes(raise_watertight=True)
-                except MeshError: continue
-            meshes.append(new_mesh)
-        return list(meshes)
-
-    if _has_gt: 
-        return split_gt()
-    else:       
-        return split_nx()
+    log.info('split mesh into %i components.', len(meshes))
+    return list(meshes)
     
 def is_watertight(mesh):
-    def is_watertight_gt():
-        g = GTGraph()
-        g.add_edge_list(adjacency)
-        degree     = g.degree_property_map('total').a
-        watertight = np.equal(degree, 3).all()
-        return watertight
-    def is_watertight_nx():
-        g  = nx.from_edgelist(adjacency)
-        watertight = np.equal(list(g.degree().values()), 3).all()
-        return watertight
+    '''
+    Check if a mesh is watertight, which we define as every edge
+    being included by exactly two faces.
+
+    Arguments
+    ----------
+    mesh: Trimesh
 
+    Returns
+    ----------
+    watertight: bool
+    '''
     if len(mesh.faces) == 0: 
         return False
-    adjacency = mesh.face_adjacency
-    if len(adjacency) == 0:
-        return False
-    if _has_gt: 
-        return is_watertight_gt()
-    else:       
-        return is_watertight_nx()
+    # the unique edge counts are cached on the mesh topology
+    # until the faces of the mesh change
+    watertight = np.equal(mesh.topology.edges_unique_count, 2).all()
+    return bool(watertight)
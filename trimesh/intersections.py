@@ -1,7 +1,6 @@
 import numpy as np
 
 from .constants import log, tol
-from .geometry  import faces_to_edges
 from .points    import  unitize, project_to_plane 
 
 def mesh_plane_intersection(mesh, 
@@ -24,11 +23,19 @@ def mesh_plane_intersection(mesh,
     if plane_origin is None: 
         plane_origin = [0,0,0]
 
-    edges                 = faces_to_edges(mesh.faces, sort=True)
-    intersections, valid  = plane_line_intersection(plane_origin, 
-                                                    plane_normal, 
-                                                    mesh.vertices[[edges.T]],
-                                                    line_segments = True)
+    # every interior edge is shared by two faces, so we only intersect
+    # the unique edges and then map the results back onto the face edges
+    edges    = mesh.topology.edges_unique
+    inverse  = mesh.topology.edges_unique_inverse
+    vertices = mesh.vertices.view(np.ndarray)
+    unique_intersections, unique_valid = plane_line_intersection(plane_origin, 
+                                                                 plane_normal, 
+                                                                 vertices[edges.T],
+                                                                 line_segments = True)
+    # index of each valid unique edge in unique_intersections
+    unique_index  = np.cumsum(unique_valid) - 1
+    valid         = unique_valid[inverse]
+    intersections = unique_intersections[unique_index[inverse[valid]]]
     log.debug('mesh_cross_section found %i intersections', len(intersections))
     if return_planar:
         return project_to_plane(intersections.reshape((-1,3)),
@@ -1,6 +1,9 @@
 import numpy as np
 
-from ..constants import *
+from collections import deque
+
+from ..constants   import *
+from ..scene.scene import Scene
 
 def load_assimp(file_obj, file_type=None):
     '''
@@ -9,33 +12,144 @@ def load_assimp(file_obj, file_type=None):
 
     Assimp supports a huge number of mesh formats.
 
+    Vertex and face buffers are converted with numpy rather than element 
+    by element, the meshes referenced by a node are concatenated, and 
+    the node hierarchy is kept as the transform tree of a Scene. Nodes
+    referencing the same meshes share one Trimesh object.
+
     Performance notes: in tests on binary STL pyassimp was ~10x 
     slower than the native loader included in this package. 
     This is probably due to their recursive prettifying of the data structure.
     
     Also, you need a very recent version of PyAssimp for this function to work 
     (the commit was merged into the assimp github master on roughly 9/5/2014)
-    '''
 
-    def LPMesh_to_Trimesh(lp):
-        colors = (np.reshape(lp.colors, (-1,4))[:,0:3] * 255).astype(np.int)
-        return {'vertices'       : lp.vertices,
-                'vertex_normals' : lp.normals,
-                'faces'          : lp.faces,
-                'vertex_colors'  : colors}
+    Arguments
+    ---------
+    file_obj:  file name or open file- like object
+    file_type: str, file extension, IE 'dae'
 
+    Returns
+    ---------
+    loaded: kwargs for a Trimesh constructor if the file is a single mesh
+            without a transform, or otherwise a Scene
+    '''
     if not hasattr(file_obj, 'read'):
         # if there is no read attribute, we assume we've been passed a file name
         file_type = (str(file_obj).split('.')[-1]).lower()
         file_obj  = open(file_obj, 'rb')
 
-    scene  = pyassimp.load(file_obj, file_type=file_type)
-    meshes = list(map(LPMesh_to_Trimesh, scene.meshes))
-    pyassimp.release(scene)
+    raw = pyassimp.load(file_obj, file_type=file_type)
+    try:     
+        return _assimp_scene(raw)
+    finally: 
+        pyassimp.release(raw)
+
+def _assimp_scene(raw):
+    '''
+    Convert a scene loaded by pyassimp.
+
+    Arguments
+    ---------
+    raw: pyassimp scene, with meshes and a rootnode
+
+    Returns
+    ---------
+    loaded: kwargs for a Trimesh constructor if the scene is a single mesh
+            without a transform, or otherwise a Scene where every node
+            with meshes is a mesh of the same name
+    '''
+    # the base imports the loaders, so import it here
+    from ..base import Trimesh
+
+    converted = [_assimp_mesh(i) for i in raw.meshes]
+    # nodes reference meshes by object, or by index in older versions
+    indexes   = dict((id(mesh), i) for i, mesh in enumerate(raw.meshes))
+
+    scene = Scene()
+    # Trimesh objects by the indexes of the meshes they were created from
+    geometry = {}
+    # nodes can't use the name of the base frame
+    names    = set([scene.transforms.base_frame])
+    queue    = deque([[raw.rootnode, scene.transforms.base_frame]])
+    while len(queue) > 0:
+        node, parent = queue.popleft()
+        name = _assimp_name(getattr(node, 'name', None), names)
+        matrix = np.asarray(node.transformation, dtype=np.float64).reshape((4,4))
+        scene.transforms.update(frame_to   = name,
+                                frame_from = parent,
+                                matrix     = matrix)
+        key = tuple(indexes[id(i)] if id(i) in indexes else int(i) for i in node.meshes)
+        if len(key) > 0:
+            if not key in geometry:
+                geometry[key] = _assimp_concatenate([converted[i] for i in key])
+            scene.meshes[name] = key
+        queue.extend([child, name] for child in node.children)
 
-    if len(meshes) == 1: 
+    if (len(scene.meshes) == 1 and 
+        np.allclose(scene.transforms.get(list(scene.meshes.keys())[0]), np.eye(4))):
+        return list(geometry.values())[0]
+    geometry = dict((key, Trimesh(process=False, **kwargs)) 
+                    for key, kwargs in geometry.items())
+    for name, key in list(scene.meshes.items()):
+        scene.meshes[name] = geometry[key]
+    return scene
+
+def _assimp_mesh(mesh):
+    '''
+    Convert the buffers of a pyassimp mesh to kwargs for a Trimesh.
+    '''
+    vertices = np.asarray(mesh.vertices, dtype=np.float64).reshape((-1,3))
+    faces    = np.asarray(mesh.faces)
+    if faces.dtype.kind == 'O':
+        # older versions of pyassimp have a Face object with indices
+        faces = np.array([i.indices for i in mesh.faces if len(i.indices) == 3])
+    result = {'vertices' : vertices,
+              'faces'    : faces.astype(np.int64).reshape((-1,3))}
+
+    normals = np.asarray(getattr(mesh, 'normals', []), dtype=np.float64)
+    if normals.size == vertices.size:
+        result['vertex_normals'] = normals.reshape((-1,3))
+    # colors are RGBA floats for every color set, and we use the first
+    colors = np.asarray(getattr(mesh, 'colors', []), dtype=np.float64)
+    if colors.size >= len(vertices) * 4 and len(vertices) > 0:
+        colors = colors.reshape((-1,4))[:len(vertices),:3]
+        result['vertex_colors'] = np.round(colors * 255).astype(np.uint8)
+    name = getattr(mesh, 'name', None)
+    if name:
+        result['metadata'] = {'name' : str(name)}
+    return result
+
+def _assimp_concatenate(meshes):
+    '''
+    Concatenate the kwargs of meshes into the kwargs of one mesh.
+    '''
+    if len(meshes) == 1:
         return meshes[0]
-    return meshes
+    counts = [len(i['vertices']) for i in meshes]
+    offset = np.append(0, np.cumsum(counts)[:-1])
+    result = {'vertices' : np.vstack([i['vertices'] for i in meshes]),
+              'faces'    : np.vstack([i['faces'] + o for i, o in zip(meshes, offset)])}
+    # per vertex values are kept only if every mesh has them
+    for key in ['vertex_normals', 'vertex_colors']:
+        if all(key in i for i in meshes):
+            result[key] = np.vstack([i[key] for i in meshes])
+    if 'metadata' in meshes[0]:
+        result['metadata'] = dict(meshes[0]['metadata'])
+    return result
+
+def _assimp_name(name, names):
+    '''
+    A unique frame name for a node, as node names may be empty or repeated.
+    '''
+    name   = str(name) if name else 'node'
+    unique = name
+    count  = len(names)
+    while unique in names:
+        unique = name + '_' + str(count)
+        count += 1
+    names.add(unique)
+    return unique
  
 _assimp_loaders = {}
 try: 
@@ -1,12 +1,21 @@
 import numpy as np
-import struct
 import json
+import re
+import io
+
+from itertools import chain
 
 from ..constants import log
+from ..util      import is_string
+from .stl        import _stl_dtype, _stl_dtype_header
+from .ply        import _ply_exporters
+from .gltf       import _gltf_exporters
+from .native     import _native_exporters
 
-#python 3
-try:                from cStringIO import StringIO
-except ImportError: from io import StringIO
+# how many faces to fill at once when exporting STL files
+_STL_CHUNK = 2**16
+# how many rows to format at once when exporting text
+_TEXT_CHUNK = 2**14
 
 def export_mesh(mesh, file_obj, file_type=None):
     '''
@@ -41,73 +50,110 @@ def export_mesh(mesh, file_obj, file_type=None):
 def export_stl(mesh, file_obj=None):
     '''
     Saves a Trimesh object as a binary STL file.
+
+    The faces are packed into a preallocated structured array, which is
+    written to file_obj in a single call.
+
+    Arguments
+    ---------
+    mesh:     Trimesh object
+    file_obj: file- like object to write to, or None
+
+    Returns
+    ---------
+    if file_obj is None: bytes of the binary STL file
+    else:                True
     '''
-    
-    temp_file = StringIO()
-    if len(np.shape(mesh.face_normals)) != 2: 
-        mesh.generate_normals()
-
-    def write_face(vertices, normal):
-        #vertices: (3,3) array of floats
-        #normal:   (3) array of floats
-        temp_file.write(struct.pack('<3f', *normal))
-        for vertex in vertices: 
-            temp_file.write(struct.pack('<3f', *vertex))
-        temp_file.write(struct.pack('<h', 0))
-    
-    #write a blank header
-    temp_file.write(struct.pack("<80x"))
-    #write the number of faces
-    temp_file.write(struct.pack("@i", len(mesh.faces)))
-    # write the faces
-    # TODO: remove the for loop and do this as a single struct.pack operation
-    # like we do in the loader, as it is way, way faster.
-    for index in range(len(mesh.faces)):
-        write_face(mesh.vertices[[mesh.faces[index]]], 
-                   mesh.face_normals[index])
-    temp_file.seek(0)
-    data = temp_file.read()
-    return _write_export(data, file_obj)
-
-def export_off(mesh, file_obj=None):
-    export = 'OFF\n'
-    export += str(len(mesh.vertices)) + ' ' + str(len(mesh.faces)) + ' 0\n'
-    temp_obj = StringIO()
-    faces_stacked = np.column_stack((np.ones(len(mesh.faces))*3, mesh.faces))
-    np.savetxt(temp_obj, mesh.vertices, fmt='%.14f')
-    np.savetxt(temp_obj, faces_stacked, fmt='%i')
-    temp_obj.seek(0)
-    export += temp_obj.read()
-    return _write_export(export, file_obj)
+    # accessing face normals will generate them if they aren't valid,
+    # which removes degenerate faces, so they are accessed first
+    normals  = mesh.face_normals
+    vertices = mesh.vertices.view(np.ndarray)
+    faces    = mesh.faces.view(np.ndarray)
+
+    # the header is 80 blank bytes and the number of faces
+    header = np.zeros(1, dtype=_stl_dtype_header)
+    header['face_count'] = len(faces)
+
+    data = np.zeros(len(faces), dtype=_stl_dtype)
+    data['normals'] = normals
+    # fill the vertices in chunks to avoid a full size (n,3,3) 
+    # float64 temporary array of triangles
+    for start in range(0, len(faces), _STL_CHUNK):
+        stop = start + _STL_CHUNK
+        data['vertices'][start:stop] = vertices[faces[start:stop]]
+
+    if file_obj is None:
+        return header.tostring() + data.tostring()
+    # structured arrays expose their memory as a buffer, 
+    # so they are written without an intermediate copy
+    file_obj.write(header.data)
+    file_obj.write(data.data)
+    return True
+
+def export_off(mesh, file_obj=None, digits=14):
+    '''
+    Export a mesh as an OFF file.
 
-def export_collada(mesh, file_obj=None):
+    Arguments
+    ---------
+    mesh:     Trimesh object
+    file_obj: file- like object to write to, or None
+    digits:   int, number of decimal places of vertex coordinates
+
+    Returns
+    ---------
+    if file_obj is None: str of the OFF file
+    else:                True
     '''
-    Export a mesh as collada, to filename
+    vertices = mesh.vertices.view(np.ndarray)
+    faces    = mesh.faces.view(np.ndarray)
+    export   = [['OFF\n%d %d 0\n' % (len(vertices), len(faces))],
+                _text_rows(vertices, ' '.join(['%.' + str(int(digits)) + 'f'] * 3) + '\n'),
+                _text_rows(faces,    '3 %d %d %d\n')]
+    return _write_export(chain(*export), file_obj)
+
+def export_collada(mesh, file_obj=None, digits=5):
+    '''
+    Export a mesh as a COLLADA file.
+
+    The template is written in pieces, with the arrays formatted in 
+    chunks between them.
+
+    Arguments
+    ---------
+    mesh:     Trimesh object
+    file_obj: file- like object to write to, or None
+    digits:   int, number of decimal places of vertices and normals
+
+    Returns
+    ---------
+    if file_obj is None: str of the COLLADA file
+    else:                True
     '''
     import os, inspect
-    from string import Template
     
     MODULE_PATH = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
-    template    = Template(open(os.path.join(MODULE_PATH, 
-                                             'templates', 
-                                             'collada_template.dae'), 'rb').read())
-
-    # we bother setting this because np.array2string uses these printoptions 
-    np.set_printoptions(threshold=np.inf, precision=5, linewidth=np.inf)
+    with open(os.path.join(MODULE_PATH, 
+                           'templates', 
+                           'collada_template.dae'), 'rb') as template_file:
+        template = template_file.read().decode('utf-8')
 
+    float_row   = ' '.join(['%.' + str(int(digits)) + 'f'] * 3) + '\n'
     replacement = dict()
-    replacement['VERTEX']   = np.array2string(mesh.vertices.reshape(-1))[1:-1]
-    replacement['FACES']    = np.array2string(mesh.faces.reshape(-1))[1:-1]
-    replacement['NORMALS']  = np.array2string(mesh.vertex_normals.reshape(-1))[1:-1]
-    replacement['VCOUNT']   = str(len(mesh.vertices))
-    replacement['VCOUNTX3'] = str(len(mesh.vertices) * 3)
-    replacement['FCOUNT']   = str(len(mesh.faces))
-
-    export = template.substitute(replacement)
+    replacement['VERTEX']   = _text_rows(mesh.vertices.view(np.ndarray), float_row)
+    replacement['FACES']    = _text_rows(mesh.faces.view(np.ndarray), '%d %d %d\n')
+    replacement['NORMALS']  = _text_rows(mesh.vertex_normals, float_row)
+    replacement['VCOUNT']   = [str(len(mesh.vertices))]
+    replacement['VCOUNTX3'] = [str(len(mesh.vertices) * 3)]
+    replacement['FCOUNT']   = [str(len(mesh.faces))]
+
+    # the template split on $KEY is alternating text and keys
+    pieces = re.split(r'\$(\w+)', template)
+    export = chain(*[[piece] if i % 2 == 0 else replacement[piece]
+                     for i, piece in enumerate(pieces)])
     return _write_export(export, file_obj)
 
 def export_json(mesh, file_obj=None):
-    mesh.verify_vertex_normals()
     # the zeros indicate triangular faces
     indices = np.column_stack((np.zeros(len(mesh.faces), dtype=int), 
                                mesh.faces)).reshape(-1)
@@ -121,27 +167,68 @@ def export_json(mesh, file_obj=None):
 
     return _write_export(export, file_obj)
         
+def _text_rows(array, row_format, chunk_size=_TEXT_CHUNK):
+    '''
+    Generate the text of every row of an array, by filling a template of
+    row_format repeated for a chunk of rows with a single % operation.
+
+    Arguments
+    ---------
+    array:      (n,m) array
+    row_format: str, format of one row with m values, IE '%d %d %d\\n'
+    chunk_size: int, number of rows to format at once
+
+    Returns
+    ---------
+    text: generator of str, the formatted rows of each chunk
+    '''
+    array    = np.asanyarray(array)
+    template = row_format * chunk_size
+    for start in range(0, len(array), chunk_size):
+        chunk = array[start:start + chunk_size]
+        if len(chunk) < chunk_size:
+            template = row_format * len(chunk)
+        # python scalars from tolist format much faster than numpy scalars
+        yield template % tuple(chunk.reshape(-1).tolist())
+
 def _write_export(export, file_obj=None):
     '''
-    Write a string to a file.
+    Write a string, or an iterable of strings, to a file.
     If file_obj isn't specified, return the string
 
     Arguments
     ---------
-    export: a string of the export data
-    file_obj: a file-like object or a filename
+    export: a string of the export data, or an iterable of strings
+            which are written as they are generated
+    file_obj: a file-like object opened in text or binary mode, or a filename
     '''
-
+    if is_string(export):
+        export = [export]
     if file_obj is None:             
-        return export
+        return ''.join(export)
     elif hasattr(file_obj, 'write'): 
         out_file = file_obj
     else: 
         out_file = open(file_obj, 'wb')
-    out_file.write(export)
+    # text files (IE StringIO or open(name, 'w')) are written strings
+    is_text = isinstance(out_file, io.TextIOBase)
+    try:
+        for chunk in export:
+            if not is_text:
+                chunk = chunk.encode('utf-8')
+            elif isinstance(chunk, bytes):
+                # python 2 strings
+                chunk = chunk.decode('utf-8')
+            out_file.write(chunk)
+    finally:
+        if out_file is not file_obj:
+            out_file.close()
     return True
 
 _mesh_exporters = {'stl'  : export_stl,
                    'json' : export_json,
                    'dae'  : export_collada,
                    'off'  : export_off}
+_mesh_exporters.update(_ply_exporters)
+_mesh_exporters.update(_gltf_exporters)
+_mesh_exporters.update(_native_exporters)
@@ -0,0 +1,284 @@
+import numpy as np
+import json
+
+from ..transformations import quaternion_matrix
+
+# magic numbers of the GLB header and chunks
+_glb_magic = 0x46546C67
+_glb_json  = 0x4E4F534A
+_glb_bin   = 0x004E4942
+
+# glTF component types and their numpy equivalent
+_gltf_dtypes = {5120 : '<i1',
+                5121 : '<u1',
+                5122 : '<i2',
+                5123 : '<u2',
+                5125 : '<u4',
+                5126 : '<f4'}
+# number of components of each glTF accessor type
+_gltf_widths = {'SCALAR' : 1,
+                'VEC2'   : 2,
+                'VEC3'   : 3,
+                'VEC4'   : 4,
+                'MAT4'   : 16}
+# bufferView targets for vertex attributes and indices
+_gltf_vertex_target = 34962
+_gltf_index_target  = 34963
+
+def export_glb(mesh, file_obj=None):
+    '''
+    Export a Trimesh or a Scene as a binary glTF (GLB) file.
+
+    Vertices, faces, vertex normals and vertex colors are converted
+    once to the dtype glTF requires and written as 4 byte aligned buffer
+    views directly from their memory, without any text conversion.
+
+    For a Scene every mesh is a node with its transform from the base
+    frame, and meshes added under several names share their buffers.
+
+    Arguments
+    ---------
+    mesh:     Trimesh or Scene object
+    file_obj: file- like object to write to, or None
+
+    Returns
+    ---------
+    if file_obj is None: bytes of the GLB file
+    else:                True
+    '''
+    if hasattr(mesh, 'transforms'):
+        names = sorted(mesh.meshes.keys())
+        nodes = [[name, mesh.meshes[name], mesh.transforms.get(name)] for name in names]
+    else:
+        nodes = [[mesh.metadata.get('name', 'mesh_0'), mesh, np.eye(4)]]
+
+    tree = {'asset'       : {'version'   : '2.0',
+                             'generator' : 'trimesh'},
+            'scene'       : 0,
+            'scenes'      : [{'nodes' : list(range(len(nodes)))}],
+            'nodes'       : [],
+            'meshes'      : [],
+            'accessors'   : [],
+            'bufferViews' : []}
+    # arrays to write to the binary chunk
+    buffers = []
+    # index in tree['meshes'] of meshes already exported, by id
+    exported = {}
+
+    def add_accessor(array, accessor_type, target, **kwargs):
+        '''
+        Add an array as a bufferView and an accessor for it.
+        '''
+        array  = np.ascontiguousarray(array)
+        offset = sum(len(i) for i in buffers)
+        tree['bufferViews'].append({'buffer'     : 0,
+                                    'byteOffset' : offset,
+                                    'byteLength' : array.nbytes,
+                                    'target'     : target})
+        buffers.append(array.view(np.uint8).reshape(-1))
+        # every buffer view starts on a 4 byte boundary
+        if array.nbytes % 4 != 0:
+            buffers.append(np.zeros(4 - (array.nbytes % 4), dtype=np.uint8))
+        component = [k for k, v in _gltf_dtypes.items() if np.dtype(v) == array.dtype][0]
+        accessor  = {'bufferView'    : len(tree['bufferViews']) - 1,
+                     'componentType' : component,
+                     'count'         : len(array),
+                     'type'          : accessor_type}
+        accessor.update(kwargs)
+        tree['accessors'].append(accessor)
+        return len(tree['accessors']) - 1
+
+    for name, geometry, transform in nodes:
+        node = {'name' : str(name)}
+        # glTF accessors and meshes can't be empty, so an empty mesh 
+        # is exported as a node without a mesh
+        if len(geometry.vertices) > 0 and len(geometry.faces) > 0:
+            if not id(geometry) in exported:
+                vertices = geometry.vertices.view(np.ndarray).astype('<f4')
+                attributes = {'POSITION' : add_accessor(vertices,
+                                                        'VEC3',
+                                                        _gltf_vertex_target,
+                                                        min = vertices.min(axis=0).tolist(),
+                                                        max = vertices.max(axis=0).tolist()),
+                              'NORMAL'   : add_accessor(geometry.vertex_normals.astype('<f4'),
+                                                        'VEC3',
+                                                        _gltf_vertex_target)}
+                if geometry.visual._vertex_colors_ok or geometry.visual._face_colors_ok:
+                    # glTF colors are per vertex, and need 4 bytes to stay aligned
+                    colors = np.zeros((len(vertices), 4), dtype='<u1')
+                    colors[:,3]  = 255
+                    colors[:,:3] = geometry.visual.vertex_colors
+                    attributes['COLOR_0'] = add_accessor(colors,
+                                                         'VEC4',
+                                                         _gltf_vertex_target,
+                                                         normalized = True)
+                faces = geometry.faces.view(np.ndarray).astype('<u4').reshape(-1)
+                primitive = {'attributes' : attributes,
+                             'indices'    : add_accessor(faces,
+                                                         'SCALAR',
+                                                         _gltf_index_target),
+                             'mode'       : 4}
+                exported[id(geometry)] = len(tree['meshes'])
+                tree['meshes'].append({'name'       : str(name),
+                                       'primitives' : [primitive]})
+            node['mesh'] = exported[id(geometry)]
+        if not np.allclose(transform, np.eye(4)):
+            # glTF matrices are column major
+            node['matrix'] = np.asanyarray(transform, dtype=np.float64).T.reshape(-1).tolist()
+        tree['nodes'].append(node)
+
+    length = sum(len(i) for i in buffers)
+    tree['buffers'] = [{'byteLength' : length}]
+
+    # the JSON chunk is padded with spaces to a 4 byte boundary
+    content  = json.dumps(tree, separators=(',', ':')).encode('utf-8')
+    content += b' ' * ((4 - (len(content) % 4)) % 4)
+    header   = np.array([_glb_magic,
+                         2,
+                         12 + 8 + len(content) + 8 + length,
+                         len(content),
+                         _glb_json], dtype='<u4')
+    bin_head = np.array([length, _glb_bin], dtype='<u4')
+
+    if file_obj is None:
+        return b''.join([header.tostring(), content, bin_head.tostring()] +
+                        [i.tostring() for i in buffers])
+    file_obj.write(header.tostring())
+    file_obj.write(content)
+    file_obj.write(bin_head.tostring())
+    for buffer in buffers:
+        file_obj.write(buffer.data)
+    return True
+
+def load_glb(file_obj, file_type=None):
+    '''
+    Load the triangle meshes of a binary glTF (GLB) file.
+
+    Accessors are read as strided views of the binary chunk.
+
+    Arguments
+    ---------
+    file_obj:  open file- like object
+    file_type: not used
+
+    Returns
+    ---------
+    loaded: list of kwargs for Trimesh constructors, one for every
+            mesh primitive of every node. The node name and its (4,4)
+            transform from the scene root are in metadata.
+    '''
+    header = np.frombuffer(file_obj.read(20), dtype='<u4')
+    if len(header) != 5 or header[0] != _glb_magic:
+        raise ValueError('Not a GLB file!')
+    if header[1] != 2:
+        raise ValueError('Only glTF version 2 is supported!')
+    if header[4] != _glb_json:
+        raise ValueError('GLB is missing JSON chunk!')
+    tree = json.loads(file_obj.read(int(header[3])).decode('utf-8'))
+
+    data     = b''
+    bin_head = np.frombuffer(file_obj.read(8), dtype='<u4')
+    if len(bin_head) == 2 and bin_head[1] == _glb_bin:
+        data = file_obj.read(int(bin_head[0]))
+
+    loaded = []
+    for name, mesh_index, transform in _gltf_nodes(tree):
+        primitives = tree['meshes'][mesh_index]['primitives']
+        for index, primitive in enumerate(primitives):
+            # only triangles are loaded
+            if primitive.get('mode', 4) != 4:
+                continue
+            attributes = primitive['attributes']
+            vertices   = _gltf_accessor(tree, data, attributes['POSITION'])
+            if 'indices' in primitive:
+                faces = _gltf_accessor(tree, data, primitive['indices'])
+            else:
+                faces = np.arange(len(vertices))
+            kwargs = {'vertices' : vertices.astype(np.float64),
+                      'faces'    : faces.astype(np.int64).reshape((-1,3))}
+            if 'NORMAL' in attributes:
+                kwargs['vertex_normals'] = _gltf_accessor(tree, data, attributes['NORMAL']).astype(np.float64)
+            if 'COLOR_0' in attributes:
+                colors = _gltf_accessor(tree, data, attributes['COLOR_0'])[:,:3]
+                if colors.dtype.kind == 'f':
+                    colors = np.round(colors * 255)
+                elif colors.dtype.itemsize == 2:
+                    colors = colors // 257
+                kwargs['vertex_colors'] = colors.astype(np.uint8)
+            kwargs['metadata'] = {'name'      : name,
+                                  'transform' : transform}
+            if len(primitives) > 1:
+                kwargs['metadata']['name'] += '_' + str(index)
+            loaded.append(kwargs)
+    if len(loaded) == 0:
+        raise ValueError('No triangles in GLB file!')
+    return loaded
+
+def _gltf_accessor(tree, data, index):
+    '''
+    View the values of a glTF accessor in the binary chunk.
+
+    Arguments
+    ---------
+    tree:  dict, glTF JSON
+    data:  bytes, binary chunk
+    index: int, accessor index
+
+    Returns
+    ---------
+    values: (n) or (n,m) read- only array referencing data
+    '''
+    accessor = tree['accessors'][index]
+    view     = tree['bufferViews'][accessor['bufferView']]
+    if view.get('buffer', 0) != 0:
+        raise ValueError('External glTF buffers are not supported!')
+    dtype  = np.dtype(_gltf_dtypes[accessor['componentType']])
+    width  = _gltf_widths[accessor['type']]
+    stride = view.get('byteStride', dtype.itemsize * width)
+    values = np.ndarray(shape   = (accessor['count'], width),
+                        dtype   = dtype,
+                        buffer  = data,
+                        offset  = view.get('byteOffset', 0) + accessor.get('byteOffset', 0),
+                        strides = (stride, dtype.itemsize))
+    if width == 1:
+        return values.reshape(-1)
+    return values
+
+def _gltf_nodes(tree):
+    '''
+    Find every node of the default glTF scene which has a mesh.
+
+    Arguments
+    ---------
+    tree: dict, glTF JSON
+
+    Returns
+    ---------
+    nodes: list of (name, mesh index, (4,4) transform from the scene root)
+    '''
+    if 'scenes' in tree:
+        roots = tree['scenes'][tree.get('scene', 0)]['nodes']
+    else:
+        roots = range(len(tree.get('nodes', [])))
+    result = []
+    queue  = [[i, np.eye(4)] for i in roots]
+    while len(queue) > 0:
+        index, parent = queue.pop(0)
+        node = tree['nodes'][index]
+        if 'matrix' in node:
+            matrix = np.reshape(node['matrix'], (4,4)).T
+        else:
+            # translation, rotation and scale, where quaternions are XYZW
+            matrix = quaternion_matrix(np.roll(node.get('rotation', [0,0,0,1]), 1))
+            matrix[:3,:3] *= node.get('scale', [1,1,1])
+            matrix[:3,3]   = node.get('translation', [0,0,0])
+        transform = np.dot(parent, matrix)
+        if 'mesh' in node:
+            result.append((node.get('name', 'node_' + str(index)),
+                           node['mesh'],
+                           transform))
+        queue.extend([i, transform] for i in node.get('children', []))
+    return result
+
+_gltf_loaders   = {'glb' : load_glb}
+_gltf_exporters = {'glb' : export_glb}
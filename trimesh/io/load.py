@@ -1,6 +1,21 @@
 import numpy as np
+import os
+import re
+import io
+import bz2
+import gzip
+import shutil
+import zipfile
+import tempfile
+import traceback
+
+from multiprocessing import Pool
+
+try:                import lzma
+except ImportError: lzma = None
 
 from ..base      import Trimesh
+from ..scene     import Scene
 
 from ..constants import _log_time, log
 from ..util      import is_file, is_string, make_sequence
@@ -9,46 +24,397 @@ from .assimp import _assimp_loaders
 from .stl    import _stl_loaders
 from .misc   import _misc_loaders
 from .step   import _step_loaders
+from .ply    import _ply_loaders
+from .gltf   import _gltf_loaders
+from .native import _native_loaders, load_native, export_native
 
 def available_formats():
     return _mesh_loaders.keys()
 
 @_log_time
-def load_mesh(file_obj, file_type=None, process=True):
+def load_mesh(file_obj, file_type=None, process=True, **kwargs):
     '''
     Load a mesh file into a Trimesh object
 
+    Gzip, bz2, xz and zip compressed files are decompressed in memory,
+    and if the file type isn't specified or can't be determined from
+    the file name it is detected from the contents.
+
     Arguments
     ---------
-    file_obj: a filename string or a file-like object
+    file_obj: a filename string, a file-like object, or an object 
+              supporting the buffer protocol (IE bytes) with file data
     file_type: str representing file type (eg: 'stl')
-    process:   boolean flag, whether to process the mesh on load
+    process:   boolean flag, whether to process the mesh on load, or 
+               'lazy' to process it when faces or vertices are first
+               accessed, leaving bounds, triangles and area available
+               on the unprocessed mesh
+    kwargs:    passed to the loader for the file type, 
+               IE face_colors=True for STL
 
     Returns:
     mesh: a single Trimesh object, or a list of Trimesh objects, 
-          depending on the file format. 
+          depending on the file format. Formats with a node hierarchy
+          loaded by assimp return a Scene.
     
     '''
-
+    name = ''
     if is_string(file_obj):
-        file_type = (str(file_obj).split('.')[-1]).lower()
-        file_obj  = open(file_obj, 'rb')
-        
-    file_type = str(file_type).lower()
-    
-    loaded = _mesh_loaders[file_type](file_obj, file_type)
-    file_obj.close()
+        name     = str(file_obj)
+        file_obj = open(file_obj, 'rb')
+    elif not hasattr(file_obj, 'read'):
+        file_obj = BufferFile(file_obj)
     
-    log.debug('loaded mesh using %s',
-              _mesh_loaders[file_type].__name__)
+    meshes = []
+    for member, stream, member_type, archived in _decompressed(file_obj, name, file_type):
+        member_type = _file_type(stream, member, member_type)
+        if member_type is None:
+            if archived:
+                # files in an archive which aren't meshes are skipped
+                log.debug('skipping %s, as it isn\'t a mesh', member)
+                continue
+            raise ValueError('File type of ' + (name or 'file object') + ' not recognized!')
+
+        loaded = _mesh_loaders[member_type](stream, member_type, **kwargs)
+        log.debug('loaded mesh using %s',
+                  _mesh_loaders[member_type].__name__)
 
-    meshes = [Trimesh(process=process, **i) for i in make_sequence(loaded)]
+        for item in make_sequence(loaded):
+            if isinstance(item, Scene):
+                # meshes of a scene may be shared by several nodes
+                shared = dict((id(i), i) for i in item.meshes.values())
+                for mesh in shared.values():
+                    if process == 'lazy': mesh._process_pending = True
+                    elif process:         mesh.process()
+                meshes.append(item)
+            elif isinstance(item, Trimesh):
+                # loaders may return a Trimesh directly, IE when stored as it was
+                meshes.append(item)
+            else:
+                meshes.append(Trimesh(process=process, **item))
+    file_obj.close()
     
     if len(meshes) == 1: return meshes[0]
     return meshes
 
+def sniff_file_type(file_obj):
+    '''
+    Detect the type of a mesh or compressed file from its contents.
+
+    Arguments
+    ---------
+    file_obj: seekable file- like object, which is returned to 
+              its current position
+
+    Returns
+    ---------
+    file_type: str, IE 'stl', 'ply' or 'gz', or None if not recognized
+    '''
+    start = file_obj.tell()
+    head  = file_obj.read(_SNIFF_SIZE)
+    file_obj.seek(0, 2)
+    length = file_obj.tell() - start
+    file_obj.seek(start)
+
+    for magic, file_type in _magic_types:
+        if head.startswith(magic): 
+            return file_type
+    # binary STL files are exactly the length the header specifies, 
+    # which is checked first as their header may also start with 'solid'
+    if len(head) >= 84:
+        count = int(np.frombuffer(head[80:84], dtype='<u4')[0])
+        if length == 84 + (count * 50):
+            return 'stl'
+    text = head.decode('utf-8', 'ignore')
+    # skip blank lines and comments
+    lines = [i.split() for i in text.splitlines() if len(i.strip()) > 0]
+    lines = [i for i in lines if not i[0].startswith('#')]
+    if len(lines) == 0:
+        return None
+    if lines[0][0].lower() == 'solid':
+        return 'stl'
+    if re.match(r'^[A-Z0-9]*OFF', lines[0][0]):
+        return 'off'
+    if lines[0][0] in _obj_keywords:
+        return 'obj'
+    return None
+
+class BufferFile(object):
+    '''
+    A read- only file- like object over any object supporting the buffer 
+    protocol (bytes, bytearray, memoryview, numpy arrays or mmap), where 
+    only the data which is read is copied, and loaders can view the 
+    data without copying it with BufferFile.buffer.
+    '''
+    def __init__(self, data):
+        self._data = memoryview(data)
+        if hasattr(self._data, 'cast'):
+            # index by byte, rather than by item
+            self._data = self._data.cast('B')
+        self._position = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = len(self._data) - self._position
+        start = self._position
+        self._position = min(start + size, len(self._data))
+        return self._data[start:self._position].tobytes()
+
+    def buffer(self, offset, size):
+        '''
+        A memoryview of size bytes from offset, which shares memory with
+        the data rather than copying it like read.
+        '''
+        return self._data[offset:offset + size]
+
+    def readline(self):
+        # search for the newline in blocks, rather than the whole buffer
+        start = self._position
+        while self._position < len(self._data):
+            block = self._data[self._position:self._position + 2**16].tobytes()
+            index = block.find(b'\n')
+            if index >= 0:
+                self._position += index + 1
+                break
+            self._position += len(block)
+        return self._data[start:self._position].tobytes()
+
+    def seek(self, offset, whence=0):
+        base = [0, self._position, len(self._data)][whence]
+        self._position = int(np.clip(base + offset, 0, len(self._data)))
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        pass
+
+def _decompressed(file_obj, name, file_type=None):
+    '''
+    Generate the file- like objects of a possibly compressed file.
+
+    Arguments
+    ---------
+    file_obj:  file- like object
+    name:      str, file name, or '' if unknown
+    file_type: str, file type passed by the caller, or None
+
+    Returns
+    ---------
+    streams: generator of (name, file- like object, file type, archived)
+             where name has the extension of the compression removed, or 
+             is the name of the archive member. The passed file type 
+             applies to the file and its decompressed contents, but it is
+             None for members of an archive, where archived is True.
+    '''
+    if not _seekable(file_obj):
+        if file_type is not None and str(file_type).lower() in _mesh_loaders:
+            # streams of a known mesh type are passed to the loader as they are
+            yield name, file_obj, file_type, False
+            return
+        # sniffing the contents requires seeking
+        file_obj = io.BytesIO(file_obj.read())
+
+    kind = sniff_file_type(file_obj)
+    if kind == 'zip':
+        archive = zipfile.ZipFile(file_obj)
+        for member in archive.namelist():
+            if member.endswith('/'): continue
+            # loaders seek, so members are decompressed into memory
+            for result in _decompressed(io.BytesIO(archive.read(member)), member):
+                yield result[:3] + (True,)
+        return
+    if kind in _decompressors:
+        data  = _decompressors[kind](file_obj)
+        inner = re.sub(r'\.' + kind + '$', '', name, flags=re.IGNORECASE)
+        for result in _decompressed(io.BytesIO(data), inner, file_type):
+            yield result
+        return
+    yield name, file_obj, file_type, False
+
+def _seekable(file_obj):
+    '''
+    Whether a file- like object supports seeking, which python 2 files
+    don't report.
+    '''
+    if hasattr(file_obj, 'seekable'):
+        return bool(file_obj.seekable())
+    return hasattr(file_obj, 'seek')
+
+def _file_type(file_obj, name, file_type=None):
+    '''
+    The loader key for a file, from the passed file type, the file name
+    extension, or the contents of the file, in that order.
+    '''
+    for candidate in [file_type, name.split('.')[-1]]:
+        if candidate is not None and str(candidate).lower() in _mesh_loaders:
+            return str(candidate).lower()
+    sniffed = sniff_file_type(file_obj)
+    if sniffed in _mesh_loaders:
+        return sniffed
+    return None
+
+def load_many(paths, workers=None, process=True, **kwargs):
+    '''
+    Load many mesh files, parsing and processing them in a pool of 
+    worker processes.
+
+    Workers save each loaded mesh in the native format to a temporary
+    directory, which is memory mapped by this process. This avoids
+    pickling the arrays back through the pool. For a Scene, every 
+    mesh is saved once however many nodes share it, and the Scene 
+    is rebuilt from its transforms in this process.
+
+    Arguments
+    ---------
+    paths:   sequence of file names
+    workers: int, number of processes, or None for one per CPU. 
+             If 1, files are loaded in this process.
+    process: boolean flag, whether to process the meshes on load
+    kwargs:  passed to load_mesh
+
+    Returns
+    ---------
+    results: generator of (path, mesh, error) in the order loading
+             finishes, where mesh is what load_mesh returns, IE a Trimesh,
+             a Scene or a list of them, or None with error containing 
+             the traceback if loading failed
+    '''
+    paths = list(paths)
+    if workers == 1:
+        for path in paths:
+            try:
+                yield path, load_mesh(path, process=process, **kwargs), None
+            except Exception:
+                log.error('Unable to load %s', path, exc_info=True)
+                yield path, None, traceback.format_exc()
+        return
+
+    directory = tempfile.mkdtemp()
+    tasks     = [(path, os.path.join(directory, str(i)), process, kwargs)
+                 for i, path in enumerate(paths)]
+    pool = Pool(workers)
+    try:
+        for path, items, error in pool.imap_unordered(_load_worker, tasks):
+            if error is not None:
+                log.error('Unable to load %s:\n%s', path, error)
+                yield path, None, error
+                continue
+            meshes = [_worker_result(i) for i in items]
+            if len(meshes) == 1: meshes = meshes[0]
+            yield path, meshes, None
+    finally:
+        pool.terminate()
+        shutil.rmtree(directory, ignore_errors=True)
+
+def _load_worker(task):
+    '''
+    Load a mesh in a worker process of load_many, and save it in the 
+    native format.
+
+    Arguments
+    ---------
+    task: (path, file name prefix, process, kwargs for load_mesh)
+
+    Returns
+    ---------
+    path:  the path that was loaded
+    items: list, with the native file written for every mesh, or for
+           a Scene a dict with its base frame, exported transforms and
+           the native file of every mesh by name
+    error: None, or str of the traceback if loading failed
+    '''
+    path, prefix, process, kwargs = task
+    try:
+        loaded = make_sequence(load_mesh(path, process=process, **kwargs))
+        items  = []
+        for i, mesh in enumerate(loaded):
+            name = prefix + '_' + str(i)
+            if not isinstance(mesh, Scene):
+                items.append(_export_worker_mesh(mesh, name))
+                continue
+            # meshes shared by several nodes are only exported once
+            files = {}
+            for key, geometry in mesh.meshes.items():
+                if not id(geometry) in files:
+                    files[id(geometry)] = _export_worker_mesh(geometry, 
+                                                              name + '_' + str(len(files)))
+            items.append({'base_frame' : mesh.transforms.base_frame,
+                          'transforms' : mesh.transforms.export(),
+                          'meshes'     : dict((key, files[id(geometry)]) for 
+                                              key, geometry in mesh.meshes.items())})
+        return path, items, None
+    except Exception:
+        return path, None, traceback.format_exc()
+
+def _export_worker_mesh(mesh, name):
+    '''
+    Save a mesh in the native format, returning the file name.
+    '''
+    name += '.tmesh'
+    with open(name, 'wb') as file_obj:
+        export_native(mesh, file_obj)
+    return name
+
+def _worker_result(item):
+    '''
+    Load an item returned by _load_worker, removing the files it used.
+
+    Arguments
+    ---------
+    item: str, native file name, or dict describing a Scene
+
+    Returns
+    ---------
+    loaded: Trimesh or Scene
+    '''
+    if not isinstance(item, dict):
+        with open(item, 'rb') as file_obj:
+            mesh = load_native(file_obj)
+        # the memory map stays valid after the file is removed on 
+        # POSIX, and the directory is removed at the end otherwise
+        try:    os.remove(item)
+        except OSError: pass
+        return mesh
+
+    scene = Scene(base_frame=item['base_frame'])
+    for transform in item['transforms']:
+        scene.transforms.update(**transform)
+    # load every file once, so nodes still share meshes
+    loaded = {}
+    for key, name in item['meshes'].items():
+        if not name in loaded:
+            loaded[name] = _worker_result(name)
+        scene.meshes[key] = loaded[name]
+    return scene
+
+# number of bytes read to detect a file type
+_SNIFF_SIZE = 4096
+# file types which always start with the same bytes
+_magic_types = [(b'\x1f\x8b',          'gz'),
+                (b'BZh',               'bz2'),
+                (b'\xfd7zXZ\x00',      'xz'),
+                (b'PK\x03\x04',        'zip'),
+                (b'glTF',              'glb'),
+                (b'TRIMESH\x00',       'tmesh'),
+                (b'ply',               'ply')]
+# the first keyword of an OBJ file, after comments
+_obj_keywords = set(['v', 'vn', 'vt', 'f', 'o', 'g', 's', 'mtllib', 'usemtl'])
+# functions which decompress a file- like object to bytes
+_decompressors = {'gz'  : lambda f: gzip.GzipFile(fileobj=f, mode='rb').read(),
+                  'bz2' : lambda f: bz2.decompress(f.read())}
+if lzma is not None:
+    _decompressors['xz'] = lambda f: lzma.LZMAFile(f).read()
+
 _mesh_loaders = {}
 _mesh_loaders.update(_assimp_loaders)
 _mesh_loaders.update(_stl_loaders)
 _mesh_loaders.update(_misc_loaders)
 _mesh_loaders.update(_step_loaders)
+_mesh_loaders.update(_ply_loaders)
+_mesh_loaders.update(_gltf_loaders)
+_mesh_loaders.update(_native_loaders)
@@ -1,43 +1,324 @@
 import numpy as np
 import struct
+import re
+
+from collections import deque
+
+from ..geometry import triangulate_polygons
+
+# approximate number of bytes of OBJ files to parse at once
+OBJ_CHUNK = 2**22
 
 def load_off(file_obj, file_type=None):
-    header_string = file_obj.readline().decode().strip()
-    if not header_string == 'OFF': 
-        raise NameError('Not an OFF file! Header was ' + header_string)
+    '''
+    Load an Object File Format (OFF) file into mesh kwargs.
+    http://www.geomview.org/docs/html/OFF.html
+
+    Every value in the body is parsed by a single np.fromstring call and
+    the lines are only used to count tokens, so faces with any number
+    of vertices are read into a CSR style (indices, counts) structure and
+    triangulated in bulk.
+
+    Arguments
+    ---------
+    file_obj:  open file- like object
+    file_type: not used
+
+    Returns
+    ---------
+    loaded: kwargs for a Trimesh constructor, with face_colors if every
+            face has a color and vertex_colors for COFF files
+    '''
+    text = file_obj.read()
+    if hasattr(text, 'decode'):
+        text = text.decode('utf-8', 'ignore')
+    if '#' in text:
+        text = re.sub(r'#[^\n]*', '', text)
+
+    header = _off_header.match(text)
+    if header is None:
+        raise ValueError('Not an OFF file! Header was ' + text[:20].strip())
+    keyword = header.group(1).upper()
+    vertex_count, face_count = int(header.group(2)), int(header.group(3))
+    body   = text[header.end():]
+
+    values = np.fromstring(body, sep=' ')
+    tokens = _line_tokens(body)
+    # remove blank lines, which leaves one entry per vertex or face
+    tokens = tokens[tokens > 0]
+    if (len(tokens) < vertex_count + face_count or 
+        len(values) != tokens.sum()):
+        raise ValueError('Incorrect number of vertices or faces!')
+
+    vertex_tokens = tokens[:vertex_count]
+    face_tokens   = tokens[vertex_count:vertex_count + face_count]
+    width         = int(vertex_tokens.min()) if vertex_count > 0 else 3
+    if width < 3 or (vertex_tokens != width).any():
+        raise ValueError('Vertices have an inconsistent number of values!')
+    vertex_data = values[:vertex_count * width].reshape((-1, width))
+    face_data   = values[vertex_count * width:][:face_tokens.sum()]
+
+    # every face line is the vertex count followed by the indices, 
+    # and then optionally a color
+    face_start = np.append(0, np.cumsum(face_tokens)[:-1])
+    counts     = face_data[face_start].astype(np.int64)
+    extra      = face_tokens - counts - 1
+    if (extra < 0).any():
+        raise ValueError('Faces have fewer indices than specified!')
+    row     = np.arange(face_count).repeat(face_tokens)
+    local   = np.arange(len(face_data)) - face_start[row]
+    corner  = np.logical_and(local > 0, local <= counts[row])
+    indices = face_data[corner].astype(np.int64)
 
-    header  = np.array(file_obj.readline().split()).astype(int)
-    blob    = np.array(file_obj.read().split())
-    data_ok = np.sum(header * [3,4,0]) == len(blob)    
-    if not data_ok: raise NameError('Incorrect number of vertices or faces!')
+    faces, polygon = triangulate_polygons(indices, counts)
+    loaded = {'vertices' : vertex_data[:,:3].copy(),
+              'faces'    : faces}
 
-    vertices = blob[0:(header[0]*3)].astype(float).reshape((-1,3))
-    faces    = blob[(header[0]*3):].astype(int).reshape((-1,4))[:,1:]
-  
-    return {'vertices' : vertices,
-            'faces'    : faces}
+    # only keep face colors if every face has an RGB or RGBA color
+    if face_count > 0 and extra.min() >= 3 and (extra == extra[0]).all():
+        colors = face_data[np.logical_not(corner)]
+        colors = colors.reshape((face_count, -1))[:,1:4]
+        loaded['face_colors'] = _off_colors(colors)[polygon]
+    # vertex columns are XYZ, then normals with 'N', then color with 'C'
+    column = 3
+    if 'N' in keyword and width >= column + 3:
+        loaded['vertex_normals'] = vertex_data[:,column:column+3].copy()
+        column += 3
+    if 'C' in keyword and width >= column + 3:
+        loaded['vertex_colors'] = _off_colors(vertex_data[:,column:column+3])
+    return loaded
 
-def load_wavefront(file_obj, file_type=None):
+def _off_colors(colors):
+    '''
+    Convert OFF colors, which are either floats from 0.0-1.0 or 
+    integers from 0-255, into (n,3) uint8 RGB.
+    '''
+    if colors.max() <= 1.0:
+        colors = colors * 255
+    return np.clip(np.round(colors), 0, 255).astype(np.uint8)
+
+def _line_tokens(text):
+    '''
+    Count the whitespace separated tokens on every line of text.
+
+    Arguments
+    ---------
+    text: str
+
+    Returns
+    ---------
+    counts: (text.count('\\n') + 1) int, number of tokens on each line
+    '''
+    raw     = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+    space   = _whitespace[raw]
+    # a token starts at every character after whitespace
+    start   = np.nonzero(np.logical_and(np.logical_not(space), 
+                                        np.append(True, space[:-1])))[0]
+    newline = np.nonzero(raw == ord('\n'))[0]
+    # the number of tokens which start before each line ends
+    bounds  = np.searchsorted(start, newline)
+    counts  = np.diff(np.concatenate(([0], bounds, [len(start)])))
+    return counts
+
+def load_wavefront(file_obj, file_type=None, chunk_size=OBJ_CHUNK):
     '''
     Loads a Wavefront .obj file_obj into a Trimesh object
-    Discards texture normals and vertex color information
     https://en.wikipedia.org/wiki/Wavefront_.obj_file
+
+    The file is read in chunks of complete lines, and every block of
+    vertices or faces in a chunk is converted with a single np.fromstring
+    call, so memory stays proportional to the loaded arrays.
+
+    Polygon faces are triangulated, negative (relative) indices are
+    supported, and every 'o' or 'g' group with faces becomes a mesh.
+    Materials and free-form geometry are ignored.
+
+    Arguments
+    ---------
+    file_obj:   open file- like object
+    file_type:  not used
+    chunk_size: int, approximate number of bytes to parse at once
+
+    Returns
+    ---------
+    loaded: kwargs for a Trimesh constructor, or a list of them if
+            the file has more than one group with faces
+    '''
+    # arrays of values parsed from every chunk
+    parsed = {'v'  : deque(),
+              'vn' : deque(),
+              'vt' : deque()}
+    count  = {'v'  : 0,
+              'vn' : 0,
+              'vt' : 0}
+    # (n,3) int triangles of (vertex, texture, normal) corner indices
+    triangles = deque()
+    # (n) int, the group of every triangle
+    triangle_group = deque()
+    # group names and their index, where faces before any
+    # group statement go into an unnamed group
+    names = ['']
+    group_index = {'' : 0}
+    group = 0
+
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if len(chunk) == 0: break
+        # extend the chunk to the end of the current line
+        chunk += file_obj.readline()
+        if hasattr(chunk, 'decode'):
+            chunk = chunk.decode('utf-8', 'ignore')
+
+        lines = _obj_line.findall(chunk)
+        if len(lines) == 0: continue
+        keys = np.array([line[0] for line in lines])
+
+        # how many of each vertex type were defined before each line
+        # which relative (negative) indices are based on
+        before = dict()
+        for key in parsed.keys():
+            mask = keys == key
+            before[key] = count[key] + np.cumsum(mask) - mask
+            if not mask.any(): continue
+            values = _obj_floats([lines[i][1] for i in np.nonzero(mask)[0]])
+            # keep XYZ of vertices and normals and UV of textures
+            parsed[key].append(values[:,:[3,2][key == 'vt']])
+            count[key] += mask.sum()
+
+        # the group of every line, from the last group statement
+        group_lines = np.nonzero(np.logical_or(keys == 'g', keys == 'o'))[0]
+        line_group  = np.zeros(len(group_lines) + 1, dtype=np.int64)
+        line_group[0] = group
+        for i, line in enumerate(group_lines):
+            name = lines[line][1].strip()
+            if not name in group_index:
+                group_index[name] = len(names)
+                names.append(name)
+            line_group[i+1] = group_index[name]
+        group = line_group[-1]
+
+        face_lines = np.nonzero(keys == 'f')[0]
+        if len(face_lines) == 0: continue
+        corners, counts = _obj_corners([lines[i][1] for i in face_lines])
+        # convert every index type from 1- indexed or relative to 0- indexed
+        for column, key in enumerate(['v', 'vt', 'vn']):
+            relative = np.repeat(before[key][face_lines], counts)
+            index    = corners[:,column]
+            missing  = index == 0
+            index[index > 0] -= 1
+            index[index < 0] += relative[index < 0]
+            index[missing]    = -1
+        faces, polygon = triangulate_polygons(np.arange(len(corners)), counts)
+        triangles.append(corners[faces])
+        face_group = line_group[np.searchsorted(group_lines, face_lines)]
+        triangle_group.append(face_group[polygon])
+
+    vertices = _obj_stack(parsed['v'],  3)
+    normals  = _obj_stack(parsed['vn'], 3)
+    textures = _obj_stack(parsed['vt'], 2)
+    triangles      = np.vstack(list(triangles) + [np.zeros((0,3,3), dtype=np.int64)])
+    triangle_group = np.concatenate(list(triangle_group) + [np.zeros(0, dtype=np.int64)])
+
+    groups = np.unique(triangle_group)
+    loaded = deque()
+    for group in groups:
+        faces_group = triangles[triangle_group == group]
+        if len(groups) == 1:
+            # keep every vertex if there is only one mesh
+            vertex_index = np.arange(len(vertices))
+            faces = faces_group[:,:,0]
+        else:
+            vertex_index, faces = np.unique(faces_group[:,:,0], return_inverse=True)
+            faces = faces.reshape((-1,3))
+        mesh = {'vertices' : vertices[vertex_index],
+                'faces'    : faces}
+        if len(names[group]) > 0:
+            mesh['metadata'] = {'name' : names[group]}
+
+        # normals and textures are indexed per corner, so they are assigned
+        # to vertices if every vertex is referenced by a corner with them
+        for column, values, key in [[2, normals,  'vertex_normals'],
+                                    [1, textures, 'vertex_texture']]:
+            index = faces_group[:,:,column]
+            if len(values) == 0 or (index < 0).any(): continue
+            if len(np.unique(faces)) != len(vertex_index): continue
+            per_vertex = np.zeros((len(vertex_index), values.shape[1]))
+            per_vertex[faces] = values[index]
+            if key == 'vertex_normals':
+                mesh[key] = per_vertex
+            else:
+                mesh.setdefault('metadata', {})[key] = per_vertex
+        loaded.append(mesh)
+
+    if len(loaded) == 0:
+        raise ValueError('No faces in OBJ file!')
+    if len(loaded) == 1:
+        return loaded[0]
+    return list(loaded)
+
+def _obj_floats(lines):
+    '''
+    Parse lines with the same number of float values into an (n,m) array.
+    '''
+    values = np.fromstring(' '.join(lines), sep=' ')
+    if len(values) % len(lines) != 0:
+        # lines with different numbers of values, IE optional weights
+        width  = min(len(line.split()) for line in lines)
+        values = np.array([line.split()[:width] for line in lines], dtype=np.float64)
+    return values.reshape((len(lines), -1))
+
+def _obj_corners(lines):
     '''
-    data     = np.array(file_obj.read().split())
-    data_str = data.astype(str)
-    
-    # find the locations of keys, then find the proceeding values
-    vid = np.nonzero(data_str == 'v')[0].reshape((-1,1))  + np.arange(3) + 1
-    nid = np.nonzero(data_str == 'vn')[0].reshape((-1,1)) + np.arange(3) + 1
-    fid = np.nonzero(data_str == 'f')[0].reshape((-1,1))  + np.arange(3) + 1
-    
-    # if we wanted to use the texture/vertex normals, we could slice this differently.
-    faces = np.array([i.split(b'/') for i in data[fid].reshape(-1)])[:,0].reshape((-1,3))
-    # wavefront has 1- indexed faces, as opposed to 0- indexed
-    faces = faces.astype(int) - 1
-    return {'vertices'       : data[vid].astype(float),
-            'vertex_normals' : data[nid].astype(float),
-            'faces'          : faces}
+    Parse the corners of OBJ face lines, which are 'v', 'v/vt',
+    'v//vn' or 'v/vt/vn'.
+
+    Arguments
+    ---------
+    lines: (n) list of str, the text after 'f' of every face line
+
+    Returns
+    ---------
+    corners: (m,3) int, vertex, texture and normal index of each corner
+             as they appear in the file, with zero for a missing index
+    counts:  (n) int, how many corners each face has
+    '''
+    # count the corners and slashes of every line from the raw bytes
+    raw     = np.frombuffer('\n'.join(lines).encode('utf-8'), dtype=np.uint8)
+    line_id = np.cumsum(raw == ord('\n'))
+    space   = _whitespace[raw]
+    # a corner starts at every character after whitespace
+    start   = np.logical_and(np.logical_not(space), 
+                             np.append(True, space[:-1]))
+    counts  = np.bincount(line_id[start],               minlength=len(lines))
+    slashes = np.bincount(line_id[raw == ord('/')], minlength=len(lines))
+    total   = counts.sum()
+    text    = ' '.join(lines).replace('//', '/0/')
+    corners = np.zeros((total, 3), dtype=np.int64)
+    # every corner has the same format if slashes are proportional to corners
+    stride  = (slashes[0] // max(counts[0], 1)) + 1
+    if (slashes == counts * (stride - 1)).all():
+        values = np.fromstring(text.replace('/', ' '), sep=' ', dtype=np.int64)
+        corners[:,:stride] = values.reshape((-1, stride))
+    else:
+        # corners with different formats in the same block
+        for i, corner in enumerate(text.split()):
+            split = [int(j) for j in corner.split('/')]
+            corners[i,:len(split)] = split
+    return corners, counts
+
+def _obj_stack(blocks, width):
+    '''
+    Stack parsed blocks of values into one (n, width) float array.
+    '''
+    return np.vstack(list(blocks) + [np.zeros((0, width))])
+
+# lines of an OBJ file that we parse, as (keyword, rest of line)
+_obj_line = re.compile(r'^[ \t]*(vn|vt|v|f|o|g)[ \t]+([^\n#]*)', re.MULTILINE)
+# the keyword and vertex, face and edge counts of an OFF file
+_off_header = re.compile(r'\s*([A-Za-z]*OFF)\s+(\d+)\s+(\d+)\s+(\d+)[^\n]*')
+# lookup table for whitespace bytes
+_whitespace = np.zeros(256, dtype=np.bool)
+_whitespace[[ord(i) for i in ' \t\r\n']] = True
 
 _misc_loaders = {'obj' : load_wavefront,
                  'off' : load_off}
@@ -0,0 +1,219 @@
+import numpy as np
+import json
+
+from scipy.sparse import csr_matrix
+
+from ..constants import log
+from ..util      import TrackedArray, is_mappable
+
+# the first bytes of every file
+_native_magic = b'TRIMESH\x00'
+# the header is the magic and the length of the JSON description
+_native_header = np.dtype([('magic',  np.void, 8),
+                           ('length', '<u8')])
+# the JSON description and every array start on a boundary of this many bytes
+_native_align = 64
+# cached values which are exported, as (owner, cache key)
+_native_cached = [('topology', 'unique_edges'),
+                  ('topology', 'face_adjacency'),
+                  ('topology', 'face_components'),
+                  ('mesh',     'facets_properties_0'),
+                  ('mesh',     'facets_properties_1')]
+
+def export_native(mesh, file_obj=None, derived=False):
+    '''
+    Export a mesh in the trimesh native format, which is a JSON description
+    followed by the raw bytes of every array aligned to 64 bytes.
+
+    The mesh is stored exactly as it is, including its face normals,
+    explicitly set vertex normals, colors and metadata, as well as face
+    adjacency and facets if they have already been computed.
+
+    Arguments
+    ---------
+    mesh:     Trimesh object
+    file_obj: file- like object to write to, or None
+    derived:  bool, if True compute face adjacency and facets before export
+              so they are available on load without being recomputed
+
+    Returns
+    ---------
+    if file_obj is None: bytes of the exported file
+    else:                True
+    '''
+    if derived:
+        mesh.topology.face_adjacency
+        mesh.topology.face_components
+        mesh.facets_properties()
+
+    arrays = {'vertices'     : mesh.vertices.view(np.ndarray),
+              'faces'        : mesh.faces.view(np.ndarray),
+              'face_normals' : mesh.face_normals}
+    if np.shape(mesh._vertex_normals) == mesh.vertices.shape:
+        arrays['vertex_normals'] = mesh._vertex_normals
+    if mesh.visual._face_colors_ok:
+        arrays['face_colors'] = mesh.visual.face_colors
+    if mesh.visual._vertex_colors_ok:
+        arrays['vertex_colors'] = mesh.visual.vertex_colors
+
+    for owner, key in _native_cached:
+        cache  = [mesh._cache, mesh.topology._cache][owner == 'topology']
+        cached = cache.get(key)
+        if cached is None: continue
+        if isinstance(cached, dict):
+            arrays.update(('cache/' + owner + '/' + key + '/' + k, v) for k, v in cached.items())
+        else:
+            arrays['cache/' + owner + '/' + key] = cached
+
+    metadata = {}
+    for key, value in mesh.metadata.items():
+        if isinstance(value, np.ndarray):
+            arrays['metadata/' + key] = value
+            continue
+        try:
+            json.dumps(value)
+            metadata[key] = value
+        except (TypeError, ValueError):
+            log.warning('Metadata %s not exported, as it isn\'t JSON serializable', key)
+
+    # sparse matrices are stored as their CSR arrays
+    sparse = {}
+    for name, value in list(arrays.items()):
+        if hasattr(value, 'indptr'):
+            sparse[name] = value.shape
+            arrays.pop(name)
+            for attribute in ['data', 'indices', 'indptr']:
+                arrays[name + '.' + attribute] = getattr(value, attribute)
+
+    # find where every array starts, relative to the start of the data
+    description = {'version'  : 1,
+                   'metadata' : metadata,
+                   'sparse'   : sparse,
+                   'arrays'   : {}}
+    names  = sorted(arrays.keys())
+    arrays = [np.ascontiguousarray(arrays[name]) for name in names]
+    offset = 0
+    for name, array in zip(names, arrays):
+        description['arrays'][name] = {'dtype'  : array.dtype.str,
+                                       'shape'  : array.shape,
+                                       'offset' : offset}
+        offset += _native_padded(array.nbytes)
+
+    content  = json.dumps(description).encode('utf-8')
+    content += b' ' * (_native_padded(_native_header.itemsize + len(content)) -
+                       _native_header.itemsize - len(content))
+    header = np.zeros(1, dtype=_native_header)
+    header['magic']  = np.frombuffer(_native_magic, dtype='V8')
+    header['length'] = len(content)
+
+    blobs = [header.tostring(), content]
+    for array in arrays:
+        blobs.append(array)
+        blobs.append(b'\x00' * (_native_padded(array.nbytes) - array.nbytes))
+    if file_obj is None:
+        return b''.join(i.tostring() if hasattr(i, 'tostring') else i for i in blobs)
+    for blob in blobs:
+        file_obj.write(blob.data if hasattr(blob, 'data') else blob)
+    return True
+
+def load_native(file_obj, file_type=None):
+    '''
+    Load a mesh exported by export_native.
+
+    If file_obj is an actual file the arrays are memory mapped as copy- on-
+    write, so opening is constant time and data is only read as it is
+    accessed. The arrays of a load.BufferFile over writeable data (IE a
+    bytearray) are views of that data. The mesh is not processed again, and cached values that
+    were exported (adjacency, facets) are restored.
+
+    Arguments
+    ---------
+    file_obj:  open file- like object
+    file_type: not used
+
+    Returns
+    ---------
+    mesh: Trimesh object
+    '''
+    start  = file_obj.tell()
+    header = np.frombuffer(file_obj.read(_native_header.itemsize), dtype=_native_header)
+    if len(header) == 0 or header['magic'][0].tostring() != _native_magic:
+        raise ValueError('Not a trimesh native file!')
+    description = json.loads(file_obj.read(int(header['length'][0])).decode('utf-8'))
+    data_start  = start + _native_header.itemsize + int(header['length'][0])
+
+    buffer = None
+    if not is_mappable(file_obj):
+        if callable(getattr(file_obj, 'buffer', None)):
+            # writeable buffers (IE a load.BufferFile of a bytearray)
+            # are viewed rather than copied, so the mesh shares them
+            size   = file_obj.seek(0, 2) - data_start
+            buffer = file_obj.buffer(data_start, size)
+            if buffer.readonly:
+                buffer = bytearray(buffer)
+        else:
+            # file- like objects which aren't a file on disk (IE BytesIO)
+            file_obj.seek(data_start)
+            buffer = bytearray(file_obj.read())
+
+    arrays = {}
+    for name, info in description['arrays'].items():
+        dtype = np.dtype(info['dtype'])
+        shape = tuple(info['shape'])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        elif buffer is None:
+            arrays[name] = np.memmap(file_obj,
+                                     dtype  = dtype,
+                                     mode   = 'c',
+                                     offset = data_start + info['offset'],
+                                     shape  = shape)
+        else:
+            arrays[name] = np.frombuffer(buffer,
+                                         dtype  = dtype,
+                                         count  = int(np.prod(shape)),
+                                         offset = info['offset']).reshape(shape)
+    for name, shape in description['sparse'].items():
+        arrays[name] = csr_matrix((arrays.pop(name + '.data'),
+                                   arrays.pop(name + '.indices'),
+                                   arrays.pop(name + '.indptr')),
+                                  shape = tuple(shape))
+
+    metadata = description['metadata']
+    metadata.update((k[len('metadata/'):], v) for k, v in arrays.items()
+                    if k.startswith('metadata/'))
+
+    # base imports the exporters, so import it here
+    from ..base import Trimesh
+    mesh = Trimesh(metadata=metadata, process=False)
+    # assign the arrays directly, as the setters would copy them
+    mesh._vertices      = arrays['vertices'].view(TrackedArray)
+    mesh._faces         = arrays['faces'].view(TrackedArray)
+    mesh._face_normals  = arrays['face_normals']
+    if 'vertex_normals' in arrays:
+        mesh._vertex_normals = arrays['vertex_normals']
+    if 'face_colors' in arrays:
+        mesh.visual._face_colors = arrays['face_colors']
+    if 'vertex_colors' in arrays:
+        mesh.visual._vertex_colors = arrays['vertex_colors']
+
+    for owner, key in _native_cached:
+        cache  = [mesh._cache, mesh.topology._cache][owner == 'topology']
+        prefix = 'cache/' + owner + '/' + key
+        if prefix in arrays:
+            cache.set(key, arrays[prefix])
+            continue
+        values = dict((k[len(prefix) + 1:], v) for k, v in arrays.items()
+                      if k.startswith(prefix + '/'))
+        if len(values) > 0:
+            cache.set(key, values)
+    return mesh
+
+def _native_padded(length):
+    '''
+    Round a number of bytes up to the next alignment boundary.
+    '''
+    return int(np.ceil(float(length) / _native_align) * _native_align)
+
+_native_loaders   = {'tmesh' : load_native}
+_native_exporters = {'tmesh' : export_native}
@@ -0,0 +1,402 @@
+import numpy as np
+import struct
+
+from collections import OrderedDict
+
+from ..geometry import triangulate_polygons
+from .misc      import _line_tokens
+
+#python 3
+try:                from cStringIO import StringIO
+except ImportError: from io import StringIO
+
+# PLY type names and their numpy equivalent
+_ply_types = {'char'   : 'i1', 'int8'    : 'i1',
+              'uchar'  : 'u1', 'uint8'   : 'u1',
+              'short'  : 'i2', 'int16'   : 'i2',
+              'ushort' : 'u2', 'uint16'  : 'u2',
+              'int'    : 'i4', 'int32'   : 'i4',
+              'uint'   : 'u4', 'uint32'  : 'u4',
+              'float'  : 'f4', 'float32' : 'f4',
+              'double' : 'f8', 'float64' : 'f8'}
+# the PLY type name written for each numpy kind and size
+_ply_names = {'i1' : 'char',  'u1' : 'uchar',
+              'i2' : 'short', 'u2' : 'ushort',
+              'i4' : 'int',   'u4' : 'uint',
+              'f4' : 'float', 'f8' : 'double'}
+# byte order of each PLY format
+_ply_encodings = {'ascii'                : '<',
+                  'binary_little_endian' : '<',
+                  'binary_big_endian'    : '>'}
+
+def load_ply(file_obj, file_type=None):
+    '''
+    Load a PLY file, in ASCII or binary of either byte order.
+
+    Binary elements are read with np.frombuffer using a structured dtype,
+    where list properties (IE faces) are a fixed size field if every row
+    has the same length, which is checked after reading. ASCII elements
+    are parsed by a single np.fromstring call. Elements with lists of
+    varying length are read row by row.
+
+    Arguments
+    ---------
+    file_obj:  open file- like object
+    file_type: not used
+
+    Returns
+    ---------
+    loaded: kwargs for a Trimesh constructor, including vertex normals
+            and vertex or face colors if they are in the file
+    '''
+    elements, encoding = _ply_header(file_obj)
+    data = file_obj.read()
+    if encoding == 'ascii':
+        parsed = _ply_ascii(elements, data)
+    else:
+        parsed = _ply_binary(elements, data, _ply_encodings[encoding])
+    return _ply_to_mesh(parsed)
+
+def export_ply(mesh, file_obj=None, encoding='binary'):
+    '''
+    Export a mesh as a PLY file, with vertex normals if they were
+    explicitly set and vertex or face colors if they are defined.
+
+    Binary data is written directly from structured arrays.
+
+    Arguments
+    ---------
+    mesh:     Trimesh object
+    file_obj: file- like object to write to, or None
+    encoding: str, 'binary' (little endian) or 'ascii'
+
+    Returns
+    ---------
+    if file_obj is None: bytes of the PLY file
+    else:                True
+    '''
+    vertices = mesh.vertices.view(np.ndarray)
+    faces    = mesh.faces.view(np.ndarray)
+
+    # (name, dtype, (n,m) values) of every vertex and face property
+    vertex = [[name, '<f8', vertices[:,i]] for i, name in enumerate('xyz')]
+    if np.shape(mesh._vertex_normals) == vertices.shape:
+        vertex.extend([name, '<f8', mesh._vertex_normals[:,i]]
+                      for i, name in enumerate(['nx', 'ny', 'nz']))
+    face = []
+    if mesh.visual._vertex_colors_ok:
+        vertex.extend(_color_properties(mesh.visual.vertex_colors))
+    if mesh.visual._face_colors_ok:
+        face.extend(_color_properties(mesh.visual.face_colors))
+
+    header  = 'ply\n'
+    header += 'format ' + ['binary_little_endian', 'ascii'][encoding == 'ascii'] + ' 1.0\n'
+    header += 'element vertex ' + str(len(vertices)) + '\n'
+    for name, dtype, values in vertex:
+        header += 'property ' + _ply_names[dtype[1:]] + ' ' + name + '\n'
+    header += 'element face ' + str(len(faces)) + '\n'
+    header += 'property list uchar int vertex_indices\n'
+    for name, dtype, values in face:
+        header += 'property ' + _ply_names[dtype[1:]] + ' ' + name + '\n'
+    header += 'end_header\n'
+
+    face = [['count',          '<u1', np.tile(3, len(faces))],
+            ['vertex_indices', '<i4', faces]] + face
+
+    if encoding == 'ascii':
+        export = header
+        for properties in [vertex, face]:
+            columns = []
+            fmt     = []
+            for name, dtype, values in properties:
+                columns.append(np.reshape(values, (len(values), -1)))
+                fmt.extend([['%d', '%.14f'][dtype[1] == 'f']] * columns[-1].shape[1])
+            temp_obj = StringIO()
+            np.savetxt(temp_obj, np.column_stack(columns), fmt=fmt)
+            export += temp_obj.getvalue()
+        export = export.encode('utf-8')
+        if file_obj is None:
+            return export
+        file_obj.write(export)
+        return True
+
+    blobs = [header.encode('utf-8')]
+    for properties in [vertex, face]:
+        dtype = np.dtype([(name,
+                           dtype,
+                           np.shape(values)[1:]) for name, dtype, values in properties])
+        blob = np.zeros(len(properties[0][2]), dtype=dtype)
+        for name, dtype, values in properties:
+            blob[name] = values
+        blobs.append(blob)
+
+    if file_obj is None:
+        return blobs[0] + b''.join(i.tostring() for i in blobs[1:])
+    file_obj.write(blobs[0])
+    for blob in blobs[1:]:
+        file_obj.write(blob.data)
+    return True
+
+def _color_properties(colors):
+    '''
+    The red, green and blue properties of (n,3) colors.
+    '''
+    colors = np.asanyarray(colors)
+    return [[name, '<u1', colors[:,i]] for i, name in enumerate(['red', 'green', 'blue'])]
+
+def _ply_header(file_obj):
+    '''
+    Read the header of a PLY file, leaving file_obj at the start of data.
+
+    Arguments
+    ---------
+    file_obj: open file- like object, at the start of the file
+
+    Returns
+    ---------
+    elements: list of (name, count, properties), where properties is a list
+              of (name, dtype) for scalars and (name, (count dtype, item dtype))
+              for lists, with numpy type strings
+    encoding: str, 'ascii', 'binary_little_endian' or 'binary_big_endian'
+    '''
+    if file_obj.readline().strip() != b'ply':
+        raise ValueError('Not a PLY file!')
+    elements = []
+    encoding = None
+    while True:
+        line = file_obj.readline()
+        if len(line) == 0:
+            raise ValueError('PLY header has no end!')
+        line = line.decode('utf-8', 'ignore').split()
+        if len(line) == 0 or line[0] in ['comment', 'obj_info']:
+            continue
+        if line[0] == 'end_header':
+            break
+        elif line[0] == 'format':
+            encoding = line[1]
+        elif line[0] == 'element':
+            elements.append((line[1], int(line[2]), []))
+        elif line[0] == 'property':
+            if line[1] == 'list':
+                kind = (_ply_types[line[2]], _ply_types[line[3]])
+            else:
+                kind = _ply_types[line[1]]
+            elements[-1][2].append((line[-1], kind))
+    if not encoding in _ply_encodings:
+        raise ValueError('PLY format ' + str(encoding) + ' not supported!')
+    return elements, encoding
+
+def _ply_binary(elements, data, endian):
+    '''
+    Read the elements of a binary PLY file.
+
+    Arguments
+    ---------
+    elements: list, from _ply_header
+    data:     bytes, everything after the header
+    endian:   str, '<' or '>'
+
+    Returns
+    ---------
+    parsed: dict, element name : {property name : values}, where values are
+            (n) arrays for scalars and ((m) values, (n) counts) for lists
+    '''
+    parsed = OrderedDict()
+    offset = 0
+    for name, count, properties in elements:
+        # the element as a structured dtype, using the list lengths of the first row
+        fields   = []
+        position = offset
+        for field, kind in properties:
+            if isinstance(kind, tuple):
+                size   = np.dtype(kind[0]).itemsize
+                length = 0
+                if count > 0 and position + size <= len(data):
+                    length = int(np.frombuffer(data,
+                                               dtype  = endian + kind[0],
+                                               count  = 1,
+                                               offset = position)[0])
+                fields.append((field + '_count', endian + kind[0]))
+                fields.append((field, endian + kind[1], (length,)))
+                position += size + length * np.dtype(kind[1]).itemsize
+            else:
+                fields.append((field, endian + kind))
+                position += np.dtype(kind).itemsize
+        dtype = np.dtype(fields)
+
+        blob = None
+        if offset + dtype.itemsize * count <= len(data):
+            blob = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            # every list has to have the same length as the first row
+            for field, kind in properties:
+                if (isinstance(kind, tuple) and
+                    (blob[field + '_count'] != blob.dtype[field].shape[0]).any()):
+                    blob = None
+                    break
+
+        if blob is None:
+            # lists of varying length, so read one row at a time
+            def read(kind, position):
+                return (struct.unpack_from(endian + np.dtype(kind).char, data, position)[0],
+                        position + np.dtype(kind).itemsize)
+            parsed[name], offset = _ply_walk(properties, count, read, offset)
+            continue
+
+        element = dict()
+        for field, kind in properties:
+            if isinstance(kind, tuple):
+                element[field] = (blob[field].reshape(-1),
+                                  blob[field + '_count'].astype(np.int64))
+            else:
+                element[field] = blob[field]
+        parsed[name] = element
+        offset += dtype.itemsize * count
+    return parsed
+
+def _ply_ascii(elements, data):
+    '''
+    Read the elements of an ASCII PLY file.
+
+    Arguments
+    ---------
+    elements: list, from _ply_header
+    data:     bytes, everything after the header
+
+    Returns
+    ---------
+    parsed: dict, element name : {property name : values}, where values are
+            (n) arrays for scalars and ((m) values, (n) counts) for lists
+    '''
+    text   = data.decode('utf-8', 'ignore')
+    values = np.fromstring(text, sep=' ')
+    tokens = _line_tokens(text)
+    # every element row is a line, so blank lines are removed
+    tokens = tokens[tokens > 0]
+    if len(values) != tokens.sum():
+        raise ValueError('PLY data is not all numbers!')
+
+    parsed = OrderedDict()
+    line   = 0
+    offset = 0
+    for name, count, properties in elements:
+        rows   = tokens[line:line + count]
+        chunk  = values[offset:offset + rows.sum()]
+        lists  = [i for i, (field, kind) in enumerate(properties)
+                  if isinstance(kind, tuple)]
+        if len(rows) != count:
+            raise ValueError('PLY has fewer rows than specified!')
+        line   += count
+        offset += len(chunk)
+
+        element = dict()
+        if len(lists) == 0:
+            if (rows != len(properties)).any():
+                raise ValueError('PLY rows have the wrong number of values!')
+            chunk = chunk.reshape((count, -1))
+            for i, (field, kind) in enumerate(properties):
+                element[field] = chunk[:,i].astype(kind)
+        elif len(lists) == 1:
+            # each row is scalars, the list count, the list and more scalars
+            before = lists[0]
+            after  = len(properties) - before - 1
+            start  = np.append(0, np.cumsum(rows)[:-1])
+            counts = chunk[start + before].astype(np.int64)
+            if (counts != rows - before - after - 1).any():
+                raise ValueError('PLY list lengths do not match rows!')
+            row    = np.arange(count).repeat(rows)
+            local  = np.arange(len(chunk)) - start[row]
+            in_list = np.logical_and(local > before, local <= before + counts[row])
+            scalars = chunk[np.logical_and(np.logical_not(in_list),
+                                           local != before)].reshape((count, -1))
+            for i, (field, kind) in enumerate(properties):
+                if i == before:
+                    element[field] = (chunk[in_list].astype(kind[1]), counts)
+                else:
+                    element[field] = scalars[:, i - int(i > before)].astype(kind)
+        else:
+            def read(kind, position):
+                return chunk[position], position + 1
+            element = _ply_walk(properties, count, read, 0)[0]
+        parsed[name] = element
+    return parsed
+
+def _ply_walk(properties, count, read, position):
+    '''
+    Read the rows of an element one property at a time.
+
+    Arguments
+    ---------
+    properties: list of element properties, from _ply_header
+    count:      int, number of rows
+    read:       function(kind, position), returns (value, next position)
+    position:   start of the element
+
+    Returns
+    ---------
+    element:  dict, property name : values, as _ply_binary
+    position: end of the element
+    '''
+    values = [[] for i in properties]
+    counts = [[] for i in properties]
+    for row in range(count):
+        for i, (field, kind) in enumerate(properties):
+            if isinstance(kind, tuple):
+                length, position = read(kind[0], position)
+                counts[i].append(length)
+                for j in range(int(length)):
+                    value, position = read(kind[1], position)
+                    values[i].append(value)
+            else:
+                value, position = read(kind, position)
+                values[i].append(value)
+    element = dict()
+    for i, (field, kind) in enumerate(properties):
+        if isinstance(kind, tuple):
+            element[field] = (np.array(values[i], dtype=kind[1]),
+                              np.array(counts[i], dtype=np.int64))
+        else:
+            element[field] = np.array(values[i], dtype=kind)
+    return element, position
+
+def _ply_to_mesh(parsed):
+    '''
+    Convert parsed PLY elements into kwargs for a Trimesh constructor.
+    '''
+    vertex = parsed.get('vertex', {})
+    if not all(i in vertex for i in 'xyz'):
+        raise ValueError('PLY file has no vertices!')
+    loaded = {'vertices' : np.column_stack([vertex[i] for i in 'xyz']).astype(np.float64)}
+    if all(i in vertex for i in ['nx', 'ny', 'nz']):
+        loaded['vertex_normals'] = np.column_stack([vertex[i] for i in ['nx', 'ny', 'nz']])
+    colors = _ply_colors(vertex)
+    if colors is not None:
+        loaded['vertex_colors'] = colors
+
+    face    = parsed.get('face', {})
+    indices = [face[i] for i in ['vertex_indices', 'vertex_index'] if i in face]
+    if len(indices) == 0:
+        loaded['faces'] = np.zeros((0,3), dtype=np.int64)
+        return loaded
+    faces, polygon = triangulate_polygons(indices[0][0].astype(np.int64),
+                                          indices[0][1])
+    loaded['faces'] = faces
+    colors = _ply_colors(face)
+    if colors is not None:
+        loaded['face_colors'] = colors[polygon]
+    return loaded
+
+def _ply_colors(element):
+    '''
+    Get (n,3) uint8 colors from the red, green and blue properties
+    of an element, or None if it doesn't have them.
+    '''
+    channels = ['red', 'green', 'blue']
+    if not all(i in element for i in channels):
+        return None
+    colors = np.column_stack([element[i] for i in channels])
+    if colors.dtype.kind == 'f':
+        colors = np.clip(np.round(colors * 255), 0, 255)
+    return colors.astype(np.uint8)
+
+_ply_loaders   = {'ply' : load_ply}
+_ply_exporters = {'ply' : export_ply}
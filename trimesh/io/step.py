@@ -3,19 +3,24 @@ import numpy as np
 import networkx as nx
 import itertools
 
+from functools       import partial
+
 from collections     import deque
 from tempfile        import NamedTemporaryFile
 from distutils.spawn import find_executable
 from subprocess      import check_call
+from multiprocessing import Pool, cpu_count, current_process
 from xml.etree       import cElementTree
 
 from ..constants import res, log
 
 _METERS_TO_INCHES = 1.0 / .0254
 _STEP_FACETER     = find_executable('export_product_asm')
+# number of vertices or faces converted from XML text at once
+_STEP_BLOCK       = 2**16
 
 
-def load_step(file_obj, file_type=None):
+def load_step(file_obj, file_type=None, workers=1):
     '''
     Use the STEPtools Inc. Author Tools binary to mesh a STEP file,
     and return a list of Trimesh objects.
@@ -30,14 +35,24 @@ def load_step(file_obj, file_type=None):
         unzip stpidx_author_linux_x86_64_16.0.zip
         sudo cp stpidx_author_linux_x86_64/bin/export_product_asm /usr/bin/
     
+    The XML output of the faceter is read as a stream, so only the 
+    vertices and faces of the shells and the assembly tree are kept.
+    
     Arguments
     ----------
     file_obj:  file like object containing step file
     file_type: unused
+    workers:   int, number of processes finding the transforms and names
+               of shells in the assembly, or None for one per CPU.
+               Only worth it for large assemblies, as every process has
+               to be started and sent the assembly. If 1, or if this is
+               already a daemonic worker process (IE in load_many), this 
+               is done in this process.
 
     Returns
     ----------
-    meshes: list of Trimesh objects (with correct metadata set from STEP file)
+    meshes: list of kwargs for Trimesh constructors (with correct 
+            metadata set from STEP file)
     '''
     
     with NamedTemporaryFile() as out_file:
@@ -51,23 +66,24 @@ def load_step(file_obj, file_type=None):
             check_call([_STEP_FACETER, file_name,
                         '-tol', str(res.mesh),
                         '-o', out_file.name])
-            t = cElementTree.parse(out_file)
-            
-    meshes   = {}
-    # get the meshes without metadata from the XML document
-    for shell in t.findall('shell'):
-        # query the xml structure for vertices and faces
-        vertices = np.array([v.get('p').split() for v in shell.findall('.//v')], 
-                            dtype=np.float)
-        faces    = np.array([f.get('v').split() for f in shell.findall('.//f')],
-                            dtype = np.int)
-        # normals aren't always returned but faces have correct winding
-        # so they are autogenerated correctly from dot products
-        mesh = {'vertices': vertices, 
-                'faces'   : faces,
-                'metadata': {}}
-        # store the mesh by id reference
-        meshes[shell.get('id')] = mesh
+            return _step_meshes(out_file, workers)
+
+def _step_meshes(xml_file, workers=1):
+    '''
+    Load the meshes of the XML file written by the STEP faceter.
+
+    Arguments
+    ----------
+    xml_file: file- like object or file name of faceter output
+    workers:  int, number of processes assembling metadata, or None
+              for one per CPU. Daemonic processes can't start a pool,
+              so they always assemble metadata themselves.
+
+    Returns
+    ----------
+    meshes: list of kwargs for Trimesh constructors
+    '''
+    meshes, shapes, products, prod_root = _step_parse(xml_file)
 
     try:
         # populate the graph of shapes and transforms
@@ -76,69 +92,177 @@ def load_step(file_obj, file_type=None):
         mesh_shape = {}
         # assume that the document has consistant units
         to_inches  = None
-        for shape in t.findall('shape'):
-            shape_id   = shape.get('id')
-            shape_unit = shape.get('unit')
-            mesh_id    = shape.get('shell')
+        for shape_id, shape_unit, mesh_id, children in shapes:
             if not shape_unit is None:
                 to_inches = float(shape_unit.split()[1]) * _METERS_TO_INCHES
             if not mesh_id is None:
                 for i in mesh_id.split():
                     mesh_shape[i] = shape_id
-                #g.node[shape_id]['mesh'] = mesh_id
-
                 g.add_node(shape_id, {'mesh' : mesh_id})
 
-            for child in shape.getchildren():
-                child_id  = child.get('ref')
-                transform = np.array(child.get('xform').split(), 
+            for child_id, xform in children:
+                transform = np.array(xform.split(), 
                                      dtype=np.float).reshape((4,4)).T
                 g.add_edge(shape_id, child_id, transform=transform)
 
         # which product ID has the root shape
-        prod_root  = t.getroot().get('root')
         shape_root = None
-        for prod in t.findall('product'):
-            prod_id    = prod.get('id')
-            prod_name  = prod.get('name')
-            prod_shape = prod.get('shape')
+        for prod_id, prod_name, prod_shape in products:
             if prod_id == prod_root:
                 shape_root = prod_shape
             g.node[prod_shape]['product_name'] = prod_name 
 
         # now that the assembly tree has been populated, traverse it to
         # find the final transforms and quantities for the meshes we extracted
-        for mesh_id in meshes.keys():
-            shape_id       = mesh_shape[mesh_id]
-            transforms_all = deque()
-            path_str       = deque()
-            if shape_id == shape_root:
-                paths = [[shape_id, shape_id]]
-            else:
-                paths = nx.all_simple_paths(g, shape_root, shape_id)
-
-            for path in paths:
-                path_name = [g.node[i]['product_name'] for i in path[:-1]]
-                edges = np.column_stack((path[:-1], 
-                                         path[:-1])).reshape(-1)[1:-1].reshape((-1,2))
-                transforms = [np.eye(4)]
-                for e in edges:
-                    # get every transform from the edge
-                    local      = [i['transform'] for i in g.edge[e[0]][e[1]].values()]
-                    # all the transforms are sequential, so we want combinations
-                    transforms = [np.dot(*i) for i in itertools.product(transforms, local)]
-                transforms_all.extend(transforms)
-                path_str.extend(['/'.join(path_name)]*len(transforms))
-            meshes[mesh_id]['vertices']              *= to_inches
-            meshes[mesh_id]['metadata']['units']      = 'inches'
-            meshes[mesh_id]['metadata']['name']       = path_name[-1]
-            meshes[mesh_id]['metadata']['paths']      = np.array(path_str)
-            meshes[mesh_id]['metadata']['quantity']   = len(transforms_all)
-            meshes[mesh_id]['metadata']['transforms'] = np.array(transforms_all)
+        tasks = [(mesh_id, mesh_shape[mesh_id]) for mesh_id in meshes.keys()]
+        metadata = partial(_step_metadata, g, shape_root)
+        if workers is None:
+            workers = cpu_count()
+        if workers <= 1 or len(tasks) <= 1 or current_process().daemon:
+            assembled = map(metadata, tasks)
+        else:
+            # one chunk of tasks per worker, so the graph is sent once to each
+            pool = Pool(workers)
+            try:     assembled = pool.map(metadata, tasks, 
+                                          chunksize = int(np.ceil(float(len(tasks)) / workers)))
+            finally: pool.terminate()
+        for mesh_id, metadata in assembled:
+            meshes[mesh_id]['vertices'] *= to_inches
+            meshes[mesh_id]['metadata'].update(metadata)
     except:
         log.error('STEP load processing error, aborting metadata!', exc_info=True)
 
-    return meshes.values()
+    return list(meshes.values())
+
+def _step_parse(xml_file, block_size=_STEP_BLOCK):
+    '''
+    Read the shells and assembly tree of faceter XML output as a stream, 
+    clearing every element once it has been read.
+
+    The vertex and face text of every shell is converted to arrays a
+    block at a time, rather than as one python list per vertex.
+
+    Arguments
+    ----------
+    xml_file:   file- like object or file name of faceter output
+    block_size: int, number of vertices or faces converted at once
+
+    Returns
+    ----------
+    meshes:    dict, {shell id : kwargs for a Trimesh constructor}
+    shapes:    list of (shape id, unit, shell ids, [(child shape id, xform)])
+    products:  list of (product id, product name, shape id)
+    prod_root: str, id of the root product
+    '''
+    meshes    = {}
+    shapes    = deque()
+    products  = deque()
+    prod_root = None
+    # the elements which have started but not ended
+    open_tags = deque()
+    # the text and converted blocks of the current shell
+    shell = None
+
+    def convert(key, dtype):
+        '''
+        Convert the text of vertices or faces to an array block.
+        '''
+        text = shell[key + '_text']
+        if len(text) == 0: return
+        shell[key].append(np.fromstring(' '.join(text), sep=' ', dtype=dtype))
+        del text[:]
+
+    for event, element in cElementTree.iterparse(xml_file, events=('start', 'end')):
+        if event == 'start':
+            if len(open_tags) == 0:
+                root      = element
+                prod_root = element.get('root')
+            elif element.tag == 'shell':
+                shell = {'vertices' : deque(), 'vertices_text' : [],
+                         'faces'    : deque(), 'faces_text'    : []}
+            open_tags.append(element)
+            continue
+        open_tags.pop()
+
+        tag = element.tag
+        if shell is not None:
+            if tag == 'v':
+                shell['vertices_text'].append(element.get('p'))
+                if len(shell['vertices_text']) >= block_size:
+                    convert('vertices', np.float64)
+            elif tag == 'f':
+                shell['faces_text'].append(element.get('v'))
+                if len(shell['faces_text']) >= block_size:
+                    convert('faces', np.int64)
+            elif tag == 'shell':
+                convert('vertices', np.float64)
+                convert('faces', np.int64)
+                vertices = np.concatenate(list(shell['vertices']) + [np.zeros(0)])
+                faces    = np.concatenate(list(shell['faces']) + [np.zeros(0, dtype=np.int64)])
+                # normals aren't always returned but faces have correct winding
+                # so they are autogenerated correctly from dot products
+                meshes[element.get('id')] = {'vertices' : vertices.reshape((-1,3)),
+                                             'faces'    : faces.reshape((-1,3)),
+                                             'metadata' : {}}
+                shell = None
+            element.clear()
+        elif tag == 'shape':
+            shapes.append((element.get('id'),
+                           element.get('unit'),
+                           element.get('shell'),
+                           [(child.get('ref'), child.get('xform')) for child in element]))
+        elif tag == 'product':
+            products.append((element.get('id'),
+                             element.get('name'),
+                             element.get('shape')))
+        # remove finished top level elements from the document
+        if len(open_tags) == 1:
+            root.clear()
+    return meshes, list(shapes), list(products), prod_root
+
+def _step_metadata(g, shape_root, task):
+    '''
+    Find every instance of a shell in the assembly.
+
+    Arguments
+    ----------
+    g:          networkx MultiDiGraph of shapes, with transforms on edges
+    shape_root: shape id of the root of the assembly
+    task:       (mesh id, shape id of the mesh)
+
+    Returns
+    ----------
+    mesh_id:  the mesh id of the task
+    metadata: dict, with the name, paths, quantity and transforms of
+              the mesh in the assembly
+    '''
+    mesh_id, shape_id = task
+
+    transforms_all = deque()
+    path_str       = deque()
+    if shape_id == shape_root:
+        paths = [[shape_id, shape_id]]
+    else:
+        paths = nx.all_simple_paths(g, shape_root, shape_id)
+
+    for path in paths:
+        path_name = [g.node[i]['product_name'] for i in path[:-1]]
+        edges = np.column_stack((path[:-1], 
+                                 path[:-1])).reshape(-1)[1:-1].reshape((-1,2))
+        transforms = [np.eye(4)]
+        for e in edges:
+            # get every transform from the edge
+            local      = [i['transform'] for i in g.edge[e[0]][e[1]].values()]
+            # all the transforms are sequential, so we want combinations
+            transforms = [np.dot(*i) for i in itertools.product(transforms, local)]
+        transforms_all.extend(transforms)
+        path_str.extend(['/'.join(path_name)]*len(transforms))
+    metadata = {'units'      : 'inches',
+                'name'       : path_name[-1],
+                'paths'      : np.array(path_str),
+                'quantity'   : len(transforms_all),
+                'transforms' : np.array(transforms_all)}
+    return mesh_id, metadata
 
 if _STEP_FACETER is None: 
     log.debug('STEP loading unavailable!')
@@ -1,23 +1,195 @@
 import numpy as np
-import struct
+import re
 
-from ..util      import is_binary_file
- 
-def load_stl(file_obj, file_type=None):
-    if is_binary_file(file_obj): return load_stl_binary(file_obj)
-    else:                        return load_stl_ascii(file_obj)
+from collections import deque
+
+from ..util      import is_binary_file, is_mappable, make_sequence
+from ..color     import DEFAULT_COLOR
+from ..grouping  import hashable_rows
+
+# approximate number of bytes of ASCII STL to parse at once
+ASCII_CHUNK = 2**22
+# default number of faces generated at once by stl_chunks
+STREAM_CHUNK = 2**18
+
+# the header of a binary STL file
+_stl_dtype_header = np.dtype([('header',     np.void, 80),
+                              ('face_count', '<u4')])
+# every face of a binary STL file is 50 bytes
+_stl_dtype = np.dtype([('normals',    '<f4', (3)),
+                       ('vertices',   '<f4', (3,3)),
+                       ('attributes', '<u2')])
+
+def load_stl(file_obj, file_type=None, face_colors=False, merge_vertices=False):
+    '''
+    Load an STL file from a file object.
+
+    Arguments
+    ---------
+    file_obj:       open file- like object
+    file_type:      not used
+    face_colors:    bool, if True and the file is binary, read face colors
+                    from the attribute bytes of each face
+    merge_vertices: bool, if True merge duplicate vertices while loading,
+                    returning indexed vertices and faces
+
+    Returns
+    ---------
+    loaded: kwargs for a Trimesh constructor
+    '''
+    if is_binary_file(file_obj): 
+        return load_stl_binary(file_obj, face_colors, merge_vertices)
+    loaded = load_stl_ascii(file_obj)
+    if merge_vertices:
+        for mesh in make_sequence(loaded):
+            triangles = mesh['vertices'].reshape((-1,3,3))
+            mesh['vertices'], mesh['faces'] = merge_triangles(
+                triangles[i:i+STREAM_CHUNK] for i in range(0, len(triangles), STREAM_CHUNK))
+    return loaded
         
-def load_stl_binary(file_obj):
+def load_stl_binary(file_obj, face_colors=False, merge_vertices=False):
     '''
     Load a binary STL file into a trimesh object. 
-    Uses a single main struct.unpack call, and is significantly faster
-    than looping methods or ASCII STL. 
+
+    The face data is viewed as a structured array without creating 
+    any intermediate python objects, using a memory map if file_obj 
+    is an actual file, the data of a load.BufferFile without copying
+    it, and a buffer otherwise.
+
+    If merge_vertices is set, vertices are merged a chunk of faces at a 
+    time as they are converted, so the 3*n unmerged vertices are never
+    in memory at once.
+
+    Arguments
+    ---------
+    file_obj:       open file- like object, positioned at the start of the STL
+    face_colors:    bool, if True return face colors from the attribute bytes
+    merge_vertices: bool, if True merge duplicate vertices while loading
+
+    Returns
+    ---------
+    loaded: kwargs for a Trimesh constructor
     '''
-    # get the file_obj header
-    header = file_obj.read(80)
+    tri_count  = _binary_header(file_obj)
+    data_start = file_obj.tell()
+
+    blob = None
+    if tri_count > 0 and is_mappable(file_obj):
+        try: 
+            # map the file rather than reading it, so the only full size 
+            # arrays in memory are the converted vertices and normals
+            blob = np.memmap(file_obj,
+                             dtype  = _stl_dtype,
+                             mode   = 'r',
+                             offset = data_start,
+                             shape  = (tri_count,))
+        except Exception:
+            # files which are shorter than the header claims
+            # which memmap may have moved while checking the size
+            blob = None
+            file_obj.seek(data_start)
+    if blob is None:
+        size = tri_count * _stl_dtype.itemsize
+        if callable(getattr(file_obj, 'buffer', None)):
+            # buffers (IE load.BufferFile) are viewed rather than copied
+            data = file_obj.buffer(data_start, size)
+            file_obj.seek(data_start + len(data))
+        else:
+            data = file_obj.read(size)
+        blob = np.frombuffer(data, dtype = _stl_dtype)
     
+    if merge_vertices:
+        vertices, faces = merge_triangles(blob['vertices'][i:i+STREAM_CHUNK] 
+                                          for i in range(0, tri_count, STREAM_CHUNK))
+    else:
+        # all of our vertices will be loaded in order due to the STL format, 
+        # so faces are just sequential indices reshaped. 
+        vertices = blob['vertices'].reshape((-1,3)).astype(np.float64)
+        faces    = np.arange(tri_count*3).reshape((-1,3))
+    result = {'vertices'     : vertices,
+              'faces'        : faces,
+              'face_normals' : blob['normals'].astype(np.float64)}
+
+    if face_colors:
+        colors = attributes_to_colors(blob['attributes'])
+        if colors is not None:
+            result['face_colors'] = colors
+    return result
+
+def merge_triangles(chunks):
+    '''
+    Merge the duplicate vertices of triangles, a chunk at a time.
+
+    Vertices are hashed like merge_vertices_hash and duplicates are 
+    removed within every chunk as it is read, and the unique vertices of
+    every chunk are merged at the end, so only the chunk and the (much
+    smaller) unique vertices are in memory rather than every corner. 
+    The result is the same as merge_vertices_hash on the unmerged 
+    triangles, including the order of the vertices.
+
+    Arguments
+    ---------
+    chunks: iterable of (m,3,3) float triangles
+
+    Returns
+    ---------
+    vertices: (n,3) float64, unique vertices
+    faces:    (o,3) int64, indexes of vertices of every triangle
+    '''
+    hashes   = deque()
+    firsts   = deque()
+    inverses = deque()
+    offset   = 0
+    corners  = 0
+    for triangles in chunks:
+        vertices = np.asanyarray(triangles, dtype=np.float64).reshape((-1,3))
+        unique, index, inverse = np.unique(hashable_rows(vertices),
+                                           return_index   = True,
+                                           return_inverse = True)
+        hashes.append(unique)
+        firsts.append(vertices[index])
+        # indexes into the unique vertices of every chunk combined
+        inverses.append(inverse + offset)
+        offset  += len(unique)
+        corners += len(inverse)
+    if offset == 0:
+        return np.zeros((0,3)), np.zeros((0,3), dtype=np.int64)
+
+    # the first occurrence in the earliest chunk is the first overall
+    garbage, index, inverse = np.unique(np.concatenate(list(hashes)),
+                                        return_index   = True,
+                                        return_inverse = True)
+    hashes   = None
+    vertices = np.vstack(list(firsts))[index]
+    firsts   = None
+    # replace chunk indexes as they are released to keep memory down
+    faces    = np.empty(corners, dtype=np.int64)
+    position = 0
+    while len(inverses) > 0:
+        chunk = inverses.popleft()
+        faces[position:position + len(chunk)] = inverse[chunk]
+        position += len(chunk)
+    return vertices, faces.reshape((-1,3))
+
+def _binary_header(file_obj):
+    '''
+    Read the header of a binary STL file and check that the length 
+    of the file matches the number of faces it specifies.
+
+    Arguments
+    ---------
+    file_obj: open file- like object, positioned at the start of the STL
+
+    Returns
+    ---------
+    tri_count: int, number of faces, with file_obj positioned at the first
+    '''
+    header = np.frombuffer(file_obj.read(_stl_dtype_header.itemsize),
+                           dtype = _stl_dtype_header)
+    if len(header) == 0:
+        raise ValueError('Binary STL is missing header!')
     # get the file information about the number of triangles
-    tri_count    = int(struct.unpack("@i", file_obj.read(4))[0])
+    tri_count = int(header['face_count'][0])
     
     # now we check the length from the header versus the length of the file
     # data_start should always be position 84, but hard coding that felt ugly
@@ -30,64 +202,174 @@ def load_stl_binary(file_obj):
     # the binary format has a rigidly defined structure, and if the length
     # of the file doesn't match the header, the loaded version is almost
     # certainly going to be garbage. 
-    data_ok = (data_end - data_start) == (tri_count * 50)
+    data_ok = (data_end - data_start) == (tri_count * _stl_dtype.itemsize)
    
     # this check is to see if this really is a binary STL file. 
     # if we don't do this and try to load a file that isn't structured properly 
-    # the struct.unpack call uses 100% memory until the whole thing crashes, 
-    # so it's much better to raise an exception here. 
+    # we will read garbage, so it's much better to raise an exception here. 
     if not data_ok:
         raise ValueError('Binary STL has incorrect length in header!')
-    
-    # all of our vertices will be loaded in order due to the STL format, 
-    # so faces are just sequential indices reshaped. 
-    faces        = np.arange(tri_count*3).reshape((-1,3))
+    return tri_count
 
-    # this blob extracts 12 float values, with 2 pad bytes per face
-    # the first three floats are the face normal
-    # the next 9 are the three vertices 
-    blob = np.array(struct.unpack("<" + "12fxx"*tri_count, 
-                                  file_obj.read())).reshape((-1,4,3))
+def stl_chunks(file_obj, chunk_size=STREAM_CHUNK):
+    '''
+    Generate the triangles of an STL file in chunks, without ever
+    loading the whole file, for files too large to load as a mesh.
+
+    Arguments
+    ---------
+    file_obj:   open file- like object
+    chunk_size: int, maximum number of faces in each chunk
 
-    face_normals = blob[:,0]
-    vertices     = blob[:,1:].reshape((-1,3))
+    Returns
+    ---------
+    chunks: generator of ((n,3,3) float triangles, (n,3) float normals),
+            where n <= chunk_size
+    '''
+    if is_binary_file(file_obj):
+        tri_count = _binary_header(file_obj)
+        for start in range(0, tri_count, chunk_size):
+            count = min(chunk_size, tri_count - start)
+            blob  = np.frombuffer(file_obj.read(count * _stl_dtype.itemsize),
+                                  dtype = _stl_dtype)
+            yield (blob['vertices'].astype(np.float64),
+                   blob['normals'].astype(np.float64))
+        return
 
-    return {'vertices'     : vertices,
-            'faces'        : faces, 
-            'face_normals' : face_normals}
+    # floats left over from the previous chunk of text, which 
+    # are the start of a face that continues in the next chunk
+    remainder = np.zeros(0)
+    while True:
+        text = file_obj.read(ASCII_CHUNK)
+        if len(text) > 0:
+            # extend the text to the end of the current line
+            text += file_obj.readline()
+        if hasattr(text, 'decode'):
+            text = text.decode('utf-8', 'ignore')
+        # solid names may contain numbers, so remove those lines
+        values = np.append(remainder, _ascii_floats(_ascii_solid.sub(' ', text)))
+        # every face has 12 numbers, a normal and three vertices
+        count     = len(values) // 12
+        remainder = values[count * 12:]
+        blob      = values[:count * 12].reshape((-1,4,3))
+        for start in range(0, len(blob), chunk_size):
+            chunk = blob[start:start + chunk_size]
+            yield chunk[:,1:].copy(), chunk[:,0].copy()
+        if len(text) == 0:
+            break
+    if len(remainder) > 0:
+        raise ValueError('Incorrect number of values in STL file!')
 
-def load_stl_ascii(file_obj):
+def attributes_to_colors(attributes):
     '''
-    Load an ASCII STL file.
+    Convert the attribute bytes of binary STL faces into colors, using
+    the VisCAM/SolidView convention: bits 0-4 are blue, 5-9 are green, 
+    10-14 are red and bit 15 is set if the color is valid.
+
+    Arguments
+    ---------
+    attributes: (n) uint16, attribute of every face
+
+    Returns
+    ---------
+    colors: (n,3) uint8 RGB colors, or None if no face has a valid color.
+            Faces without a valid color are set to the default color.
     '''
-    header = file_obj.readline()
-    
-    text = file_obj.read()
-    if hasattr(text, 'decode'):
-        text = text.decode('utf-8')
-    text = text.lower().split('endsolid')[0]
-    blob = np.array(text.split())
-
-    # there are 21 'words' in each face
-    face_len   = 21
-    face_count = len(blob) / face_len
-    if (len(blob) % face_len) != 0:
-        raise ValueError('Incorrect number of values in STL file!')
+    attributes = np.asanyarray(attributes, dtype=np.uint16)
+    valid      = (attributes & 0x8000) != 0
+    if not valid.any(): 
+        return None
+    # shift each 5 bit channel down and scale it to 0-255
+    channels = (attributes.reshape((-1,1)) >> np.array([10, 5, 0], dtype=np.uint16)) & 0x1F
+    colors   = (channels.astype(np.uint16) * 255 // 31).astype(np.uint8)
+    colors[np.logical_not(valid)] = DEFAULT_COLOR
+    return colors
 
-    face_count   = int(face_count)
-    # this offset is to be added to a fixed set of indices that is tiled
-    offset       = face_len * np.arange(face_count).reshape((-1,1))
-    normal_index = np.tile([2,3,4], (face_count, 1)) + offset
-    vertex_index = np.tile([8,9,10,12,13,14,16,17,18], (face_count, 1)) + offset
-    
-    # faces are groups of three sequential vertices, as vertices are not references
-    faces        = np.arange(face_count*3).reshape((-1,3))
-    face_normals = blob[normal_index].astype(float)
-    vertices     = blob[vertex_index.reshape((-1,3))].astype(float)
-
-    return {'vertices'     : vertices,
-            'faces'        : faces, 
-            'face_normals' : face_normals}
+def load_stl_ascii(file_obj, chunk_size=ASCII_CHUNK):
+    '''
+    Load an ASCII STL file, which may contain several solids.
+
+    The file is read in chunks of complete lines, and all the numbers
+    between solid keywords are parsed by a single np.fromstring call per
+    chunk, so memory stays proportional to the loaded arrays.
+
+    Arguments
+    ---------
+    file_obj:   open file- like object
+    chunk_size: int, approximate number of bytes to parse at once
+
+    Returns
+    ---------
+    loaded: kwargs for a Trimesh constructor, or a list of them
+            if the file contains more than one solid
+    '''
+    # every solid is a [name, list of float arrays] pair
+    solids  = deque()
+    current = None
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if len(chunk) == 0: break
+        # extend the chunk to the end of the current line
+        chunk += file_obj.readline()
+        if hasattr(chunk, 'decode'):
+            chunk = chunk.decode('utf-8', 'ignore')
+
+        # the text between solid and endsolid lines is only numbers
+        # and keywords, but the lines themselves may contain numbers
+        position = 0
+        for match in _ascii_solid.finditer(chunk):
+            if current is not None:
+                current[1].append(_ascii_floats(chunk[position:match.start()]))
+            if match.group(1) is None:
+                current = [match.group(2).strip(), deque()]
+                solids.append(current)
+            else:
+                current = None
+            position = match.end()
+        if current is None:
+            # data outside of a solid block, which we keep anyway
+            current = ['', deque()]
+            solids.append(current)
+        current[1].append(_ascii_floats(chunk[position:]))
+
+    loaded = deque()
+    for name, blocks in solids:
+        blob = np.concatenate(list(blocks) + [np.zeros(0)])
+        if len(blob) == 0: continue
+        # every face has 12 numbers, a normal and three vertices
+        if (len(blob) % 12) != 0:
+            raise ValueError('Incorrect number of values in STL file!')
+        blob = blob.reshape((-1,4,3))
+        mesh = {'vertices'     : blob[:,1:].reshape((-1,3)),
+                'faces'        : np.arange(len(blob)*3).reshape((-1,3)),
+                'face_normals' : blob[:,0]}
+        if len(name) > 0:
+            mesh['metadata'] = {'name' : name}
+        loaded.append(mesh)
+
+    if len(loaded) == 0:
+        raise ValueError('No faces in STL file!')
+    if len(loaded) == 1:
+        return loaded[0]
+    return list(loaded)
+
+def _ascii_floats(text):
+    '''
+    Parse every number from a block of ASCII STL text between
+    solid keywords.
+    '''
+    text = text.lower()
+    for keyword in _ascii_keywords:
+        text = text.replace(keyword, ' ')
+    if len(text.strip()) == 0:
+        return np.zeros(0)
+    return np.fromstring(text, sep=' ')
+
+# solid and endsolid lines, where group 1 is 'end' and group 2 the name
+_ascii_solid    = re.compile(r'^[ \t]*(end)?solid([^\n]*)$', 
+                            re.MULTILINE | re.IGNORECASE)
+# keywords between numbers, ordered so 'endfacet' is removed before 'facet'
+_ascii_keywords = ['endfacet', 'endloop', 'facet', 'normal', 'outer', 'loop', 'vertex']
 
 _stl_loaders = {'stl':load_stl}
 
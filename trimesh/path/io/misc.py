@@ -67,10 +67,13 @@ def faces_to_path(mesh, face_ids=None):
     ---------
     dict
     '''
-    if face_ids is None: faces = mesh.faces
-    else:                faces = mesh.faces[[face_ids]]
-
-    edges        = faces_to_edges(faces)
-    unique_edges = group_rows(edges, require_count=1)
+    if face_ids is None: 
+        # the boundary of the full mesh is cached on the mesh topology
+        edges        = mesh.topology.edges
+        unique_edges = mesh.topology.edges_boundary
+    else:
+        faces        = mesh.faces.view(np.ndarray)[face_ids]
+        edges        = faces_to_edges(faces)
+        unique_edges = group_rows(edges, require_count=1)
     segments     = mesh.vertices[edges[unique_edges]]        
     return lines_to_path(segments)
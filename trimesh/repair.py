@@ -2,76 +2,172 @@ import numpy as np
 import networkx as nx
 from collections import deque
 
+from scipy.sparse          import coo_matrix
+from scipy.sparse.csgraph  import connected_components, breadth_first_order
+
 from .geometry  import faces_to_edges
-from .points    import unitize
-from .grouping  import group_rows
-from .triangles import normals
+from .points    import project_to_plane
+from .triangles import normals, mass_integrals
 from .util      import is_sequence
 from .constants import *
 
 def fix_face_winding(mesh):
     '''
     Traverse and change mesh faces in-place to make sure winding is coherent, 
-    or that edges on adjacent faces are in opposite directions
-    '''
-    # we create the face adjacency graph: 
-    # every node in g is an index of mesh.faces
-    # every edge in g represents two faces which are connected
-    graph_all = nx.from_edgelist(mesh.face_adjacency)
-    flipped   = 0
-    # we are going to traverse the graph using BFS, so we have to start
-    # a traversal for every connected component
-    for graph in nx.connected_component_subgraphs(graph_all):
-        start = graph.nodes()[0]
-        # we traverse every pair of faces in the graph
-        # we modify mesh.faces and mesh.face_normals in place 
-        for face_pair in nx.bfs_edges(graph, start):
-            # for each pair of faces, we convert them into edges,
-            # find the edge that both faces share, and then see if the edges
-            # are reversed in order as you would expect in a well constructed mesh
-            pair    = mesh.faces[[face_pair]]            
-            edges   = faces_to_edges(pair, sort=False)
-            overlap = group_rows(np.sort(edges,axis=1), require_count=2)
-            if len(overlap) == 0:
-                # only happens on non-watertight meshes
-                continue
-            edge_pair = edges[[overlap[0]]]
-            if edge_pair[0][0] == edge_pair[1][0]:
-                # if the edges aren't reversed, invert the order of one of the faces
-                flipped += 1
-                mesh.faces[face_pair[1]] = mesh.faces[face_pair[1]][::-1]
-    log.info('Flipped %d/%d edges', flipped, len(mesh.faces)*3)
+    or that edges on adjacent faces are in opposite directions.
+
+    Rather than walking the face graph pair by pair, we find for every
+    shared edge whether the two faces traverse it in the same direction,
+    propagate that flip parity from one face of each connected component
+    over a BFS spanning tree, and then flip every face at once.
+    '''
+    if len(mesh.faces) == 0: return
+    faces     = mesh.faces.view(np.ndarray)
+    # (n,2) pairs of faces which share an edge
+    adjacency = mesh.face_adjacency
+    if len(adjacency) == 0: return
+
+    # the unsorted edges, so we can tell which way each face traverses them
+    edges   = faces_to_edges(faces, sort=False)
+    forward = edges[:,0] < edges[:,1]
+    # the index of each face pair's shared edge in mesh.topology.edges_unique
+    shared  = mesh.topology.face_adjacency_edges
+    inverse = mesh.topology.edges_unique_inverse
+    # find which of the three edges of each face is the shared edge
+    rows    = adjacency.reshape((-1,1)) * 3 + np.arange(3)
+    match   = inverse[rows] == np.repeat(shared, 2).reshape((-1,1))
+    rows    = rows[np.arange(len(rows)), match.argmax(axis=1)].reshape((-1,2))
+    # if both faces traverse the shared edge in the same direction 
+    # one of them has to be flipped relative to the other
+    parity  = forward[rows[:,0]] == forward[rows[:,1]]
+
+    flip = _propagate_parity(node_count = len(faces),
+                             pairs      = adjacency,
+                             parity     = parity)
+    if flip.any():
+        mesh.faces[flip] = faces[flip][:,::-1]
+    log.info('Flipped %d/%d faces', flip.sum(), len(faces))
+
+def _propagate_parity(node_count, pairs, parity):
+    '''
+    Given a graph with a boolean parity on every edge, find the parity 
+    of every node relative to the root of its connected component.
+    The root of every component has a parity of False.
+
+    Arguments
+    ---------
+    node_count: int, number of nodes in the graph
+    pairs:      (n,2) int, edges of the graph
+    parity:     (n) bool, parity of each edge
+
+    Returns
+    ---------
+    node_parity: (node_count) bool, XOR of edge parity along the
+                 spanning tree path from each node to its component root
+    '''
+    # find connected components so that we can add a single virtual
+    # root node connected to the first node of every component, 
+    # which lets us build a spanning forest with one BFS
+    graph = coo_matrix((np.ones(len(pairs), dtype=np.bool), 
+                        (pairs[:,0], pairs[:,1])),
+                       shape=(node_count, node_count))
+    count, labels = connected_components(graph, directed=False)
+    first = np.unique(labels, return_index=True)[1]
+    root  = node_count
+    rows  = np.append(pairs[:,0], np.tile(root, count))
+    cols  = np.append(pairs[:,1], first)
+    graph = coo_matrix((np.ones(len(rows), dtype=np.bool), (rows, cols)),
+                       shape=(node_count+1, node_count+1)).tocsr()
+    predecessors = breadth_first_order(graph, 
+                                       root, 
+                                       directed = False,
+                                       return_predecessors = True)[1]
+    # the root has no predecessor, so point it at itself
+    predecessors[root] = root
+
+    # look up the parity of each spanning tree edge by an integer key
+    stride   = np.int64(node_count + 1)
+    key_pair = (pairs.min(axis=1).astype(np.int64) * stride + 
+                pairs.max(axis=1))
+    order    = key_pair.argsort()
+    nodes    = np.arange(node_count)
+    key_tree = (np.minimum(nodes, predecessors[:-1]).astype(np.int64) * stride + 
+                np.maximum(nodes, predecessors[:-1]))
+    index    = np.clip(np.searchsorted(key_pair[order], key_tree), 0, len(order)-1)
+    found    = key_pair[order][index] == key_tree
+    # edges to the virtual root (or missing edges) have no parity
+    current  = np.append(np.logical_and(parity[order][index], found), False)
+
+    # accumulate parity up the tree by pointer jumping, which takes
+    # log(depth) vectorized steps rather than a step per node
+    ancestor = predecessors
+    while (ancestor != root).any():
+        current  = np.logical_xor(current, current[ancestor])
+        ancestor = ancestor[ancestor]
+    return current[:-1]
+
 def fix_normals_direction(mesh):
     '''
-    Check to see if a mesh has normals pointed outside the solid using ray tests.
+    Make sure the normals of every connected component of a mesh point
+    outside the solid, assuming the winding of each component is coherent.
 
-    If the mesh is not watertight, this is meaningless.
+    For closed components, the divergence theorem volume is negative if 
+    faces are wound inside out, so those are flipped in bulk. 
+    For open components volume is meaningless, so we fall back to ray tests.
     '''
     # force face normals to be regenerated according to the right-hand rule
+    # note that regenerating normals removes zero- area faces 
     mesh.face_normals = None
+    mesh.face_normals
+    if len(mesh.faces) == 0: return
+
+    labels = mesh.topology.face_components
+    count  = labels.max() + 1
+    # the signed volume of every component 
+    volume = np.bincount(labels,
+                         weights   = mass_integrals(mesh.triangles)[0],
+                         minlength = count)
+    # a component is closed if every one of its edges has exactly two faces
+    open_edges = mesh.topology.edges_unique_count[mesh.topology.edges_unique_inverse] != 2
+    is_open    = np.zeros(count, dtype=np.bool)
+    is_open[labels[mesh.topology.edges_face[open_edges]]] = True
+
+    inverted = np.logical_and(volume < 0.0, np.logical_not(is_open))
+    for component in np.nonzero(is_open)[0]:
+        inverted[component] = _component_inverted_ray(mesh, labels, component)
+
+    flip = inverted[labels]
+    if not flip.any(): return
+    # since normals were regenerated, this means winding is backwards
+    mesh.faces[flip] = mesh.faces.view(np.ndarray)[flip][:,::-1]
+    mesh.face_normals[flip] *= -1
+    log.debug('Flipped %d/%d components', inverted.sum(), count)
+
+def _component_inverted_ray(mesh, labels, component):
+    '''
+    Check a single component of a mesh with a ray test, returning 
+    True if its normals are pointed inwards.
+    '''
+    faces = np.nonzero(labels == component)[0]
     # which direction should our test rays go
-    direction = -mesh.face_normals[0]
+    direction = -mesh.face_normals[faces[0]]
     # origin of test ray
-    origin    = mesh.vertices[mesh.faces[0]].mean(axis=0)
+    origin    = mesh.triangles[faces[0]].mean(axis=0)
     origin   -= direction * mesh.box_size.max() * 2
     rays = [[origin, direction]]
     location, hit_id = mesh.ray.intersects_location(rays, return_id=True)
+    # only consider hits on the current component
+    ok = labels[hit_id[0]] == component
+    if not ok.any(): return False
     # the distance along the ray vector the hit happened at
-    projection = np.dot(location - origin, direction)
+    projection = np.dot(location[0][ok] - origin, direction)
     # the face index of the farthest face along the vector
-    face_outer = hit_id[0][projection.argmax()]
+    face_outer = np.array(hit_id[0])[ok][projection.argmax()]
     # the normal of this presumed outer face
     normal_outer = mesh.face_normals[face_outer]
     # dot product with our direction to see if it is pointing inside or 
     # outside
-    normal_sign  = np.sign(np.dot(normal_outer, direction))
-
-    if normal_sign < 0:
-        # reverse the face normals
-        mesh.face_normals *= normal_sign
-        # since normals were regenerated, this means winding is backwards
-        # if winding is incoherent this won't fix anything
-        mesh.faces = np.fliplr(mesh.faces)
+    return np.dot(normal_outer, direction) < 0
 
 def fix_normals(mesh):
     '''
@@ -98,119 +194,267 @@ def broken_faces(mesh, color=None):
 
 def fill_holes(mesh, raise_watertight=True):
     '''
-    Fill single- triangle holes on triangular meshes by adding new triangles
-    to fill the holes. New triangles will have proper winding and normals, 
-    and if face colors exist the color of the last face will be assigned
-    to the new triangles. 
+    Fill holes on triangular meshes by adding new triangles to fill the holes. 
+    
+    Every boundary loop of the mesh is found at once, and then triangulated
+    with a fan if it is convex or by ear clipping otherwise. New triangles 
+    have proper winding and normals, and if face colors exist each new 
+    triangle is assigned the color of the face it is adjacent to.
     
     Arguments
     ---------
     mesh: Trimesh object
     raise_watertight: boolean, if True will raise an error if a 
                       watertight mesh cannot be created. 
-
     '''
-    edges        = faces_to_edges(mesh.faces, sort=False)
-    edges_sorted = np.sort(edges, axis=1)
+    faces = mesh.faces.view(np.ndarray)
     # we know that in a watertight mesh, every edge will be included twice
     # thus, every edge which appears only once is part of the boundary of a hole.
-    boundary_groups = group_rows(edges_sorted, require_count=1)
+    # these are cached on the mesh topology, in the same order as edges
+    boundary = mesh.topology.edges_boundary
+    if len(boundary) < 3: return
 
-    if len(boundary_groups) < 3: return
-    
-    boundary_edges  = edges[boundary_groups]
-    index_as_dict   = [{'index': i} for i in boundary_groups]
-
-    # we create a graph of the boundary edges, and find cycles.
-    graph  = nx.from_edgelist(np.column_stack((boundary_edges, index_as_dict)))
-    cycles = np.array(nx.cycle_basis(graph))
-
-    new_faces  = deque()
-    new_vertex = deque()
-    for hole in cycles:
-        # convert the hole, which is a polygon of vertex indices
-        # to triangles and new vertices
-        faces, vertex = _hole_to_faces(hole        = hole, 
-                                       vertices    = mesh.vertices)
-        if len(faces) == 0:
-            if raise_watertight: 
-                raise MeshError('Cannot create watertight mesh!')
-            continue
-        # remeshing returns new vertices as negative indices, so change those
-        # to absolute indices which won't be screwed up by the later appends
-        faces = np.array(faces)
-        faces[faces < 0] += len(new_vertex) + len(mesh.vertices) + len(vertex) 
-        new_vertex.extend(vertex)
-        new_faces.extend(faces)
-    new_faces  = np.array(new_faces)
-    new_vertex = np.array(new_vertex)
+    # the edges in the direction the existing faces traverse them
+    edges = faces_to_edges(faces, sort=False)[boundary]
+    loops, broken = _boundary_loops(edges)
+    if broken and raise_watertight:
+        raise MeshError('Cannot create watertight mesh!')
+    if len(loops) == 0: return
 
+    new_faces, new_edge = _triangulate_loops(loops     = loops,
+                                             edges     = edges, 
+                                             vertices  = mesh.vertices.view(np.ndarray),
+                                             neighbors = mesh.topology.vertex_neighbors)
+    # since the winding is correct, we can get consistant normals
+    # just by doing the cross products on the face edges 
+    new_normals, valid = normals(mesh.vertices.view(np.ndarray)[new_faces])
+    new_faces = new_faces[valid]
     # no new faces have been added, so nothing further to do
     if len(new_faces) == 0: return
 
-    for face_index, face in enumerate(new_faces):
-        # we compare the edge from the new face with 
-        # the boundary edge from the source mesh
-        edge_test     = face[0:2]
-        edge_boundary = edges[graph.get_edge_data(*edge_test)['index']]
-        
-        # in a well construced mesh, the winding is such that adjacent triangles
-        # have reversed edges to each other. Here we check to make sure the 
-        # edges are reversed, and if they aren't we simply reverse the face
-        reversed = edge_test[0] == edge_boundary[1]
-        if not reversed:
-            new_faces[face_index] = face[::-1]
-
-    if len(new_vertex) != 0:
-        mesh.vertices = np.vstack((mesh.vertices, new_vertex))
-
-    # since the winding is now correct, we can get consistant normals
-    # just by doing the cross products on the face edges 
-    new_normals, valid = normals(mesh.vertices[new_faces])
+    # every new face is assigned the color of the existing face 
+    # on the other side of one of its boundary edges
+    colors_ok = mesh.visual._face_colors_ok
+    if colors_ok:
+        owner      = mesh.topology.edges_face[boundary[new_edge[valid]]]
+        new_colors = np.vstack((mesh.visual.face_colors,
+                                mesh.visual.face_colors[owner]))
+    normals_ok = np.shape(mesh._face_normals) == np.shape(faces)
+
+    if normals_ok:
+        new_normals = np.vstack((mesh._face_normals, new_normals))
+    mesh.faces = np.vstack((faces, new_faces))
+    if normals_ok:
+        mesh.face_normals = new_normals
+    if colors_ok:
+        mesh.visual.face_colors = new_colors
+
+    log.debug('Filled in mesh with %i triangles', len(new_faces))
+    if raise_watertight and not mesh.is_watertight:
+        raise MeshError('Cannot create watertight mesh!')
 
-    # if face colors exist, assign the last face color to the new faces
-    # note that this is a little cheesey, but it is very inexpensive and 
-    # is the right thing to do if the mesh is a single color. 
-    color_shape = np.shape(mesh.visual.face_colors)
-    if len(color_shape) == 2 and color_shape[1] == 3:
-        new_colors = np.tile(mesh.visual.face_colors[-1], 
-                             (np.sum(valid), 1))
-        new_colors = np.vstack((mesh.visual.face_colors, 
-                                new_colors))
+def _boundary_loops(edges):
+    '''
+    Given the directed boundary edges of a mesh, find every closed loop. 
+
+    Arguments
+    ---------
+    edges: (n,2) int, vertex indices of boundary edges, in the direction 
+           the adjacent face traverses them
+
+    Returns
+    ---------
+    loops:  (m) sequence of int arrays, indices of edges in each loop in order
+    broken: bool, True if some edges couldn't be assigned to a closed loop
+    '''
+    index = np.arange(len(edges))
+    # if a vertex doesn't have the same number of incoming and outgoing 
+    # boundary edges, the edges through it can't be part of a closed loop
+    while len(index) > 0:
+        count_out = np.bincount(edges[index,0], minlength=edges.max()+1)
+        count_in  = np.bincount(edges[index,1], minlength=edges.max()+1)
+        balanced  = count_out == count_in
+        ok        = np.logical_and(balanced[edges[index,0]], 
+                                   balanced[edges[index,1]])
+        if ok.all(): break
+        index = index[ok]
+    broken = len(index) != len(edges)
+    if len(index) == 0: 
+        return [], broken
 
-    mesh.face_normals = np.vstack((mesh.face_normals, new_normals[valid]))
-    mesh.faces        = np.vstack((mesh.faces, new_faces[valid]))
-    mesh.visual.face_colors = new_colors
+    current = edges[index]
+    # pair the k-th edge ending at a vertex with the k-th edge starting 
+    # at that vertex, which makes the successor of every edge a permutation
+    order_out = current[:,0].argsort(kind='mergesort')
+    order_in  = current[:,1].argsort(kind='mergesort')
+    successor = np.zeros(len(current), dtype=np.int64)
+    successor[order_in] = order_out
 
-    log.debug('Filled in mesh with %i triangles', np.sum(valid))
+    # every cycle of the permutation is a boundary loop 
+    graph  = coo_matrix((np.ones(len(current), dtype=np.bool), 
+                         (np.arange(len(current)), successor)),
+                        shape=(len(current), len(current)))
+    labels = connected_components(graph, directed=False)[1]
+    start  = np.unique(labels, return_index=True)[1]
+
+    # break every cycle before its start edge, and then find the distance
+    # of every edge to the end of its loop by pointer jumping
+    is_start  = np.zeros(len(current), dtype=np.bool)
+    is_start[start] = True
+    last      = is_start[successor]
+    ancestor  = successor.copy()
+    ancestor[last] = np.nonzero(last)[0]
+    distance  = np.logical_not(last).astype(np.int64)
+    while not last[ancestor].all():
+        distance = distance + distance[ancestor]
+        ancestor = ancestor[ancestor]
+    
+    order = np.lexsort((-distance, labels))
+    split = np.cumsum(np.bincount(labels))[:-1]
+    loops = np.split(index[order], split)
+    return loops, broken
+
+def _triangulate_loops(loops, edges, vertices, neighbors):
+    '''
+    Triangulate closed boundary loops, with new faces wound opposite 
+    to the existing faces which include the boundary edges.
+
+    Convex loops are triangulated as a fan in a single vectorized step, 
+    loops which aren't (or where the fan would duplicate an existing 
+    edge of the mesh) are triangulated by ear clipping.
+
+    Arguments
+    ---------
+    loops:     (m) sequence of int arrays, ordered indices of edges
+    edges:     (n,2) int, vertex indices of directed boundary edges
+    vertices:  (p,3) float, vertices referenced by edges
+    neighbors: (p,p) sparse matrix, vertices connected by existing edges
 
-def _hole_to_faces(hole, vertices=None):
+    Returns
+    ---------
+    faces:    (q,3) int, new faces referencing vertices
+    edge:     (q) int, index of edges for a boundary edge of each new face
     '''
-    Given a loop of vertex indices  representing a hole, turn it into 
-    triangular faces.
-    If unable to do so, return None
+    lengths = np.array([len(i) for i in loops])
+    order   = np.hstack(loops)
+    labels  = np.arange(len(loops)).repeat(lengths)
+    offset  = np.append(0, np.cumsum(lengths)[:-1])
+    # position of every edge inside its loop
+    local   = np.arange(len(order)) - offset[labels]
+    following = order[np.where(local == lengths[labels] - 1,
+                               offset[labels],
+                               np.arange(len(order)) + 1)]
+    
+    # the loop is traversed with the existing faces, so the normal 
+    # of the loop polygon points opposite the new faces
+    points  = vertices[edges[order,0]]
+    # area weighted normal of every loop using Newell's method
+    crosses = np.cross(points, vertices[edges[following,0]])
+    normal  = np.column_stack([np.bincount(labels, weights=crosses[:,i]) 
+                               for i in range(3)])
+    # the turn at every vertex relative to the loop normal
+    turn    = np.cross(vertices[edges[order,1]] - points,
+                       vertices[edges[following,1]] - vertices[edges[following,0]])
+    turn    = (turn * normal[labels]).sum(axis=1)
+    convex  = np.ones(len(loops), dtype=np.bool)
+    convex[labels[turn < -tol.zero]] = False
+
+    # the interior diagonals of a fan from the first vertex of every loop
+    # if any of them is already an edge of the mesh use ear clipping instead
+    diagonal = np.logical_and(local > 1, local < lengths[labels] - 1)
+    if diagonal.any():
+        exists = np.asarray(neighbors[edges[order[offset[labels[diagonal]]], 0],
+                                      edges[order[diagonal], 0]]).reshape(-1)
+        convex[labels[diagonal][exists.astype(np.bool)]] = False
 
+    # fan triangles (v0, v(i+1), v(i)) for every loop which is convex
+    fan     = np.logical_and(convex[labels], 
+                             np.logical_and(local > 0, 
+                                            local < lengths[labels] - 1))
+    first   = edges[order[offset[labels[fan]]], 0]
+    faces   = [np.column_stack((first, 
+                                edges[order[fan], 1],
+                                edges[order[fan], 0]))]
+    face_edge = [order[fan]]
+    
+    for loop_index in np.nonzero(np.logical_not(convex))[0]:
+        loop      = loops[loop_index]
+        loop_vert = edges[loop, 0]
+        planar    = project_to_plane(vertices[loop_vert],
+                                     plane_normal = normal[loop_index],
+                                     plane_origin = vertices[loop_vert[0]])
+        # pairs of loop vertices which are connected by an existing edge
+        existing  = neighbors[loop_vert][:,loop_vert].nonzero()
+        triangles = _ear_clip(planar, 
+                              forbidden = set(zip(*existing)))
+        if len(triangles) == 0: continue
+        # reverse the triangles to be wound opposite the loop
+        # triangles hold original loop positions, so an edge of a triangle
+        # is on the loop if its end directly follows its start
+        on_loop = ((triangles + 1) % len(loop)) == np.roll(triangles, -1, axis=1)
+        # triangles made only of diagonals use the edge leaving their first vertex
+        start   = triangles[np.arange(len(triangles)), on_loop.argmax(axis=1)]
+        faces.append(loop_vert[triangles[:,::-1]])
+        face_edge.append(loop[start])
+    return np.vstack(faces), np.hstack(face_edge)
+
+def _ear_clip(points, forbidden=None):
+    '''
+    Triangulate a simple polygon by ear clipping.
+    
     Arguments
     ---------
-    hole:     ordered loop of vertex indices
-    vertices: the vertices referenced by hole. 
-              If we were to add more involved remeshing algorithms, these 
-              would be required, however since we are only adding triangles
-              and triangulated quads it is not necessary. 
-    fill_planar: fill larger holes if every vertex of the boundary lies on a plane
-                 this will not work reliably on non- convex holes 
+    points:    (n,2) float, vertices of a closed polygon 
+    forbidden: set of (a, b) index pairs, which ears won't use as diagonals
+
     Returns
     ---------
-    (n, 3) new faces 
-    (m, 3) new vertices
-    '''
-    hole = np.array(hole)
-    # the case where the hole is just a single missing triangle
-    if len(hole) == 3: 
-        return [hole], []
-    # the hole is a quad, which we fill with two triangles
-    if len(hole) == 4: 
-        face_A = hole[[0,1,2]]
-        face_B = hole[[2,3,0]]
-        return [face_A, face_B], []       
-    return [], []
+    triangles: (n-2, 3) int, indices of points, wound in the same direction
+               as the polygon. Empty if the polygon has no area.
+    '''
+    points = np.array(points, dtype=np.float64)
+    # the signed area tells us the direction of the polygon
+    x, y   = points.T
+    sign   = np.sign(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+    if sign == 0: return np.zeros((0,3), dtype=np.int64)
+
+    remaining = list(range(len(points)))
+    triangles = deque()
+    while len(remaining) > 3:
+        count = len(remaining)
+        for i in range(count):
+            a, b, c = remaining[i-1], remaining[i], remaining[(i+1) % count]
+            if forbidden is not None and (a, c) in forbidden:
+                continue
+            if not _is_ear(points, a, b, c, sign, remaining):
+                continue
+            triangles.append([a, b, c])
+            remaining.pop(i)
+            break
+        else: 
+            # no ear found, which means the projected polygon is self- 
+            # intersecting, so fill what is left with a fan
+            break
+    triangles.extend([remaining[0], remaining[i], remaining[i+1]] 
+                     for i in range(1, len(remaining) - 1))
+    return np.array(triangles, dtype=np.int64)
+
+def _is_ear(points, a, b, c, sign, remaining):
+    '''
+    Check if the triangle (a, b, c) of a polygon is convex in the polygon 
+    direction and contains no other vertices of the polygon.
+    '''
+    pa, pb, pc = points[a], points[b], points[c]
+    cross = ((pb[0]-pa[0])*(pc[1]-pa[1]) - 
+             (pb[1]-pa[1])*(pc[0]-pa[0])) * sign
+    if cross <= tol.zero: return False
+    others = np.array([i for i in remaining if not i in (a, b, c)])
+    if len(others) == 0: return True
+    test = points[others]
+    # barycentric sign checks for every other vertex against every edge
+    inside = np.ones(len(test), dtype=np.bool)
+    for start, end in ((pa, pb), (pb, pc), (pc, pa)):
+        side = ((end[0]-start[0])*(test[:,1]-start[1]) - 
+                (end[1]-start[1])*(test[:,0]-start[0])) * sign
+        inside = np.logical_and(inside, side >= -tol.zero)
+    return not inside.any()
@@ -38,7 +38,7 @@ def random_sample(mesh, count):
     # returns the index where area_sample that would need to be inserted
     # to maintain the sort on area_cum
     face_index   = np.searchsorted(area_cum, area_sample)
-    triangles    = mesh.vertices[mesh.faces[face_index]]
+    triangles    = mesh.triangles[face_index]
     barycentric  = np.random.random((count, 3))
     barycentric /= barycentric.sum(axis=1).reshape((-1,1))
     
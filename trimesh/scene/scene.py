@@ -41,6 +41,23 @@ class Scene:
             return True
         return False
 
+    def export(self, file_obj=None):
+        '''
+        Export the scene as a binary glTF (GLB) file, with the transform
+        of every mesh from the base frame.
+
+        Arguments
+        ---------
+        file_obj: file- like object to write to, or None
+
+        Returns
+        ---------
+        if file_obj is None: bytes of the GLB file
+        else:                True
+        '''
+        from ..io.gltf import export_glb
+        return export_glb(self, file_obj)
+
     def show(self, block=True):
         from .viewer import SceneViewer
         SceneViewer(self, block=block)
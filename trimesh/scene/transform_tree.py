@@ -110,6 +110,21 @@ class TransformTree:
             transform = np.linalg.inv(transform)
         return transform
 
+    def export(self):
+        '''
+        Export every transform in the tree, which can be restored by
+        passing each of them to update.
+
+        Returns
+        ---------
+        transforms: list of dict, with keys 'frame_from', 'frame_to' 
+                    and 'matrix' 
+        '''
+        return [{'frame_from' : frame_from,
+                 'frame_to'   : frame_to,
+                 'matrix'     : np.array(data['matrix'])}
+                for frame_from, frame_to, data in self._transforms.edges(data=True)]
+
     def clear(self):
         self._transforms = DiGraph()
         self._paths      = {}
@@ -0,0 +1,244 @@
+'''
+Connectivity tables for triangular meshes, which only depend on mesh.faces
+'''
+import numpy as np
+
+from scipy.sparse         import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from .geometry  import faces_to_edges
+from .constants import log
+from .util      import Cache
+
+class MeshTopology:
+    '''
+    An object to query the connectivity of a mesh.
+
+    Every table is computed only when requested, and is cached until
+    the faces of the mesh (or the number of vertices) change. Moving
+    vertices does not invalidate any of these values.
+    '''
+    def __init__(self, mesh):
+        self.mesh   = mesh
+        self._cache = Cache(id_function = self._topology_id)
+
+    def _topology_id(self):
+        '''
+        The state of the mesh the cached tables depend on.
+        '''
+        return (self.mesh.faces.modified(),
+                len(self.mesh.vertices))
+
+    @property
+    def _faces(self):
+        # indexing a tracked array marks it as modified, which would
+        # clear our own cache, so we do all operations on a plain view
+        return self.mesh.faces.view(np.ndarray)
+
+    @property
+    def edges(self):
+        '''
+        (len(faces)*3, 2) int, sorted vertex indices of every face edge.
+        Edges of face i are rows i*3, i*3+1 and i*3+2.
+        '''
+        cached = self._cache.get('edges')
+        if cached is not None: return cached
+        return self._cache.set(key   = 'edges',
+                               value = faces_to_edges(self._faces, sort=True))
+
+    @property
+    def edges_face(self):
+        '''
+        (len(faces)*3) int, which face each row of self.edges came from
+        '''
+        cached = self._cache.get('edges_face')
+        if cached is not None: return cached
+        edges_face = np.arange(len(self._faces)).repeat(3)
+        return self._cache.set(key   = 'edges_face',
+                               value = edges_face)
+
+    @property
+    def edges_unique(self):
+        '''
+        (j, 2) int, sorted vertex indices of unique edges
+        '''
+        return self._unique_edges()['edges_unique']
+
+    @property
+    def edges_unique_inverse(self):
+        '''
+        (len(faces)*3) int, index of self.edges_unique for every edge
+        so that edges_unique[edges_unique_inverse] == edges
+        '''
+        return self._unique_edges()['edges_unique_inverse']
+
+    @property
+    def edges_unique_count(self):
+        '''
+        (j) int, how many faces include each unique edge.
+        In a watertight mesh every value is 2.
+        '''
+        return self._unique_edges()['edges_unique_count']
+
+    @property
+    def edges_boundary(self):
+        '''
+        (k) int, indices of self.edges which are only included by one face.
+        These are the edges around the holes of a mesh.
+        '''
+        cached = self._cache.get('edges_boundary')
+        if cached is not None: return cached
+        single   = self.edges_unique_count[self.edges_unique_inverse] == 1
+        boundary = np.nonzero(single)[0]
+        return self._cache.set(key   = 'edges_boundary',
+                               value = boundary)
+
+    @property
+    def edge_faces(self):
+        '''
+        (j, len(faces)) sparse boolean CSR matrix, where row i contains
+        the faces which include self.edges_unique[i]
+        '''
+        cached = self._cache.get('edge_faces')
+        if cached is not None: return cached
+        matrix = _incidence(rows  = self.edges_unique_inverse,
+                            cols  = self.edges_face,
+                            shape = (len(self.edges_unique),
+                                     len(self._faces)))
+        return self._cache.set(key   = 'edge_faces',
+                               value = matrix)
+
+    @property
+    def vertex_faces(self):
+        '''
+        (len(vertices), len(faces)) sparse boolean CSR matrix, where
+        row i contains the faces which reference vertex i.
+
+        The faces of vertex i are:
+        vertex_faces.indices[vertex_faces.indptr[i]:vertex_faces.indptr[i+1]]
+        '''
+        cached = self._cache.get('vertex_faces')
+        if cached is not None: return cached
+        matrix = _incidence(rows  = self._faces.reshape(-1),
+                            cols  = self.edges_face,
+                            shape = (len(self.mesh.vertices),
+                                     len(self._faces)))
+        return self._cache.set(key   = 'vertex_faces',
+                               value = matrix)
+
+    @property
+    def vertex_neighbors(self):
+        '''
+        (len(vertices), len(vertices)) sparse boolean CSR matrix,
+        where row i contains the vertices connected to vertex i by an edge
+        '''
+        cached = self._cache.get('vertex_neighbors')
+        if cached is not None: return cached
+        edges  = self.edges_unique
+        matrix = _incidence(rows  = edges.reshape(-1),
+                            cols  = edges[:,::-1].reshape(-1),
+                            shape = (len(self.mesh.vertices),)*2)
+        return self._cache.set(key   = 'vertex_neighbors',
+                               value = matrix)
+
+    @property
+    def face_adjacency(self):
+        '''
+        (n,2) int, pairs of faces which share an edge.
+        Only edges which are included by exactly two faces are considered.
+        '''
+        return self._face_adjacency()['face_adjacency']
+
+    @property
+    def face_adjacency_edges(self):
+        '''
+        (n) int, index of self.edges_unique shared by each
+        row of self.face_adjacency
+        '''
+        return self._face_adjacency()['face_adjacency_edges']
+
+    @property
+    def face_neighbors(self):
+        '''
+        (len(faces), len(faces)) sparse boolean CSR matrix, where
+        row i contains the faces which share an edge with face i
+        '''
+        cached = self._cache.get('face_neighbors')
+        if cached is not None: return cached
+        pairs  = self.face_adjacency
+        matrix = _incidence(rows  = pairs.reshape(-1),
+                            cols  = pairs[:,::-1].reshape(-1),
+                            shape = (len(self._faces),)*2)
+        return self._cache.set(key   = 'face_neighbors',
+                               value = matrix)
+
+    @property
+    def face_components(self):
+        '''
+        (len(faces)) int, label of the connected component (or body)
+        of every face, where components are connected by shared edges
+        '''
+        cached = self._cache.get('face_components')
+        if cached is not None: return cached
+        labels = connected_components(self.face_neighbors, directed=False)[1]
+        return self._cache.set(key   = 'face_components',
+                               value = labels)
+
+    def _unique_edges(self):
+        '''
+        Find the unique edges of the mesh with a single sort,
+        by turning each sorted edge into one int64 key.
+        '''
+        cached = self._cache.get('unique_edges')
+        if cached is not None: return cached
+
+        edges = self.edges
+        if len(edges) == 0:
+            empty  = np.zeros(0, dtype=np.int64)
+            result = {'edges_unique'         : np.zeros((0,2), dtype=np.int64),
+                      'edges_unique_inverse' : empty,
+                      'edges_unique_count'   : empty}
+            return self._cache.set(key='unique_edges', value=result)
+
+        stride = np.int64(edges.max()) + 1
+        keys   = edges[:,0].astype(np.int64) * stride + edges[:,1]
+        unique, index, inverse = np.unique(keys,
+                                           return_index   = True,
+                                           return_inverse = True)
+        result = {'edges_unique'         : edges[index],
+                  'edges_unique_inverse' : inverse,
+                  'edges_unique_count'   : np.bincount(inverse)}
+        return self._cache.set(key   = 'unique_edges',
+                               value = result)
+
+    def _face_adjacency(self):
+        '''
+        Pair up the faces of every edge which is included exactly twice.
+        '''
+        cached = self._cache.get('face_adjacency')
+        if cached is not None: return cached
+
+        inverse = self.edges_unique_inverse
+        count   = self.edges_unique_count
+        # sort the edges by which unique edge they are, so the faces
+        # of every unique edge are contiguous
+        order   = inverse.argsort(kind='mergesort')
+        start   = np.append(0, np.cumsum(count)[:-1])
+        shared  = np.nonzero(count == 2)[0]
+        index   = start[shared].reshape((-1,1)) + [0,1]
+
+        if len(shared) == 0:
+            log.error('No adjacent faces detected! Did you merge vertices?')
+
+        result = {'face_adjacency'       : self.edges_face[order[index]].reshape((-1,2)),
+                  'face_adjacency_edges' : shared}
+        return self._cache.set(key   = 'face_adjacency',
+                               value = result)
+
+def _incidence(rows, cols, shape):
+    '''
+    Create a sparse boolean CSR matrix from row and column indices.
+    '''
+    data   = np.ones(len(rows), dtype=np.bool)
+    matrix = coo_matrix((data, (rows, cols)), shape=shape).tocsr()
+    return matrix
@@ -3,6 +3,9 @@ import numpy as np
 from .points    import unitize, point_plane_distance
 from .constants import tol
 
+# how many faces to integrate at once when computing mass properties
+MASS_CHUNK = 2**16
+
 def cross(triangles):
     '''
     Returns the cross product of two edges from input triangles 
@@ -38,6 +41,26 @@ def normals(triangles):
     normals, valid = unitize(crosses, check_valid=True)
     return normals, valid
     
+def angles(triangles):
+    '''
+    Calculates the interior angles of input triangles
+
+    triangles: vertices of triangles, (n,3,3)
+    returns:   angle at each vertex of every triangle in radians, (n,3)
+    '''
+    angles = np.zeros((len(triangles), 3))
+    # one corner at a time to keep intermediate arrays small
+    for i in range(3):
+        # vectors from the corner to the next and previous corners
+        u = triangles[:,(i+1)%3] - triangles[:,i]
+        v = triangles[:,(i+2)%3] - triangles[:,i]
+        # atan2 of the cross and dot products is well behaved for
+        # degenerate triangles, where it returns zero
+        sine        = np.sum(np.cross(u, v) ** 2, axis=1) ** .5
+        cosine      = np.sum(u * v, axis=1)
+        angles[:,i] = np.arctan2(sine, cosine)
+    return angles
+
 def all_coplanar(triangles):
     '''
     Given a list of triangles, return True if they are all coplanar, and False if not.
@@ -67,15 +90,26 @@ def any_coplanar(triangles):
     any_coplanar = np.any(np.all(np.abs(distances.reshape((-1,3)) < tol.zero), axis=1))
     return any_coplanar
     
-def mass_properties(triangles, density = 1.0, skip_inertia=False):
+def mass_integrals(triangles):
     '''
-    Calculate the mass properties of a group of triangles.
-    
+    Calculate the per- triangle terms of the volume integrals used for 
+    mass properties, which can be summed over any group of triangles.
+
     Implemented from:
     http://www.geometrictools.com/Documentation/PolyhedralMassProperties.pdf
+
+    Arguments
+    ---------
+    triangles: (n,3,3) float, vertices of triangles
+
+    Returns
+    ---------
+    integral: (10,n) float, where rows are the integrals of:
+              [1, x, y, z, x^2, y^2, z^2, xy, yz, xz]
+              over the volume of the tetrahedron from the origin
+              to each triangle
     '''
-    crosses      = cross(triangles)
-    surface_area = np.sum(np.sum(crosses**2, axis=1)**.5)*.5
+    crosses = cross(triangles)
 
     # these are the subexpressions of the integral 
     f1 = triangles.sum(axis=1)
@@ -109,7 +143,21 @@ def mass_properties(triangles, density = 1.0, skip_inertia=False):
                                         (triangles[:,2, triangle_i] * g2[:,i]))
                                         
     coefficents = 1.0 / np.array([6,24,24,24,60,60,60,120,120,120])
-    integrated  = integral.sum(axis=1) * coefficents
+    integral   *= coefficents.reshape((-1,1))
+    return integral
+
+def mass_properties(triangles, density = 1.0, skip_inertia=False):
+    '''
+    Calculate the mass properties of a group of triangles.
+    
+    Implemented from:
+    http://www.geometrictools.com/Documentation/PolyhedralMassProperties.pdf
+    '''
+    surface_area = area(triangles, sum=True)
+    integrated   = np.zeros(10)
+    # integrate in chunks to limit the size of temporary arrays
+    for start in range(0, len(triangles), MASS_CHUNK):
+        integrated += mass_integrals(triangles[start:start+MASS_CHUNK]).sum(axis=1)
     
     volume      = integrated[0]
     center_mass = integrated[1:4] / volume
@@ -121,17 +169,262 @@ def mass_properties(triangles, density = 1.0, skip_inertia=False):
               'center_mass'  : center_mass.tolist()}
     if skip_inertia: return result
               
-    inertia = np.zeros((3,3))
-    inertia[0,0] = integrated[5] + integrated[6] - (volume * (center_mass[[1,2]]**2).sum())
-    inertia[1,1] = integrated[4] + integrated[6] - (volume * (center_mass[[0,2]]**2).sum())
-    inertia[2,2] = integrated[4] + integrated[5] - (volume * (center_mass[[0,1]]**2).sum())
-    inertia[0,1] = (integrated[7] - (volume * np.product(center_mass[[0,1]])))
-    inertia[1,2] = (integrated[8] - (volume * np.product(center_mass[[1,2]])))
-    inertia[0,2] = (integrated[9] - (volume * np.product(center_mass[[0,2]])))
-    inertia[2,0] = inertia[0,2]
-    inertia[2,1] = inertia[1,2]
-    inertia *= density
-    
+    inertia = integrals_to_inertia(integrated.reshape((10,1)))[0] * density
     result['inertia'] = inertia.tolist()
     
     return result
+
+def group_mass_properties(triangles, groups, density = 1.0):
+    '''
+    Calculate the mass properties of many groups of triangles at once,
+    by summing the per- triangle integrals of each group.
+
+    Arguments
+    ---------
+    triangles: (n,3,3) float, vertices of triangles
+    groups:    (n) int, label of the group each triangle belongs to
+    density:   float, uniform density of every group
+
+    Returns
+    ---------
+    properties: dict with keys and (m = groups.max() + 1) length arrays: 
+       'density'      : float, same as the argument 
+       'surface_area' : (m) float
+       'volume'       : (m) float
+       'mass'         : (m) float
+       'center_mass'  : (m,3) float
+       'inertia'      : (m,3,3) float, at the center of mass of each group
+    '''
+    groups = np.asanyarray(groups)
+    count  = groups.max() + 1
+    # sum every row of the integral by group
+    integrated = np.array([np.bincount(groups, 
+                                       weights   = row, 
+                                       minlength = count) 
+                           for row in mass_integrals(triangles)])
+    surface_area = np.bincount(groups, 
+                               weights   = area(triangles, sum=False),
+                               minlength = count)
+    return integrals_to_properties(integrated   = integrated, 
+                                   surface_area = surface_area,
+                                   density      = density)
+
+def batch_mass_properties(vertices, faces, offsets, density = 1.0):
+    '''
+    Calculate the mass properties of a batch of meshes, whose faces
+    are stacked into one array, without building their triangles.
+
+    Arguments
+    ---------
+    vertices: (n,3) float, vertices of every mesh
+    faces:    (m,3) int, stacked faces of every mesh
+    offsets:  (j) int, index of the first face of each mesh
+    density:  float, uniform density of every mesh
+
+    Returns
+    ---------
+    properties: dict with the same keys as group_mass_properties, 
+                with one row per mesh
+    '''
+    integrated, surface_area = integrate_mass(vertices = vertices,
+                                              faces    = faces,
+                                              offsets  = offsets)
+    return integrals_to_properties(integrated   = integrated, 
+                                   surface_area = surface_area,
+                                   density      = density)
+
+def integrate_mass(vertices, faces, offsets=None, chunk_size=MASS_CHUNK):
+    '''
+    Sum the volume integrals and surface area of triangles, streaming 
+    over chunks of faces so the temporary arrays stay the same size
+    regardless of how many faces there are. 
+
+    Arguments
+    ---------
+    vertices:   (n,3) float, vertices of the mesh
+    faces:      (m,3) int, faces of the mesh
+    offsets:    None, or (j) int, index of the first face of each mesh
+                if faces contains several meshes stacked together
+    chunk_size: int, how many faces to integrate at once
+
+    Returns
+    ---------
+    integrated:   (10,j) float, summed rows of mass_integrals for each mesh
+    surface_area: (j) float, surface area of each mesh
+    '''
+    vertices = np.asanyarray(vertices)
+    faces    = np.asanyarray(faces)
+    if offsets is None:
+        offsets = [0]
+    offsets = np.asanyarray(offsets, dtype=np.int64)
+    count   = len(offsets)
+
+    integrated   = np.zeros((10, count))
+    surface_area = np.zeros(count)
+    for start in range(0, len(faces), chunk_size):
+        stop  = min(start + chunk_size, len(faces))
+        chunk = vertices[faces[start:stop]]
+        if count == 1:
+            integrated[:,0] += mass_integrals(chunk).sum(axis=1)
+            surface_area[0] += area(chunk, sum=True)
+            continue
+        # which mesh every face in the chunk belongs to 
+        groups = np.searchsorted(offsets, 
+                                 np.arange(start, stop), 
+                                 side = 'right') - 1
+        for i, row in enumerate(mass_integrals(chunk)):
+            integrated[i] += np.bincount(groups, 
+                                         weights   = row, 
+                                         minlength = count)
+        surface_area += np.bincount(groups, 
+                                    weights   = area(chunk, sum=False),
+                                    minlength = count)
+    return integrated, surface_area
+
+def chunk_properties(triangles, bins=None):
+    '''
+    Partial sums of the properties of a chunk of triangles, which can be
+    combined exactly with the sums of other chunks by combine_properties.
+
+    Arguments
+    ---------
+    triangles: (n,3,3) float, vertices of triangles
+    bins:      None, or (b) float, bin edges for a histogram of triangle areas
+
+    Returns
+    ---------
+    partial: dict with keys:
+             'face_count'   : int, number of triangles
+             'integrated'   : (10) float, summed rows of mass_integrals
+             'surface_area' : float, summed area
+             'bounds'       : (2,3) float, minimum and maximum vertex
+             'histogram'    : (b-1) int, triangles with area in each bin, 
+                              only included if bins were passed
+    '''
+    triangles  = np.asanyarray(triangles, dtype=np.float64)
+    integrated = np.zeros(10)
+    for start in range(0, len(triangles), MASS_CHUNK):
+        integrated += mass_integrals(triangles[start:start+MASS_CHUNK]).sum(axis=1)
+    partial = {'face_count' : len(triangles),
+               'integrated' : integrated,
+               'bounds'     : np.array([[np.inf]*3, [-np.inf]*3])}
+    if len(triangles) > 0:
+        points = triangles.reshape((-1,3))
+        partial['bounds'] = np.array([points.min(axis=0), points.max(axis=0)])
+    areas = area(triangles, sum=False)
+    partial['surface_area'] = areas.sum()
+    if bins is not None:
+        partial['histogram'] = np.histogram(areas, bins=bins)[0]
+    return partial
+
+def combine_properties(partials):
+    '''
+    Combine partial sums from chunk_properties.
+
+    Arguments
+    ---------
+    partials: iterable of dicts, from chunk_properties
+
+    Returns
+    ---------
+    combined: dict with the same keys as chunk_properties, for every chunk
+    '''
+    combined = None
+    for partial in partials:
+        if combined is None:
+            combined = dict((k, np.array(v)) for k, v in partial.items())
+            continue
+        for key in ['face_count', 'integrated', 'surface_area', 'histogram']:
+            if key in combined:
+                combined[key] = combined[key] + partial[key]
+        combined['bounds'] = np.array([np.minimum(combined['bounds'][0], partial['bounds'][0]),
+                                       np.maximum(combined['bounds'][1], partial['bounds'][1])])
+    if combined is None:
+        raise ValueError('No chunks to combine!')
+    return combined
+
+def stream_properties(chunks, density = 1.0, bins=None):
+    '''
+    Calculate the mass properties, bounds and a histogram of triangle areas
+    of a stream of triangles, holding only one chunk in memory at a time.
+
+    Arguments
+    ---------
+    chunks:  iterable of (n,3,3) triangles, or of (triangles, normals) 
+             like trimesh.io.stl.stl_chunks generates
+    density: float, uniform density
+    bins:    None, or (b) float, bin edges for a histogram of triangle areas
+
+    Returns
+    ---------
+    properties: dict with the same keys as mass_properties, as well as 
+                'face_count', 'bounds' and 'histogram' if bins were passed
+    '''
+    partials = (chunk_properties(chunk[0] if isinstance(chunk, tuple) else chunk,
+                                 bins = bins) for chunk in chunks)
+    combined   = combine_properties(partials)
+    properties = integrals_to_properties(combined['integrated'].reshape((10,1)),
+                                         combined['surface_area'].reshape(1),
+                                         density = density)
+    result = {'density'      : density,
+              'surface_area' : float(combined['surface_area']),
+              'volume'       : float(properties['volume'][0]),
+              'mass'         : float(properties['mass'][0]),
+              'center_mass'  : properties['center_mass'][0].tolist(),
+              'inertia'      : properties['inertia'][0].tolist(),
+              'face_count'   : int(combined['face_count']),
+              'bounds'       : combined['bounds']}
+    if bins is not None:
+        result['histogram'] = combined['histogram']
+    return result
+
+def integrals_to_properties(integrated, surface_area, density = 1.0):
+    '''
+    Convert summed volume integrals into mass properties.
+
+    Arguments
+    ---------
+    integrated:   (10,m) float, summed rows from mass_integrals
+    surface_area: (m) float, surface area of each group
+    density:      float, uniform density of every group
+
+    Returns
+    ---------
+    properties: dict with the same keys as group_mass_properties
+    '''
+    volume = integrated[0]
+    result = {'density'      : density,
+              'surface_area' : surface_area,
+              'volume'       : volume,
+              'mass'         : density * volume,
+              'center_mass'  : (integrated[1:4] / volume).T,
+              'inertia'      : integrals_to_inertia(integrated) * density}
+    return result
+
+def integrals_to_inertia(integrated):
+    '''
+    Convert summed volume integrals into inertia tensors, taken at the 
+    center of mass and aligned with the global coordinate system.
+
+    Arguments
+    ---------
+    integrated: (10,m) float, summed rows from mass_integrals
+
+    Returns
+    ---------
+    inertia: (m,3,3) float, inertia tensors for unit density
+    '''
+    volume      = integrated[0]
+    center_mass = integrated[1:4] / volume
+
+    inertia = np.zeros((len(volume), 3, 3))
+    inertia[:,0,0] = integrated[5] + integrated[6] - (volume * (center_mass[[1,2]]**2).sum(axis=0))
+    inertia[:,1,1] = integrated[4] + integrated[6] - (volume * (center_mass[[0,2]]**2).sum(axis=0))
+    inertia[:,2,2] = integrated[4] + integrated[5] - (volume * (center_mass[[0,1]]**2).sum(axis=0))
+    inertia[:,0,1] = (integrated[7] - (volume * np.product(center_mass[[0,1]], axis=0)))
+    inertia[:,1,2] = (integrated[8] - (volume * np.product(center_mass[[1,2]], axis=0)))
+    inertia[:,0,2] = (integrated[9] - (volume * np.product(center_mass[[0,2]], axis=0)))
+    inertia[:,1,0] = inertia[:,0,1]
+    inertia[:,2,0] = inertia[:,0,2]
+    inertia[:,2,1] = inertia[:,1,2]
+    return inertia
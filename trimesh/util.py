@@ -1,5 +1,6 @@
 import numpy as np
 import time
+import io
 import logging
 
 from sys import version_info
@@ -65,6 +66,19 @@ def euclidean(a, b):
 def is_file(obj):
     return hasattr(obj, 'read')
 
+def is_mappable(file_obj):
+    '''
+    Returns True if file_obj reads directly from a file on disk, so its 
+    file descriptor can be memory mapped. Wrappers like gzip.GzipFile 
+    have the file descriptor of the file they wrap, so they are not.
+    '''
+    if isinstance(file_obj, (io.BufferedReader, io.BufferedRandom)):
+        file_obj = file_obj.raw
+    if isinstance(file_obj, io.FileIO):
+        return True
+    # python 2 files
+    return type(file_obj).__name__ == 'file'
+
 def is_string(obj):
     return isinstance(obj, basestring)
 